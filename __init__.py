@@ -1,5 +1,15 @@
-# This will make sure the app is always imported when
-# Django starts so that shared_task will use this app.
-from .celery import app as celery_app
+# Celery is loaded on first use rather than when Django starts, so web
+# workers that never send a task skip importing it. `celery -A
+# alx_travel_app` finds the app in alx_travel_app.celery, and
+# listings.tasks loads it before any shared task is sent, so the tasks
+# still use this app.
+
+
+def __getattr__(name):
+    if name == 'celery_app':
+        from .celery import app
+        return app
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+
 
 __all__ = ('celery_app',)
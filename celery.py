@@ -1,5 +1,6 @@
 import os
 from celery import Celery
+from celery.schedules import crontab
 
 # Set the default Django settings module for the 'celery' program.
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'alx_travel_app.settings')
@@ -13,6 +14,30 @@ app.config_from_object('django.conf:settings', namespace='CELERY')
 # Load task modules from all registered Django apps.
 app.autodiscover_tasks()
 
+# Periodic jobs run by `celery -A alx_travel_app beat`
+app.conf.beat_schedule = {
+    'purge-notification-outbox': {
+        'task': 'listings.tasks.purge_notification_outbox',
+        'schedule': crontab(hour=2, minute=45),
+    },
+    'complete-past-bookings': {
+        'task': 'listings.tasks.complete_past_bookings',
+        'schedule': crontab(minute=5),
+    },
+    'expire-stale-pending-bookings': {
+        'task': 'listings.tasks.expire_stale_pending_bookings',
+        'schedule': crontab(minute='*/10'),
+    },
+    'archive-old-bookings': {
+        'task': 'listings.tasks.archive_old_bookings',
+        'schedule': crontab(hour=3, minute=15),
+    },
+    'rebuild-similar-listings': {
+        'task': 'listings.tasks.rebuild_similar_listings',
+        'schedule': crontab(hour=4, minute=35),
+    },
+}
+
 
 @app.task(bind=True)
 def debug_task(self):
@@ -1,14 +1,106 @@
+import json
+
+from django import forms
+from django.conf import settings
 from django.contrib import admin
-from .models import Listing, Review, Booking
+from django.core.paginator import Paginator
+from django.db import connections, transaction
+from django.utils.functional import cached_property
+
+from .availability import ACTIVE_STATUSES, BookingConflict, check_stay
+from .models import Listing, ListingRate, Review, Booking
+from .search import search
+
+
+def estimated_count(queryset):
+    """The database's row estimate for a queryset, or None where it has none."""
+    vendor = connections[queryset.db].vendor
+    if vendor == 'mysql':
+        return _mysql_estimated_count(queryset.order_by())
+    if vendor == 'postgresql':
+        plan = json.loads(queryset.order_by().explain(format='json'))
+        return int(plan[0]['Plan']['Plan Rows'])
+    return None
+
+
+def _mysql_estimated_count(queryset):
+    """
+    InnoDB's row estimate: the table statistics of an unfiltered table, else
+    the rows EXPLAIN expects the outer query to examine times the share it
+    expects to keep, multiplied over its joined tables.
+    """
+    connection = connections[queryset.db]
+    with connection.cursor() as cursor:
+        if not queryset.query.where:
+            cursor.execute(
+                'SELECT TABLE_ROWS FROM information_schema.TABLES '
+                'WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s',
+                [queryset.model._meta.db_table],
+            )
+            row = cursor.fetchone()
+            return int(row[0]) if row and row[0] is not None else None
+        sql, params = queryset.query.get_compiler(using=queryset.db).as_sql()
+        cursor.execute(f'EXPLAIN {sql}', params)
+        columns = [column[0].lower() for column in cursor.description]
+        plan = [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+    estimate = None
+    for step in plan:
+        # Subqueries, e.g. of the search filter, run per outer row or once
+        if step.get('select_type') not in ('SIMPLE', 'PRIMARY') or step.get('rows') is None:
+            continue
+        rows = step['rows'] * float(step.get('filtered') or 100) / 100
+        estimate = rows if estimate is None else estimate * rows
+    return None if estimate is None else int(estimate)
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator that takes the database's estimate for large result counts.
+
+    An exact COUNT(*) reads every matching row. On MySQL and PostgreSQL,
+    results estimated at LISTINGS_ADMIN_COUNT_THRESHOLD rows (default
+    10000) or more report the estimate instead; smaller results, and other
+    databases, are counted exactly.
+    """
+
+    @cached_property
+    def count(self):
+        estimate = estimated_count(self.object_list)
+        if estimate is not None and estimate >= getattr(settings, 'LISTINGS_ADMIN_COUNT_THRESHOLD', 10000):
+            return estimate
+        return super().count
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """
+    Changelist settings for tables with millions of rows.
+
+    Pages take estimated counts, the unfiltered total is not counted next to
+    a filtered one, and subclasses join the foreign keys they display and
+    edit them by id rather than with a select of every row.
+    """
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    list_per_page = 25
+
+
+class ListingRateInline(admin.TabularInline):
+    model = ListingRate
+    extra = 0
+    fields = ['kind', 'start_date', 'end_date', 'price_per_night', 'adjustment_percent', 'min_nights']
 
 
 @admin.register(Listing)
-class ListingAdmin(admin.ModelAdmin):
+class ListingAdmin(LargeTableAdmin):
     list_display = ['title', 'listing_type', 'location', 'price_per_night', 'is_available', 'owner', 'created_at']
     list_filter = ['listing_type', 'is_available', 'created_at']
-    search_fields = ['title', 'location', 'owner__username']
+    list_select_related = ['owner']
+    raw_id_fields = ['owner']
+    search_fields = ['title']
+    search_help_text = 'Words of the title, location or description; the last one may be partial.'
     readonly_fields = ['id', 'created_at', 'updated_at']
-    list_per_page = 25
+    inlines = [ListingRateInline]
     
     fieldsets = (
         ('Basic Information', {
@@ -28,15 +120,24 @@ class ListingAdmin(admin.ModelAdmin):
             'classes': ('collapse',)
         }),
     )
+    
+    def get_search_results(self, request, queryset, search_term):
+        """Search the listing search index instead of scanning the text columns."""
+        if not search_term.strip():
+            return queryset, False
+        return search(queryset, search_term), False
 
 
 @admin.register(Review)
-class ReviewAdmin(admin.ModelAdmin):
+class ReviewAdmin(LargeTableAdmin):
     list_display = ['listing', 'reviewer', 'rating', 'created_at']
     list_filter = ['rating', 'created_at']
-    search_fields = ['listing__title', 'reviewer__username', 'comment']
+    list_select_related = ['listing', 'reviewer']
+    raw_id_fields = ['listing', 'reviewer']
+    # Served by the username index; narrow to a listing with ?listing=<id>
+    search_fields = ['reviewer__username__startswith']
+    search_help_text = 'Start of the reviewer\'s username (case-sensitive).'
     readonly_fields = ['id', 'created_at', 'updated_at']
-    list_per_page = 25
     
     fieldsets = (
         ('Review Information', {
@@ -49,13 +150,50 @@ class ReviewAdmin(admin.ModelAdmin):
     )
 
 
+class BookingAdminForm(forms.ModelForm):
+    """
+    Checks that a pending or confirmed booking's stay is free.
+
+    The admin saves in the transaction the form is validated in, so the
+    listing stays locked (see availability.check_stay) until the booking
+    and its nights are saved.
+    """
+
+    class Meta:
+        model = Booking
+        fields = '__all__'
+
+    def clean(self):
+        cleaned_data = super().clean()
+        listing = cleaned_data.get('listing')
+        check_in = cleaned_data.get('check_in')
+        check_out = cleaned_data.get('check_out')
+        if listing is None or check_in is None or check_out is None:
+            return cleaned_data
+        if check_out <= check_in:
+            raise forms.ValidationError('Check-out date must be after check-in date.')
+        if cleaned_data.get('status') in ACTIVE_STATUSES:
+            exclude_booking = None if self.instance._state.adding else self.instance.pk
+            try:
+                with transaction.atomic():
+                    check_stay(listing.pk, check_in, check_out, exclude_booking=exclude_booking)
+            except BookingConflict:
+                raise forms.ValidationError('This listing is already booked for some of the selected dates.')
+        return cleaned_data
+
+
 @admin.register(Booking)
-class BookingAdmin(admin.ModelAdmin):
+class BookingAdmin(LargeTableAdmin):
+    form = BookingAdminForm
     list_display = ['id', 'listing', 'guest', 'check_in', 'check_out', 'status', 'total_price', 'created_at']
-    list_filter = ['status', 'created_at', 'check_in']
-    search_fields = ['guest__username', 'listing__title']
+    list_filter = ['status', 'created_at']
+    list_select_related = ['listing', 'guest']
+    raw_id_fields = ['listing', 'guest']
+    date_hierarchy = 'check_in'
+    # Served by the username index; narrow to a listing with ?listing=<id>
+    search_fields = ['guest__username__startswith']
+    search_help_text = 'Start of the guest\'s username (case-sensitive).'
     readonly_fields = ['id', 'created_at', 'updated_at', 'duration_days']
-    list_per_page = 25
     
     fieldsets = (
         ('Booking Information', {
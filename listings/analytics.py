@@ -0,0 +1,222 @@
+"""
+Host analytics: occupancy, revenue, average daily rate and cancellation
+rate per listing by day, week or month.
+
+Working these out from Booking rows would aggregate every booking of a
+host per request, so they are read from ListingDailyStats rollups instead,
+one row per listing and day. A booking adds to the rows of its nights
+(booked nights and its total price split evenly over them, for confirmed
+and completed bookings) and of its check-in day (one booking, and one
+cancellation once cancelled). When a booking changes, the booking signals
+subtract what its previous state added and add what its new state adds;
+bulk imports and the lifecycle jobs do the same for a whole batch.
+rebuild_stats() recomputes the rows of every listing from its bookings,
+for the backfill and to repair drift.
+"""
+from datetime import timedelta
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.db import transaction
+from django.db.models import F, Q, Sum
+from django.db.models.functions import TruncMonth, TruncWeek
+
+from .availability import nights_between
+from .models import ArchivedBooking, Booking, Listing, ListingDailyStats
+from .pricing import CENT, from_cents, to_cents
+
+# Bookings whose nights count as occupied and earned
+EARNING_STATUSES = ('confirmed', 'completed')
+PERIODS = ('day', 'week', 'month')
+STATS_FIELDS = ('booked_nights', 'revenue', 'bookings', 'cancellations')
+BOOKING_FIELDS = ('listing_id', 'check_in', 'check_out', 'status', 'total_price')
+
+
+def booking_state(booking):
+    """The fields of a booking its stats depend on, as stored by the booking signals."""
+    return {name: getattr(booking, name) for name in BOOKING_FIELDS}
+
+
+def add_booking(deltas, state, sign=1):
+    """
+    Add what a booking in ``state`` (see booking_state) counts for to
+    ``deltas``, a dict of (listing_id, date) -> [booked nights, revenue in
+    cents, bookings, cancellations]; ``sign=-1`` takes it away.
+    """
+    listing_id = state['listing_id']
+    row = deltas.setdefault((listing_id, state['check_in']), [0, 0, 0, 0])
+    row[2] += sign
+    if state['status'] == 'cancelled':
+        row[3] += sign
+    if state['status'] not in EARNING_STATUSES:
+        return deltas
+    nights = nights_between(state['check_in'], state['check_out'])
+    if nights:
+        # Whole cents per night, the odd cents on the first nights
+        share, odd = divmod(to_cents(state['total_price']), len(nights))
+        for index, night in enumerate(nights):
+            row = deltas.setdefault((listing_id, night), [0, 0, 0, 0])
+            row[0] += sign
+            row[1] += sign * (share + (index < odd))
+    return deltas
+
+
+def booking_deltas(previous, current):
+    """Stats changes of a booking going from the ``previous`` to the ``current`` state (either may be None)."""
+    deltas = {}
+    if previous:
+        add_booking(deltas, previous, sign=-1)
+    if current:
+        add_booking(deltas, current)
+    return deltas
+
+
+def apply_stats_deltas(deltas):
+    """
+    Add deltas (see add_booking) to the stored daily stats.
+
+    The rows are locked in a stable order and written with one
+    bulk_update, however many there are. Only increases create missing
+    rows: a decrease always follows an increase of the same row, so its
+    row can only be missing because the listing is being deleted. Rows
+    left at zero are deleted.
+    """
+    deltas = {key: change for key, change in deltas.items() if any(change)}
+    if not deltas:
+        return
+    # No savepoint: callers roll back with the booking change when this fails
+    with transaction.atomic(savepoint=False):
+        ListingDailyStats.objects.bulk_create(
+            [ListingDailyStats(listing_id=listing_id, date=day)
+             for (listing_id, day), change in deltas.items() if max(change) > 0],
+            ignore_conflicts=True,
+        )
+        dates = {}
+        for listing_id, day in deltas:
+            dates.setdefault(listing_id, []).append(day)
+        keys = Q()
+        for listing_id, days in dates.items():
+            keys |= Q(listing_id=listing_id, date__in=days)
+        rows = list(
+            ListingDailyStats.objects.select_for_update()
+            .filter(keys)
+            .order_by('listing_id', 'date')
+        )
+        for row in rows:
+            nights, cents, bookings, cancellations = deltas[(row.listing_id, row.date)]
+            row.booked_nights += nights
+            row.revenue = from_cents(to_cents(row.revenue) + cents)
+            row.bookings += bookings
+            row.cancellations += cancellations
+        ListingDailyStats.objects.bulk_update(rows, STATS_FIELDS, batch_size=500)
+        # Rows back at zero are removed, as rebuild_stats() would not write them
+        empty = [row.pk for row in rows if not (row.booked_nights or row.revenue or row.bookings or row.cancellations)]
+        if empty:
+            ListingDailyStats.objects.filter(pk__in=empty).delete()
+
+
+def stats_rows(deltas):
+    """New ListingDailyStats rows holding deltas (see add_booking), for listings without any yet."""
+    return [
+        ListingDailyStats(
+            listing_id=listing_id, date=day, booked_nights=nights,
+            revenue=from_cents(cents), bookings=bookings, cancellations=cancellations,
+        )
+        for (listing_id, day), (nights, cents, bookings, cancellations) in deltas.items()
+        if any((nights, cents, bookings, cancellations))
+    ]
+
+
+def rebuild_stats(listings=None, batch_size=500):
+    """
+    Recompute the daily stats of listings (default: all) from their
+    bookings, archived ones included.
+
+    Works through the listings in batches, one transaction each. Returns
+    {'listings', 'rows'}. Bookings changed while a batch is rebuilt may be
+    missed, so run it while bookings are quiet, or run it again.
+    """
+    if listings is None:
+        listings = Listing.objects.all()
+    listings = listings.order_by('pk').values_list('pk', flat=True)
+    counts = {'listings': 0, 'rows': 0}
+    last_pk = None
+
+    while True:
+        batch = listings if last_pk is None else listings.filter(pk__gt=last_pk)
+        batch = list(batch[:batch_size])
+        if not batch:
+            break
+        deltas = {}
+        # Archived bookings still count
+        for model in (Booking, ArchivedBooking):
+            stays = model.objects.filter(listing_id__in=batch).order_by().values(*BOOKING_FIELDS)
+            for state in stays.iterator(chunk_size=2000):
+                add_booking(deltas, state)
+        rows = stats_rows(deltas)
+        with transaction.atomic():
+            ListingDailyStats.objects.filter(listing_id__in=batch).delete()
+            ListingDailyStats.objects.bulk_create(rows, batch_size=1000)
+        counts['listings'] += len(batch)
+        counts['rows'] += len(rows)
+        last_pk = batch[-1]
+    return counts
+
+
+def _period_end(start, period):
+    """Last day of the period starting on ``start``."""
+    if period == 'week':
+        return start + timedelta(days=6)
+    if period == 'month':
+        following = (start.replace(day=28) + timedelta(days=4)).replace(day=1)
+        return following - timedelta(days=1)
+    return start
+
+
+def host_stats(owner, start, end, period='day', listing_id=None):
+    """
+    Stats of an owner's listings from ``start`` to ``end`` (both included),
+    one entry per listing and period with any activity, ordered by listing
+    and period. Reads only the rollups, with one query.
+    """
+    rows = ListingDailyStats.objects.filter(listing__owner=owner, date__gte=start, date__lte=end)
+    if listing_id is not None:
+        rows = rows.filter(listing_id=listing_id)
+    if period == 'week':
+        rows = rows.annotate(period_start=TruncWeek('date'))
+    elif period == 'month':
+        rows = rows.annotate(period_start=TruncMonth('date'))
+    else:
+        rows = rows.annotate(period_start=F('date'))
+    rows = (
+        rows.values('listing_id', 'period_start')
+        .annotate(
+            total_nights=Sum('booked_nights'), total_revenue=Sum('revenue'),
+            total_bookings=Sum('bookings'), total_cancellations=Sum('cancellations'),
+        )
+        .order_by('listing_id', 'period_start')
+    )
+
+    results = []
+    # One UUID to str conversion per listing
+    names = {}
+    for row in rows:
+        first = row['period_start']
+        days = (min(_period_end(first, period), end) - max(first, start)).days + 1
+        nights, bookings = row['total_nights'], row['total_bookings']
+        revenue = Decimal(row['total_revenue']).quantize(CENT)
+        name = names.get(row['listing_id'])
+        if name is None:
+            name = names[row['listing_id']] = str(row['listing_id'])
+        results.append({
+            'listing': name,
+            'period_start': first,
+            'days': days,
+            'booked_nights': nights,
+            'occupancy_rate': round(nights / days, 4),
+            'revenue': str(revenue),
+            'average_daily_rate': str((revenue / nights).quantize(CENT, ROUND_HALF_UP)) if nights else None,
+            'bookings': bookings,
+            'cancellations': row['total_cancellations'],
+            'cancellation_rate': round(row['total_cancellations'] / bookings, 4) if bookings else None,
+        })
+    return results
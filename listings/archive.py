@@ -0,0 +1,77 @@
+"""
+Archival of historical bookings.
+
+Every booking request reads the Booking table, mostly for current and
+upcoming stays, while the table keeps every stay ever booked. Completed
+and cancelled bookings whose check-out is more than
+BOOKING_ARCHIVE_AFTER_DAYS (365) days ago are moved to ArchivedBooking,
+so Booking and its indexes only grow with the bookings still in play.
+
+The job runs like the lifecycle jobs (see lifecycle.py): chunks of
+BOOKING_LIFECYCLE_CHUNK_SIZE bookings, each copied and deleted in one
+transaction, and a run that stops picks up where it left off, since moved
+bookings no longer match. Archived bookings hold no nights and keep
+counting in the host analytics, so nothing else changes when they move:
+the booking delete receivers skip bookings deleted while is_archiving()
+is true, and the booked nights go with the bookings.
+"""
+from contextvars import ContextVar
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .lifecycle import run_job
+from .models import ArchivedBooking, Booking
+
+ARCHIVE_STATUSES = ('completed', 'cancelled')
+COPIED_FIELDS = [field.attname for field in Booking._meta.concrete_fields]
+
+_archiving = ContextVar('listings_archiving', default=False)
+
+
+def is_archiving():
+    """Whether the bookings being deleted are moving to the archive."""
+    return _archiving.get()
+
+
+def include_archived(request):
+    """Whether a request asked for archived bookings too, with ``?include_archived=1``."""
+    return request.query_params.get('include_archived', '').lower() in ('true', '1')
+
+
+def archivable_bookings(today=None):
+    """Completed and cancelled bookings that checked out before the cutoff."""
+    today = today or timezone.localdate()
+    cutoff = today - timedelta(days=getattr(settings, 'BOOKING_ARCHIVE_AFTER_DAYS', 365))
+    return Booking.objects.filter(status__in=ARCHIVE_STATUSES, check_out__lt=cutoff)
+
+
+def archive_chunk(queryset, chunk_size):
+    """
+    Move up to ``chunk_size`` bookings of a queryset to the archive.
+
+    Rows locked by another worker are skipped. Returns the number moved.
+    """
+    with transaction.atomic():
+        rows = list(
+            queryset.select_for_update(skip_locked=True)
+            .order_by()
+            .values(*COPIED_FIELDS)[:chunk_size]
+        )
+        if not rows:
+            return 0
+        ids = [row['id'] for row in rows]
+        ArchivedBooking.objects.bulk_create([ArchivedBooking(**row) for row in rows])
+        token = _archiving.set(True)
+        try:
+            Booking.objects.filter(pk__in=ids).delete()
+        finally:
+            _archiving.reset(token)
+    return len(rows)
+
+
+def archive_bookings(today=None, **kwargs):
+    """Archive the completed and cancelled bookings past the cutoff."""
+    return run_job('archive_bookings', archivable_bookings(today), archive_chunk, **kwargs)
@@ -0,0 +1,153 @@
+"""
+Read-only listing and review endpoints written as native async views.
+
+Under ASGI, DRF viewsets run in a worker thread for every request. These
+views run on the event loop instead: rows are fetched with the async ORM
+(``aiterator``, ``afirst``, ``acount``) and related objects are joined in the
+same query, so serializing them is pure CPU work that never touches the
+database. Responses have the same shape as the sync viewsets.
+"""
+import functools
+
+from django.core.exceptions import ValidationError
+from django.http import HttpResponseNotAllowed, JsonResponse
+from rest_framework.utils.encoders import JSONEncoder
+from rest_framework.utils.urls import replace_query_param
+
+from .eager import eager_load
+from .models import Listing, Review
+from .pagination import KeysetPagination, apaginate, decode_cursor, encode_cursor, get_ordering, row_position
+from .serializers import ListingSerializer, ReviewSerializer
+from .views import ListingViewSet, ReviewViewSet
+
+LISTING_FILTERS = ('listing_type', 'is_available', 'location')
+REVIEW_FILTERS = ('rating', 'listing')
+
+
+def json_response(data, status=200):
+    return JsonResponse(data, status=status, encoder=JSONEncoder, safe=False)
+
+
+def require_GET(view):
+    """Async counterpart of django.views.decorators.http.require_GET."""
+    @functools.wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return HttpResponseNotAllowed(['GET', 'HEAD'])
+        return await view(request, *args, **kwargs)
+    return wrapper
+
+
+def filter_queryset(queryset, request, fields, ordering_fields, default_ordering):
+    """
+    Apply exact-match filters and an ``ordering`` parameter from the query string.
+
+    Raises ValueError for an unknown ordering field.
+    """
+    filters = {name: request.GET[name] for name in fields if request.GET.get(name, '') != ''}
+    if 'is_available' in filters:
+        filters['is_available'] = filters['is_available'].lower() in ('true', '1')
+    queryset = queryset.filter(**filters)
+
+    ordering = [term.strip() for term in request.GET.get('ordering', '').split(',') if term.strip()]
+    if any(term.lstrip('-') not in ordering_fields for term in ordering):
+        raise ValueError('Invalid ordering')
+    return queryset.order_by(*(ordering or default_ordering))
+
+
+class _QueryParams:
+    """Just enough of a DRF request for KeysetPagination.get_page_size()."""
+
+    def __init__(self, request):
+        self.query_params = request.GET
+
+
+async def paginated_response(request, queryset, serializer_class):
+    """Keyset page of a queryset, like KeysetPagination on the sync viewsets."""
+    pagination = KeysetPagination()
+    ordering = get_ordering(queryset)
+    page_size = pagination.get_page_size(_QueryParams(request))
+
+    position, reverse = None, False
+    cursor = request.GET.get(pagination.cursor_query_param)
+    if cursor:
+        try:
+            position, reverse = decode_cursor(cursor, ordering, queryset.model)
+        except ValueError:
+            return json_response({'detail': pagination.invalid_cursor_message}, status=404)
+
+    rows, has_more = await apaginate(queryset, ordering, page_size, position, reverse)
+    if reverse:
+        has_next, has_previous = True, has_more
+    else:
+        has_next, has_previous = has_more, position is not None
+
+    url = request.build_absolute_uri()
+    next_link = previous_link = None
+    if rows and has_next:
+        cursor = encode_cursor(ordering, row_position(rows[-1], ordering))
+        next_link = replace_query_param(url, pagination.cursor_query_param, cursor)
+    if rows and has_previous:
+        cursor = encode_cursor(ordering, row_position(rows[0], ordering), reverse=True)
+        previous_link = replace_query_param(url, pagination.cursor_query_param, cursor)
+
+    data = {
+        'next': next_link,
+        'previous': previous_link,
+        'results': serializer_class(rows, many=True).data,
+    }
+    if request.GET.get('count', '').lower() in ('true', '1'):
+        data['count'] = await queryset.acount()
+    return json_response(data)
+
+
+async def _list(request, queryset, serializer_class, fields, viewset):
+    try:
+        queryset = filter_queryset(queryset, request, fields, viewset.ordering_fields, viewset.ordering)
+    except ValueError as exc:
+        return json_response({'detail': str(exc)}, status=400)
+    except ValidationError as exc:
+        return json_response({'detail': exc.messages}, status=400)
+    return await paginated_response(request, eager_load(queryset, serializer_class), serializer_class)
+
+
+async def _retrieve(queryset, serializer_class, pk):
+    try:
+        instance = await eager_load(queryset.filter(pk=pk), serializer_class).afirst()
+    except ValidationError:
+        instance = None
+    if instance is None:
+        return json_response({'detail': 'Not found.'}, status=404)
+    return json_response(serializer_class(instance).data)
+
+
+@require_GET
+async def listing_list(request):
+    """
+    List listings with exact-match filters, ``ordering`` and keyset pagination.
+
+    Pass ``count=1`` to include the number of matching listings.
+    """
+    return await _list(request, Listing.objects.all(), ListingSerializer, LISTING_FILTERS, ListingViewSet)
+
+
+@require_GET
+async def listing_detail(request, pk):
+    """Get one listing."""
+    return await _retrieve(Listing.objects.all(), ListingSerializer, pk)
+
+
+@require_GET
+async def review_list(request):
+    """
+    List reviews with exact-match filters, ``ordering`` and keyset pagination.
+
+    Pass ``count=1`` to include the number of matching reviews.
+    """
+    return await _list(request, Review.objects.all(), ReviewSerializer, REVIEW_FILTERS, ReviewViewSet)
+
+
+@require_GET
+async def review_detail(request, pk):
+    """Get one review."""
+    return await _retrieve(Review.objects.all(), ReviewSerializer, pk)
@@ -0,0 +1,114 @@
+import random
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, OperationalError, transaction
+from django.db.models import Exists, OuterRef
+
+from .models import BookedNight, Listing
+
+# Booking statuses that hold the listing's nights
+ACTIVE_STATUSES = ('pending', 'confirmed')
+
+
+class BookingConflict(Exception):
+    """Raised when some night of a stay is already held by another booking."""
+
+
+def nights_between(check_in, check_out):
+    """Every night of a stay, from check-in up to (not including) check-out."""
+    return [check_in + timedelta(days=offset) for offset in range((check_out - check_in).days)]
+
+
+def booked_nights(check_in, check_out, exclude_booking=None):
+    """Occupied nights overlapping the given stay."""
+    nights = BookedNight.objects.filter(night__gte=check_in, night__lt=check_out)
+    if exclude_booking is not None:
+        nights = nights.exclude(booking_id=exclude_booking)
+    return nights
+
+
+def is_available(listing_id, check_in, check_out, exclude_booking=None):
+    """Whether no other active booking holds any night of the stay."""
+    return not booked_nights(check_in, check_out, exclude_booking).filter(
+        listing_id=listing_id
+    ).exists()
+
+
+def filter_available(queryset, check_in, check_out):
+    """
+    Restrict a listing queryset to listings free for the whole stay.
+
+    Each listing is probed with an index seek on (listing, night).
+    """
+    return queryset.filter(is_available=True).exclude(
+        Exists(booked_nights(check_in, check_out).filter(listing_id=OuterRef('pk')))
+    )
+
+
+def occupancy_key(listing_id, check_in, check_out, status):
+    """The part of a booking that decides which nights it holds."""
+    if status not in ACTIVE_STATUSES:
+        return None
+    return (listing_id, check_in, check_out)
+
+
+def sync_booked_nights(booking, previous_key=None):
+    """
+    Make the booked nights of a booking match its dates and status.
+
+    Raises IntegrityError when another booking already holds one of the nights.
+    """
+    key = occupancy_key(booking.listing_id, booking.check_in, booking.check_out, booking.status)
+    if key == previous_key:
+        return
+
+    if previous_key is not None:
+        BookedNight.objects.filter(booking=booking).delete()
+    if key is not None:
+        BookedNight.objects.bulk_create([
+            BookedNight(listing_id=booking.listing_id, booking=booking, night=night)
+            for night in nights_between(booking.check_in, booking.check_out)
+        ])
+
+
+def check_stay(listing_id, check_in, check_out, exclude_booking=None):
+    """
+    Lock the listing's row and make sure the stay is free.
+
+    The lock is held until the surrounding transaction ends, so the stay
+    stays free for a booking saved in the same transaction. Raises
+    BookingConflict when some night is held by another booking.
+    """
+    list(Listing.objects.select_for_update().filter(pk=listing_id).values_list('pk'))
+    if not is_available(listing_id, check_in, check_out, exclude_booking):
+        raise BookingConflict()
+
+
+def reserve(listing_id, check_in, check_out, save, exclude_booking=None):
+    """
+    Run ``save`` atomically for a stay, serialized per listing.
+
+    The listing row is locked with SELECT ... FOR UPDATE before availability
+    is re-checked, so two concurrent requests for the same listing cannot both
+    pass the check. The unique (listing, night) index is the last line of
+    defence on backends without row locks. Deadlocks and lock timeouts are
+    retried with jittered exponential backoff, up to BOOKING_RESERVE_RETRIES.
+
+    Raises BookingConflict when the stay is no longer free.
+    """
+    retries = getattr(settings, 'BOOKING_RESERVE_RETRIES', 3)
+    backoff = getattr(settings, 'BOOKING_RESERVE_BACKOFF', 0.05)
+
+    for attempt in range(retries + 1):
+        try:
+            with transaction.atomic():
+                check_stay(listing_id, check_in, check_out, exclude_booking)
+                return save()
+        except IntegrityError:
+            raise BookingConflict()
+        except OperationalError:
+            if attempt == retries:
+                raise
+            time.sleep(backoff * (2 ** attempt) * random.uniform(0.5, 1.5))
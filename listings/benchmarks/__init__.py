@@ -0,0 +1,21 @@
+"""
+Performance benchmarks, run with ``python manage.py benchmark <name>``.
+
+Each benchmark module exposes ``add_arguments(parser)`` and
+``run(options, stdout)``. They create their own data against the configured
+database, so point them at a local or disposable database.
+"""
+
+BENCHMARKS = {
+    'analytics': 'listings.benchmarks.analytics',
+    'archive': 'listings.benchmarks.archive',
+    'async_views': 'listings.benchmarks.async_views',
+    'booking_contention': 'listings.benchmarks.booking_contention',
+    'conditional': 'listings.benchmarks.conditional',
+    'endpoints': 'listings.benchmarks.endpoints',
+    'pagination': 'listings.benchmarks.pagination',
+    'pricing': 'listings.benchmarks.pricing',
+    'serialization': 'listings.benchmarks.serialization',
+    'similar': 'listings.benchmarks.similar',
+    'startup': 'listings.benchmarks.startup',
+}
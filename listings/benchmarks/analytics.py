@@ -0,0 +1,113 @@
+"""
+Host analytics from the daily rollups versus from Booking rows.
+
+Seeds a host with listings and a year of bookings, writes their daily
+stats with rebuild_stats(), then times host_stats() (one aggregate query
+over ListingDailyStats) against working the same numbers out per request
+from the host's bookings, and checks both agree.
+"""
+import random
+import uuid
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.management.base import CommandError
+from django.db.models import Q
+
+from listings.analytics import BOOKING_FIELDS, add_booking, host_stats, rebuild_stats
+from listings.models import Booking, Listing, ListingDailyStats
+
+from .pagination import seed_listings
+from .utils import format_summary, stopwatch, summarize
+
+
+def add_arguments(parser):
+    parser.add_argument('--listings', type=int, default=50, help='Listings of the host')
+    parser.add_argument('--bookings', type=int, default=20000, help='Bookings over the year')
+    parser.add_argument('--repeat', type=int, default=20, help='Timed reads per period')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--keep', action='store_true', help='Keep the generated data')
+
+
+def seed_bookings(owner, listings, count, first, rng, batch_size=5000):
+    """Bulk insert bookings of a year, in every status, without their booked nights."""
+    statuses = ['pending', 'confirmed', 'completed', 'cancelled']
+    bookings = []
+    for _ in range(count):
+        listing = rng.choice(listings)
+        check_in = first + timedelta(days=rng.randrange(365))
+        stay = rng.randrange(1, 15)
+        bookings.append(Booking(
+            listing=listing, guest=owner, check_in=check_in, check_out=check_in + timedelta(days=stay),
+            total_price=listing.price_per_night * stay, status=rng.choices(statuses, weights=[1, 3, 5, 1])[0],
+        ))
+    Booking.objects.bulk_create(bookings, batch_size=batch_size)
+
+
+def _period_start(day, period):
+    if period == 'week':
+        return day - timedelta(days=day.weekday())
+    if period == 'month':
+        return day.replace(day=1)
+    return day
+
+
+def stats_from_bookings(owner, start, end, period):
+    """The totals of host_stats() per (listing, period), from the host's bookings."""
+    bookings = Booking.objects.filter(
+        Q(check_in__range=(start, end)) | Q(check_in__lte=end, check_out__gt=start),
+        listing__owner=owner,
+    ).values(*BOOKING_FIELDS)
+    deltas = {}
+    for state in bookings:
+        add_booking(deltas, state)
+    totals = {}
+    for (listing_id, day), change in deltas.items():
+        if start <= day <= end and any(change):
+            row = totals.setdefault((str(listing_id), _period_start(day, period)), [0, 0, 0, 0])
+            for index, value in enumerate(change):
+                row[index] += value
+    return {key: (nights, Decimal(cents) / 100, bookings, cancellations)
+            for key, (nights, cents, bookings, cancellations) in totals.items()}
+
+
+def run(options, stdout):
+    rng = random.Random(options['seed'])
+    owner = User.objects.create(username=f'bench-{uuid.uuid4().hex[:12]}')
+    first = date.today() - timedelta(days=180)
+    start, end = first, first + timedelta(days=364)
+
+    try:
+        stdout.write(f"Seeding {options['listings']} listings and {options['bookings']} bookings...")
+        seed_listings(owner, options['listings'])
+        listings = list(Listing.objects.filter(owner=owner))
+        seed_bookings(owner, listings, options['bookings'], first, rng)
+        with stopwatch() as timer:
+            counts = rebuild_stats(Listing.objects.filter(owner=owner))
+        stdout.write(f"Backfilled {counts['rows']} daily stats rows in {timer['elapsed']:.2f}s")
+
+        for period in ('day', 'week', 'month'):
+            rollup = {
+                (row['listing'], row['period_start']):
+                    (row['booked_nights'], Decimal(row['revenue']), row['bookings'], row['cancellations'])
+                for row in host_stats(owner, start, end, period)
+            }
+            if rollup != stats_from_bookings(owner, start, end, period):
+                raise CommandError(f'{period}: the rollups differ from the bookings')
+
+            rollup_samples, booking_samples = [], []
+            for _ in range(options['repeat']):
+                with stopwatch() as timer:
+                    host_stats(owner, start, end, period)
+                rollup_samples.append(timer['elapsed'])
+                with stopwatch() as timer:
+                    stats_from_bookings(owner, start, end, period)
+                booking_samples.append(timer['elapsed'])
+            stdout.write(format_summary(f'{period} from rollups', summarize(rollup_samples)))
+            stdout.write(format_summary(f'{period} from bookings', summarize(booking_samples)))
+    finally:
+        if not options['keep']:
+            # Drop the rollups first so deleting the bookings has nothing to adjust
+            ListingDailyStats.objects.filter(listing__owner=owner).delete()
+            owner.delete()
@@ -0,0 +1,110 @@
+"""
+Booking list latency before and after archiving a guest's history.
+
+Seeds a guest with ``--history`` bookings that ended years ago and
+``--current`` upcoming ones, times the booking list endpoint with the
+orderings and filters guests use, archives the history as the archival
+job would (only the generated guest's), and times the same requests
+again, plus the list that includes the archive.
+"""
+import uuid
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.management.base import CommandError
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from listings.archive import archivable_bookings, archive_chunk
+from listings.lifecycle import run_job
+from listings.models import Booking, Listing
+
+from .utils import format_summary, stopwatch, summarize
+
+
+def add_arguments(parser):
+    parser.add_argument('--history', type=int, default=50000, help='Bookings that ended over a year ago')
+    parser.add_argument('--current', type=int, default=50, help='Upcoming bookings')
+    parser.add_argument('--repeat', type=int, default=20, help='Requests per scenario')
+    parser.add_argument('--keep', action='store_true', help='Keep the generated data')
+
+
+def seed_bookings(guest, listing, history, current, batch_size=5000):
+    """Old completed and cancelled bookings first, then upcoming ones, so ``created_at`` follows the stays."""
+    today = date.today()
+    first = today - timedelta(days=365 * 5)
+    stays = [
+        (first + timedelta(days=index * 3 % 1400), 'cancelled' if index % 10 == 0 else 'completed')
+        for index in range(history)
+    ] + [
+        (today + timedelta(days=1 + index), 'confirmed' if index % 3 else 'pending')
+        for index in range(current)
+    ]
+    for start in range(0, len(stays), batch_size):
+        Booking.objects.bulk_create([
+            Booking(
+                listing=listing, guest=guest, check_in=check_in, check_out=check_in + timedelta(days=2),
+                total_price=Decimal('100.00'), status=status,
+            )
+            for check_in, status in stays[start:start + batch_size]
+        ])
+
+
+def scenarios():
+    """(name, query string) of each timed request."""
+    return [
+        ('first page', ''),
+        ('upcoming by check-in', '?ordering=check_in&status=confirmed'),
+        ('pending', '?status=pending'),
+        ('by check-out', '?ordering=-check_out'),
+    ]
+
+
+def time_requests(client, path, repeat):
+    samples = []
+    for _ in range(repeat):
+        with stopwatch() as timer:
+            response = client.get(path)
+        if response.status_code != 200:
+            raise CommandError(f'GET {path} returned {response.status_code}')
+        samples.append(timer['elapsed'])
+    return samples
+
+
+def run(options, stdout):
+    suffix = uuid.uuid4().hex[:12]
+    guest = User.objects.create(username=f'bench-guest-{suffix}')
+    host = User.objects.create(username=f'bench-host-{suffix}')
+    listing = Listing.objects.create(
+        title='Benchmark archive listing', description='', location='Benchmark',
+        price_per_night=50, max_guests=4, owner=host,
+    )
+    client = APIClient()
+    client.force_authenticate(guest)
+    path = reverse('booking-list')
+
+    try:
+        stdout.write(f"Seeding {options['history']} past and {options['current']} upcoming bookings...")
+        seed_bookings(guest, listing, options['history'], options['current'])
+
+        before = {name: time_requests(client, path + query, options['repeat']) for name, query in scenarios()}
+        result = run_job(
+            'archive_bookings', archivable_bookings().filter(guest=guest), archive_chunk,
+            chunk_size=1000, max_chunks=options['history'] // 1000 + 1,
+        )
+        stdout.write(f"Archived {result['rows']} bookings in {result['seconds']}s ({result['rows_per_second']:,.0f} rows/s)")
+
+        for name, query in scenarios():
+            stdout.write(format_summary(f'{name} before', summarize(before[name])))
+            stdout.write(format_summary(f'{name} after', summarize(time_requests(client, path + query, options['repeat']))))
+        archived = time_requests(client, path + '?include_archived=1', options['repeat'])
+        stdout.write(format_summary('first page with the archive', summarize(archived)))
+    finally:
+        if not options['keep']:
+            # Archived bookings are deleted without the booking signals
+            while archive_chunk(Booking.objects.filter(guest=guest), 5000):
+                pass
+            listing.delete()
+            guest.delete()
+            host.delete()
@@ -0,0 +1,88 @@
+"""
+Throughput and latency of the async read endpoints against the sync viewsets.
+
+Seeds listings with reviews, then fires the same list and detail requests at
+the DRF viewsets and at the native async views through Django's ASGI
+handler, with a fixed number of requests in flight. The response cache is
+disabled so both paths hit the database.
+"""
+import asyncio
+import time
+import uuid
+
+from django.contrib.auth.models import User
+from django.test import AsyncClient, override_settings
+from django.urls import reverse
+
+from listings.models import Listing, Review
+
+from .pagination import seed_listings
+from .utils import format_summary, summarize
+
+
+def add_arguments(parser):
+    parser.add_argument('--listings', type=int, default=500)
+    parser.add_argument('--requests', type=int, default=400, help='Requests per endpoint')
+    parser.add_argument('--concurrency', type=int, default=20, help='Requests in flight')
+    parser.add_argument('--keep', action='store_true', help='Keep the generated data')
+
+
+def seed_reviews(listings, reviewer):
+    Review.objects.bulk_create([
+        Review(listing=listing, reviewer=reviewer, rating=1 + index % 5, comment='Benchmark review')
+        for index, listing in enumerate(listings)
+    ])
+
+
+async def load(paths, total, concurrency):
+    """Issue ``total`` GETs over ``paths`` with ``concurrency`` in flight; (req/s, samples)."""
+    client = AsyncClient()
+    samples = []
+    queue = asyncio.Queue()
+    for index in range(total):
+        queue.put_nowait(paths[index % len(paths)])
+
+    async def worker():
+        while not queue.empty():
+            path = queue.get_nowait()
+            start = time.perf_counter()
+            response = await client.get(path)
+            samples.append(time.perf_counter() - start)
+            if response.status_code != 200:
+                raise RuntimeError(f'GET {path} returned {response.status_code}')
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return total / (time.perf_counter() - start), samples
+
+
+def run(options, stdout):
+    owner = User.objects.create(username=f'bench-{uuid.uuid4().hex[:12]}')
+    try:
+        stdout.write(f"Seeding {options['listings']} listings...")
+        seed_listings(owner, options['listings'])
+        listings = list(Listing.objects.filter(owner=owner))
+        seed_reviews(listings, owner)
+        reviews = list(Review.objects.filter(reviewer=owner).values_list('pk', flat=True))
+
+        details = [str(listing.pk) for listing in listings[:50]]
+        review_details = [str(pk) for pk in reviews[:50]]
+        endpoints = [
+            ('listing list', [reverse('listing-list')], [reverse('async-listing-list')]),
+            ('listing detail',
+             [reverse('listing-detail', args=[pk]) for pk in details],
+             [reverse('async-listing-detail', args=[pk]) for pk in details]),
+            ('review list', [reverse('review-list')], [reverse('async-review-list')]),
+            ('review detail',
+             [reverse('review-detail', args=[pk]) for pk in review_details],
+             [reverse('async-review-detail', args=[pk]) for pk in review_details]),
+        ]
+
+        with override_settings(LISTINGS_RESPONSE_CACHE={'ENABLED': False}):
+            for label, sync_paths, async_paths in endpoints:
+                for kind, paths in (('sync', sync_paths), ('async', async_paths)):
+                    rate, samples = asyncio.run(load(paths, options['requests'], options['concurrency']))
+                    stdout.write(f'{format_summary(f"{kind} {label}", summarize(samples))} {rate:8.1f} req/s')
+    finally:
+        if not options['keep']:
+            owner.delete()
@@ -0,0 +1,122 @@
+"""
+Concurrent booking creation against a single listing.
+
+Many threads try to book overlapping stays on the same listing at once,
+going through the same reserve() path as BookingViewSet.perform_create.
+Afterwards the committed bookings are checked for overlaps and the
+throughput is reported. Use a database that allows concurrent
+connections (MySQL, or a file-backed SQLite database).
+"""
+import random
+import threading
+import uuid
+from datetime import date, timedelta
+
+from django.contrib.auth.models import User
+from django.core.management.base import CommandError
+from django.db import OperationalError, connection
+
+from listings.availability import ACTIVE_STATUSES, BookingConflict, reserve
+from listings.models import Booking, Listing
+
+from .utils import stopwatch, summarize, format_summary
+
+
+def add_arguments(parser):
+    parser.add_argument('--threads', type=int, default=16, help='Concurrent clients')
+    parser.add_argument('--attempts', type=int, default=50, help='Booking attempts per client')
+    parser.add_argument('--window-days', type=int, default=30, help='Days the stays are spread over')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--keep', action='store_true', help='Keep the generated listing and bookings')
+
+
+def _client(listing, guest, options, seed, results, lock):
+    rng = random.Random(seed)
+    start = date.today() + timedelta(days=1)
+    latencies, outcomes = [], {'committed': 0, 'conflicts': 0, 'errors': 0}
+
+    try:
+        for _ in range(options['attempts']):
+            check_in = start + timedelta(days=rng.randrange(options['window_days']))
+            check_out = check_in + timedelta(days=rng.randint(1, 4))
+
+            def save():
+                return Booking.objects.create(
+                    listing=listing, guest=guest, check_in=check_in,
+                    check_out=check_out, guests_count=1, total_price=0,
+                )
+
+            with stopwatch() as timer:
+                try:
+                    reserve(listing.pk, check_in, check_out, save)
+                    outcomes['committed'] += 1
+                except BookingConflict:
+                    outcomes['conflicts'] += 1
+                except OperationalError:
+                    outcomes['errors'] += 1
+            latencies.append(timer['elapsed'])
+    finally:
+        connection.close()
+
+    with lock:
+        results['latencies'].extend(latencies)
+        for key, value in outcomes.items():
+            results[key] += value
+
+
+def _overlaps(listing):
+    """Pairs of active bookings on the listing whose stays overlap."""
+    bookings = list(
+        Booking.objects.filter(listing=listing, status__in=ACTIVE_STATUSES)
+        .order_by('check_in')
+        .values_list('check_in', 'check_out')
+    )
+    return [
+        (previous, current)
+        for previous, current in zip(bookings, bookings[1:])
+        if current[0] < previous[1]
+    ]
+
+
+def run(options, stdout):
+    owner = User.objects.create(username=f'bench-{uuid.uuid4().hex[:12]}')
+    listing = Listing.objects.create(
+        title='Contention benchmark', description='', price_per_night=100,
+        location='Benchmark', max_guests=2, owner=owner,
+    )
+
+    results = {'latencies': [], 'committed': 0, 'conflicts': 0, 'errors': 0}
+    lock = threading.Lock()
+    threads = [
+        threading.Thread(target=_client, args=(listing, owner, options, options['seed'] + index, results, lock))
+        for index in range(options['threads'])
+    ]
+
+    try:
+        with stopwatch() as timer:
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        attempts = len(results['latencies'])
+        overlaps = _overlaps(listing)
+        elapsed = timer['elapsed']
+
+        stdout.write(
+            f"{options['threads']} clients, {attempts} attempts in {elapsed:.2f}s: "
+            f"{results['committed']} committed, {results['conflicts']} conflicts, "
+            f"{results['errors']} lock errors"
+        )
+        stdout.write(
+            f"throughput: {attempts / elapsed:.1f} attempts/s, "
+            f"{results['committed'] / elapsed:.1f} bookings/s"
+        )
+        stdout.write(format_summary('reserve() latency', summarize(results['latencies'])))
+        stdout.write(f"overlapping committed bookings: {len(overlaps)}")
+
+        if overlaps:
+            raise CommandError(f'Double bookings detected: {overlaps[:5]}')
+    finally:
+        if not options['keep']:
+            owner.delete()
@@ -0,0 +1,100 @@
+"""
+Bandwidth, CPU and queries saved by conditional GET.
+
+Requests each read endpoint that sends an ETag ``--repeat`` times without
+and then with ``If-None-Match`` set to the ETag of the first response, and
+reports the response bytes, server CPU time (process time, so waiting on
+the database is not counted) and queries per request of both, with the
+response cache disabled so a full response is built every time. Runs
+against the data of ``manage.py seed_benchmark_data`` (a small data set is
+generated if there is none).
+"""
+import time
+
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from . import seed
+from .endpoints import Fixtures
+
+
+def add_arguments(parser):
+    parser.add_argument('--repeat', type=int, default=50, help='Requests per scenario and mode')
+
+
+def scenarios(fixtures):
+    """(name, user, path) of each scenario."""
+    f = fixtures
+    return [
+        ('listing list', None, reverse('listing-list')),
+        ('listing list ordered by price', None, reverse('listing-list') + '?ordering=price_per_night'),
+        ('listing list sparse', None, reverse('listing-list') + '?fields=id,title,price_per_night'),
+        ('listing search', None, reverse('listing-list') + f'?search={f.word}+{f.city}'),
+        ('listing detail', None, reverse('listing-detail', args=[f.listing.pk])),
+        ('listing reviews', None, reverse('listing-reviews', args=[f.popular.pk])),
+        ('review list', None, reverse('review-list')),
+        ('booking list', f.guest, reverse('booking-list')),
+        ('booking detail', f.guest, reverse('booking-detail', args=[f.booking.pk])),
+    ]
+
+
+def measure(client, path, repeat, headers):
+    """(bytes, CPU seconds, queries) per request, averaged over ``repeat`` requests."""
+    size = cpu = queries = 0
+    for _ in range(repeat):
+        with CaptureQueriesContext(connection) as captured:
+            start = time.process_time()
+            response = client.get(path, **headers)
+            cpu += time.process_time() - start
+        if response.status_code not in (200, 304):
+            raise CommandError(f'GET {path} returned {response.status_code}: {response.content[:200]!r}')
+        size += len(response.content)
+        queries += len(captured)
+    return size / repeat, cpu / repeat, queries / repeat, response.status_code
+
+
+def run(options, stdout):
+    if not seed.generated_users().exists():
+        stdout.write('No generated data found; generating the small data set...')
+        seed.generate(**seed.PRESETS['small'])
+
+    fixtures = Fixtures()
+    repeat = options['repeat']
+    totals = {'full_bytes': 0, 'bytes': 0, 'full_cpu': 0.0, 'cpu': 0.0}
+    stdout.write(f"{'scenario':<32} {'full':>24}   {'revalidated':>24}   saved")
+    try:
+        with override_settings(LISTINGS_RESPONSE_CACHE={'ENABLED': False}):
+            for name, user, path in scenarios(fixtures):
+                client = APIClient()
+                if user is not None:
+                    client.force_authenticate(user)
+                etag = client.get(path).get('ETag')
+                if not etag:
+                    raise CommandError(f'GET {path} sent no ETag')
+
+                full_bytes, full_cpu, full_queries, _ = measure(client, path, repeat, {})
+                size, cpu, queries, status = measure(client, path, repeat, {'HTTP_IF_NONE_MATCH': etag})
+                if status != 304:
+                    raise CommandError(f'GET {path} with its own ETag returned {status}, not 304')
+
+                totals['full_bytes'] += full_bytes
+                totals['bytes'] += size
+                totals['full_cpu'] += full_cpu
+                totals['cpu'] += cpu
+                stdout.write(
+                    f'{name:<32} {full_bytes:8.0f}B {full_cpu * 1000:6.2f}ms q={full_queries:<3.0f}  '
+                    f'{size:8.0f}B {cpu * 1000:6.2f}ms q={queries:<3.0f}  '
+                    f'{full_bytes - size:8.0f}B {(1 - cpu / full_cpu) * 100 if full_cpu else 0:5.1f}% CPU'
+                )
+    finally:
+        fixtures.cleanup()
+
+    stdout.write(
+        f"Revalidating every scenario once: {totals['full_bytes'] - totals['bytes']:.0f} bytes and "
+        f"{(totals['full_cpu'] - totals['cpu']) * 1000:.2f}ms CPU saved "
+        f"({(1 - totals['cpu'] / totals['full_cpu']) * 100 if totals['full_cpu'] else 0:.1f}% of the CPU)"
+    )
@@ -0,0 +1,251 @@
+"""
+Latency, queries and memory of every API route, checked against budgets.
+
+Runs against the data generated by ``manage.py seed_benchmark_data`` (a
+small data set is generated if there is none). Each scenario is requested
+``--repeat`` times through the test client with the response cache
+disabled; the report gives latency percentiles, queries per request and
+the peak memory allocated while serving one request (measured in a
+separate, untimed pass since tracing allocations slows everything down).
+
+Budgets live in a JSON baseline: ``max_queries`` and ``max_p95_ms`` per
+scenario. The run fails when a scenario goes over either budget (a missing
+or null budget is not checked). ``--update-baseline`` writes the measured
+query counts and p95 latencies, with ``--latency-headroom`` added, as the
+new budgets; record latency budgets on the machine that enforces them.
+"""
+import json
+import os
+import tracemalloc
+from datetime import date, timedelta
+
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from listings.models import Booking, Listing, Review
+
+from . import seed
+from .utils import format_summary, stopwatch, summarize
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), 'baseline.json')
+
+
+def add_arguments(parser):
+    parser.add_argument('--repeat', type=int, default=30, help='Timed requests per scenario')
+    parser.add_argument('--only', nargs='+', help='Scenarios to run (default: all)')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help='Budget file')
+    parser.add_argument('--update-baseline', action='store_true', help='Record this run as the new budgets')
+    parser.add_argument('--latency-headroom', type=float, default=0.5,
+                        help='Fraction added to the measured p95 when recording latency budgets')
+    parser.add_argument('--output', help='Also write the measurements to this JSON file')
+
+
+class Fixtures:
+    """The users and rows the scenarios request, picked from the generated data."""
+
+    def __init__(self):
+        self.host = seed.generated_users().get(username=f'{seed.USER_PREFIX}host-0')
+        self.guest = seed.generated_users().get(username=f'{seed.USER_PREFIX}guest-0')
+        self.listing = Listing.objects.filter(owner=self.host).order_by('-review_count').first()
+        self.popular = Listing.objects.order_by('-review_count').first()
+        self.review = Review.objects.filter(listing=self.popular).first()
+        self.booking = Booking.objects.filter(guest=self.guest).first()
+        self.city = self.popular.location
+        self.latitude, self.longitude = self.popular.latitude, self.popular.longitude
+        self.word = self.popular.title.split()[0]
+
+        # Bookings made by the benchmark go to one dedicated listing, on
+        # nights no generated booking uses
+        self.bookable = Listing.objects.create(
+            title='Benchmark bookable listing', description='', location=self.city,
+            price_per_night=100, max_guests=10, owner=self.host,
+        )
+        self.next_night = date.today() + timedelta(days=5 * 365)
+        self.created = []
+
+    def stay(self):
+        check_in = self.next_night
+        self.next_night += timedelta(days=3)
+        return check_in, check_in + timedelta(days=2)
+
+    def pending_booking(self):
+        check_in, check_out = self.stay()
+        booking = Booking.objects.create(
+            listing=self.bookable, guest=self.guest, check_in=check_in, check_out=check_out,
+            guests_count=2, total_price=200, status='pending',
+        )
+        self.created.append(booking.pk)
+        return booking
+
+    def booking_payload(self):
+        check_in, check_out = self.stay()
+        return {
+            'listing': str(self.bookable.pk), 'check_in': check_in.isoformat(),
+            'check_out': check_out.isoformat(), 'guests_count': 2, 'total_price': '200.00',
+        }
+
+    def cleanup(self):
+        Booking.objects.filter(pk__in=self.created).delete()
+        self.bookable.delete()
+
+
+def scenarios(fixtures):
+    """
+    (name, user, method, path or path factory, body factory) of each scenario.
+
+    Path and body factories are called before each request, outside the timing.
+    """
+    f = fixtures
+    stay_in = date.today() + timedelta(days=30)
+    stay = f'check_in={stay_in}&check_out={stay_in + timedelta(days=3)}&guests=2'
+    lat, lng = f.latitude, f.longitude
+    listing = reverse('listing-detail', args=[f.listing.pk])
+    return [
+        ('listing list', None, 'get', reverse('listing-list'), None),
+        ('listing list ordered by price', None, 'get', reverse('listing-list') + '?ordering=price_per_night', None),
+        ('listing filter type+city', None, 'get',
+         reverse('listing-list') + f'?listing_type=apartment&location={f.city}', None),
+        ('listing filter stay', None, 'get', reverse('listing-list') + '?' + stay, None),
+        ('listing filter radius', None, 'get', reverse('listing-list') + f'?lat={lat}&lng={lng}&radius_km=5', None),
+        ('listing filter bbox', None, 'get',
+         reverse('listing-list') + f'?bbox={lat - 1},{lng - 1},{lat + 1},{lng + 1}', None),
+        ('listing search', None, 'get', reverse('listing-list') + f'?search={f.word}+{f.city}', None),
+        ('listing filter amenities', None, 'get', reverse('listing-list') + '?amenities=wifi,kitchen', None),
+        ('listing facets', None, 'get', reverse('listing-list') + '?facets=1', None),
+        ('listing facets filtered', None, 'get',
+         reverse('listing-list') + f'?facets=1&location={f.city}&amenities_any=pool,gym', None),
+        ('listing autocomplete', None, 'get', reverse('listing-autocomplete') + f'?q={f.word[:3]}', None),
+        ('listing quote', None, 'get',
+         reverse('listing-quote') + f'?{stay}&ids={f.listing.pk},{f.popular.pk},{f.bookable.pk}', None),
+        ('listing detail', None, 'get', listing, None),
+        ('listing reviews', None, 'get', reverse('listing-reviews', args=[f.popular.pk]), None),
+        ('listing similar', None, 'get', reverse('listing-similar', args=[f.popular.pk]), None),
+        ('listing update', f.host, 'patch', listing, lambda: {'max_guests': f.listing.max_guests}),
+        ('my_listings', f.host, 'get', reverse('listing-my-listings'), None),
+        ('listing analytics', f.host, 'get', reverse('listing-analytics') + '?period=week', None),
+        ('cache_stats', 'admin', 'get', reverse('listing-cache-stats'), None),
+        ('metrics', 'admin', 'get', reverse('metrics'), None),
+        ('review list', None, 'get', reverse('review-list'), None),
+        ('review list by listing', None, 'get', reverse('review-list') + f'?listing={f.popular.pk}', None),
+        ('review detail', None, 'get', reverse('review-detail', args=[f.review.pk]), None),
+        ('my_reviews', f.guest, 'get', reverse('review-my-reviews'), None),
+        ('booking list', f.guest, 'get', reverse('booking-list'), None),
+        ('booking list with archive', f.guest, 'get', reverse('booking-list') + '?include_archived=1', None),
+        ('booking detail', f.guest, 'get', reverse('booking-detail', args=[f.booking.pk]), None),
+        ('booking create', f.guest, 'post', reverse('booking-list'), f.booking_payload),
+        ('booking cancel', f.guest, 'post',
+         lambda: reverse('booking-cancel', args=[f.pending_booking().pk]), None),
+        ('booking confirm', f.guest, 'post',
+         lambda: reverse('booking-confirm', args=[f.pending_booking().pk]), None),
+        ('async listing list', None, 'get', reverse('async-listing-list'), None),
+        ('async listing detail', None, 'get', reverse('async-listing-detail', args=[f.listing.pk]), None),
+        ('async review list', None, 'get', reverse('async-review-list'), None),
+        ('async review detail', None, 'get', reverse('async-review-detail', args=[f.review.pk]), None),
+    ]
+
+
+def _request(client, method, path, body):
+    if callable(path):
+        path = path()
+    data = body() if body else None
+    return lambda: getattr(client, method)(path, data, format='json')
+
+
+def measure(client, method, path, body, repeat):
+    """Time ``repeat`` requests; returns (latencies, queries per request, peak bytes)."""
+    samples, queries = [], []
+    for _ in range(repeat):
+        send = _request(client, method, path, body)
+        with CaptureQueriesContext(connection) as captured:
+            with stopwatch() as timer:
+                response = send()
+        if response.status_code >= 400:
+            raise CommandError(f'{method.upper()} {response.request["PATH_INFO"]} returned '
+                               f'{response.status_code}: {response.content[:200]!r}')
+        samples.append(timer['elapsed'])
+        queries.append(len(captured))
+
+    send = _request(client, method, path, body)
+    tracemalloc.start()
+    try:
+        send()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return samples, queries, peak
+
+
+def load_baseline(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path) as baseline:
+        return json.load(baseline)
+
+
+def check_budget(result, budget):
+    """Descriptions of the budgets a scenario went over."""
+    failures = []
+    if budget.get('max_queries') is not None and result['queries'] > budget['max_queries']:
+        failures.append(f"{result['queries']} queries > budget {budget['max_queries']}")
+    if budget.get('max_p95_ms') is not None and result['p95_ms'] > budget['max_p95_ms']:
+        failures.append(f"p95 {result['p95_ms']:.2f}ms > budget {budget['max_p95_ms']:.2f}ms")
+    return failures
+
+
+def run(options, stdout):
+    if not seed.generated_users().exists():
+        stdout.write('No generated data found; generating the small data set...')
+        seed.generate(**seed.PRESETS['small'])
+
+    fixtures = Fixtures()
+    admin = seed.generated_users().filter(username=f'{seed.USER_PREFIX}admin').first()
+    if admin is None:
+        admin = seed.generated_users().create(username=f'{seed.USER_PREFIX}admin', is_staff=True)
+
+    baseline = load_baseline(options['baseline'])
+    results, failures = {}, []
+    try:
+        with override_settings(LISTINGS_RESPONSE_CACHE={'ENABLED': False}):
+            for name, user, method, path, body in scenarios(fixtures):
+                if options['only'] and name not in options['only']:
+                    continue
+                client = APIClient()
+                if user is not None:
+                    client.force_authenticate(admin if user == 'admin' else user)
+
+                samples, queries, peak = measure(client, method, path, body, options['repeat'])
+                summary = summarize(samples)
+                result = dict(summary, queries=max(queries), peak_kb=round(peak / 1024, 1))
+                results[name] = result
+
+                problems = check_budget(result, baseline.get(name, {}))
+                failures.extend(f'{name}: {problem}' for problem in problems)
+                stdout.write(
+                    f"{format_summary(name, summary)} queries={result['queries']:<3} "
+                    f"mem={result['peak_kb']:8.1f}KB{'  OVER BUDGET' if problems else ''}"
+                )
+    finally:
+        fixtures.cleanup()
+
+    if options['output']:
+        with open(options['output'], 'w') as output:
+            json.dump(results, output, indent=2, sort_keys=True)
+
+    if options['update_baseline']:
+        for name, result in results.items():
+            baseline[name] = {
+                'max_queries': result['queries'],
+                'max_p95_ms': round(result['p95_ms'] * (1 + options['latency_headroom']), 2),
+            }
+        with open(options['baseline'], 'w') as output:
+            json.dump(baseline, output, indent=2, sort_keys=True)
+            output.write('\n')
+        stdout.write(f"Recorded budgets for {len(results)} scenarios in {options['baseline']}")
+        return
+
+    if failures:
+        raise CommandError('Over budget:\n' + '\n'.join(failures))
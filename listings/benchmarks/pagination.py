@@ -0,0 +1,80 @@
+"""
+Page latency of offset versus keyset pagination at shallow and deep pages.
+
+Seeds enough listings to reach the deepest page, then times fetching a page
+at each depth with OFFSET/LIMIT and with KeysetPagination cursors.
+"""
+import uuid
+
+from django.contrib.auth.models import User
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from listings.models import Listing
+from listings.pagination import KeysetPagination, encode_cursor, get_ordering, row_position
+
+from .utils import format_summary, stopwatch, summarize
+
+
+def add_arguments(parser):
+    parser.add_argument('--depths', type=int, nargs='+', default=[10, 10000], help='Page numbers to time')
+    parser.add_argument('--page-size', type=int, default=25)
+    parser.add_argument('--repeat', type=int, default=20, help='Timed fetches per depth')
+    parser.add_argument('--keep', action='store_true', help='Keep the generated listings')
+
+
+def seed_listings(owner, count, batch_size=5000):
+    """Bulk insert plain listings for an owner."""
+    for start in range(0, count, batch_size):
+        Listing.objects.bulk_create([
+            Listing(
+                title=f'Benchmark listing {index}', description='', location='Benchmark',
+                price_per_night=50 + index % 200, max_guests=1 + index % 6, owner=owner,
+            )
+            for index in range(start, min(start + batch_size, count))
+        ])
+
+
+def run(options, stdout):
+    page_size = options['page_size']
+    needed = max(options['depths']) * page_size
+    owner = User.objects.create(username=f'bench-{uuid.uuid4().hex[:12]}')
+    factory = APIRequestFactory()
+
+    try:
+        stdout.write(f'Seeding {needed} listings...')
+        seed_listings(owner, needed)
+        queryset = Listing.objects.filter(owner=owner).order_by('-created_at')
+        ordering = get_ordering(queryset)
+        order_by = [('-' if descending else '') + name for name, descending in ordering]
+
+        for depth in options['depths']:
+            offset = (depth - 1) * page_size
+
+            offset_samples = []
+            for _ in range(options['repeat']):
+                with stopwatch() as timer:
+                    list(queryset.order_by(*order_by)[offset:offset + page_size])
+                offset_samples.append(timer['elapsed'])
+
+            # The cursor a client would hold after walking to this depth
+            cursor = None
+            if offset:
+                previous_row = queryset.order_by(*order_by)[offset - 1]
+                cursor = encode_cursor(ordering, row_position(previous_row, ordering))
+            params = {'page_size': page_size}
+            if cursor:
+                params['cursor'] = cursor
+            request = Request(factory.get('/api/v1/listings/', params))
+
+            keyset_samples = []
+            for _ in range(options['repeat']):
+                with stopwatch() as timer:
+                    KeysetPagination().paginate_queryset(queryset, request)
+                keyset_samples.append(timer['elapsed'])
+
+            stdout.write(format_summary(f'offset page {depth}', summarize(offset_samples)))
+            stdout.write(format_summary(f'keyset page {depth}', summarize(keyset_samples)))
+    finally:
+        if not options['keep']:
+            owner.delete()
@@ -0,0 +1,116 @@
+"""
+CPU cost of quoting a stay at many listings, per listing versus batched.
+
+Builds in-memory listings with seasonal, weekend and length-of-stay rates
+(no database access while timing) and prices the same stay at all of them
+night by night with Decimal arithmetic, one listing at a time, and with
+one quote_listings() call. Reports CPU time per batch and listings quoted
+per second, and checks both give the same totals.
+"""
+import random
+import time
+import uuid
+from datetime import date, timedelta
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.core.management.base import CommandError
+
+from listings.models import Listing, ListingRate
+from listings.pricing import CENT, quote_listings, weekend_nights
+
+from .utils import percentile
+
+
+def add_arguments(parser):
+    parser.add_argument('--listings', type=int, default=500, help='Listings quoted per batch')
+    parser.add_argument('--repeat', type=int, default=20, help='Batches quoted per case')
+    parser.add_argument('--seed', type=int, default=0)
+
+
+def build_listings(count, rng):
+    """Unsaved listings and their rates; about half have seasons and discounts."""
+    first = date(2030, 1, 1)
+    listings, rates = [], []
+    for _ in range(count):
+        listing = Listing(id=uuid.uuid4(), price_per_night=Decimal(rng.randrange(4000, 40000)) / 100)
+        listings.append(listing)
+        if rng.random() < 0.5:
+            continue
+        for pk in range(rng.randrange(1, 4)):
+            start = first + timedelta(days=rng.randrange(0, 300))
+            rates.append(ListingRate(
+                pk=pk, listing=listing, kind='season', start_date=start,
+                end_date=start + timedelta(days=rng.randrange(7, 90)),
+                price_per_night=_round(listing.price_per_night * Decimal(rng.choice(['0.8', '1.25', '1.5']))),
+            ))
+        rates.append(ListingRate(listing=listing, kind='weekend', adjustment_percent=Decimal('12.5')))
+        rates.append(ListingRate(listing=listing, kind='length_of_stay', min_nights=7,
+                                 adjustment_percent=Decimal('-10')))
+        rates.append(ListingRate(listing=listing, kind='length_of_stay', min_nights=28,
+                                 adjustment_percent=Decimal('-25')))
+    return listings, rates
+
+
+def _round(amount):
+    return amount.quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+def quote_one(listing, rates, check_in, check_out):
+    """The same rules as pricing.py, one night at a time with Decimals."""
+    seasons = sorted((rate for rate in rates if rate.kind == 'season'), key=lambda rate: (rate.start_date, rate.pk))
+    weekend = [rate.adjustment_percent for rate in rates if rate.kind == 'weekend']
+    stay_rules = sorted((rate.min_nights, rate.adjustment_percent) for rate in rates if rate.kind == 'length_of_stay')
+    nights = (check_out - check_in).days
+    total = Decimal('0')
+    for offset in range(nights):
+        night = check_in + timedelta(days=offset)
+        price = listing.price_per_night
+        for season in seasons:
+            if season.start_date <= night < season.end_date:
+                price = season.price_per_night
+        if weekend and night.weekday() in weekend_nights():
+            price = _round(price * (100 + weekend[-1]) / 100)
+        total += _round(price)
+    applicable = [percent for min_nights, percent in stay_rules if min_nights <= nights]
+    if applicable:
+        total = _round(total * (100 + applicable[-1]) / 100)
+    return _round(total)
+
+
+def _cpu_times(quote, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.process_time()
+        quote()
+        samples.append(time.process_time() - start)
+    return samples
+
+
+def run(options, stdout):
+    rng = random.Random(options['seed'])
+    listings, rates = build_listings(options['listings'], rng)
+    rates_by_listing = {}
+    for rate in rates:
+        rates_by_listing.setdefault(rate.listing_id, []).append(rate)
+    check_in = date(2030, 3, 1)
+    count = len(listings)
+
+    for nights in (2, 7, 30):
+        check_out = check_in + timedelta(days=nights)
+
+        def one_by_one():
+            return [quote_one(listing, rates_by_listing.get(listing.pk, []), check_in, check_out)
+                    for listing in listings]
+
+        def batched():
+            return quote_listings(listings, check_in, check_out, rates)
+
+        if one_by_one() != batched():
+            raise CommandError(f'{nights} nights: batched quotes differ from the night by night ones')
+
+        loop_ms = percentile(_cpu_times(one_by_one, options['repeat']), 50) * 1000
+        batch_ms = percentile(_cpu_times(batched, options['repeat']), 50) * 1000
+        stdout.write(
+            f'{nights:>3} nights at {count} listings   one by one={loop_ms:8.2f}ms batched={batch_ms:8.2f}ms '
+            f'({count / max(batch_ms, 1e-6) * 1000:,.0f} listings/s, {loop_ms / max(batch_ms, 1e-6):.1f}x)'
+        )
@@ -0,0 +1,285 @@
+"""
+Deterministic data generator for the benchmarks.
+
+The same seed and counts always produce the same rows, ids included, so
+runs on different machines or branches measure the same data. Popularity
+is heavy-tailed: a few hosts own many listings, a few listings get most of
+the reviews and bookings, and a few guests book a lot. Prices are
+log-normal around city price levels, ratings lean positive, and stays are
+short, back to back, and mostly completed in the past or confirmed in the
+future.
+
+Rows are inserted with bulk_create in batches, so model signals do not run;
+everything they would maintain (rating aggregates, geohashes, the search
+index, amenity rows, facet counts, feature vectors, booked nights and
+daily stats) is written directly.
+"""
+import math
+import random
+import uuid
+from array import array
+from collections import Counter
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.db import transaction
+
+from listings.analytics import add_booking, booking_state, stats_rows
+from listings.availability import ACTIVE_STATUSES, nights_between
+from listings.facets import apply_facet_deltas, facet_values, listing_amenities
+from listings.geo import encode_geohash
+from listings.models import (
+    BookedNight, Booking, Listing, ListingAmenity, ListingDailyStats, ListingToken, Review,
+)
+from listings.search import listing_postings
+from listings.similar import save_vectors
+
+# Username prefix of generated users; deleting them removes everything generated
+USER_PREFIX = 'seed-'
+
+PRESETS = {
+    'small': {'listings': 1000, 'reviews': 10000, 'bookings': 10000},
+    'medium': {'listings': 100000, 'reviews': 1000000, 'bookings': 1000000},
+    'full': {'listings': 1000000, 'reviews': 10000000, 'bookings': 10000000},
+}
+
+# (name, latitude, longitude, price level, weight)
+CITIES = [
+    ('Paris', 48.8566, 2.3522, 160, 10),
+    ('London', 51.5072, -0.1276, 170, 10),
+    ('New York', 40.7128, -74.0060, 210, 9),
+    ('Barcelona', 41.3874, 2.1686, 120, 7),
+    ('Rome', 41.9028, 12.4964, 115, 7),
+    ('Lisbon', 38.7223, -9.1393, 95, 6),
+    ('Tokyo', 35.6762, 139.6503, 140, 6),
+    ('Bangkok', 13.7563, 100.5018, 45, 5),
+    ('Cape Town', -33.9249, 18.4241, 80, 4),
+    ('Nairobi', -1.2921, 36.8219, 55, 3),
+    ('Lagos', 6.5244, 3.3792, 60, 3),
+    ('Accra', 5.6037, -0.1870, 50, 2),
+    ('Sydney', -33.8688, 151.2093, 150, 4),
+    ('Fiji', -17.7134, 178.0650, 130, 1),
+    ('Reykjavik', 64.1466, -21.9426, 140, 1),
+]
+LISTING_TYPES = [('apartment', 45), ('house', 20), ('hotel', 25), ('experience', 7), ('restaurant', 3)]
+ADJECTIVES = [
+    'Cozy', 'Sunny', 'Quiet', 'Modern', 'Charming', 'Spacious', 'Rustic', 'Bright',
+    'Elegant', 'Central', 'Hidden', 'Historic', 'Stylish', 'Lovely', 'Airy',
+]
+NOUNS = {
+    'apartment': ['apartment', 'flat', 'loft', 'studio', 'penthouse'],
+    'house': ['house', 'cottage', 'villa', 'townhouse', 'cabin'],
+    'hotel': ['hotel', 'inn', 'guesthouse', 'suite', 'room'],
+    'experience': ['food tour', 'walking tour', 'cooking class', 'boat trip', 'wine tasting'],
+    'restaurant': ['bistro', 'trattoria', 'grill', 'cafe', 'brasserie'],
+}
+FEATURES = [
+    'near the old town', 'with a sea view', 'close to the metro', 'by the river',
+    'with a garden', 'in a lively neighbourhood', 'with a rooftop terrace',
+    'next to the park', 'with fast wifi', 'steps from the beach',
+]
+AMENITIES = [
+    ('wifi', 0.9), ('kitchen', 0.6), ('washer', 0.45), ('air_conditioning', 0.4),
+    ('heating', 0.5), ('parking', 0.3), ('pool', 0.08), ('gym', 0.1),
+    ('tv', 0.55), ('workspace', 0.35), ('pets_allowed', 0.15), ('breakfast', 0.2),
+]
+RATINGS = [1, 2, 3, 4, 5]
+RATING_WEIGHTS = [3, 4, 10, 33, 50]
+GUEST_COUNTS = [1, 2, 3, 4, 5, 6, 8, 10]
+GUEST_COUNT_WEIGHTS = [10, 35, 12, 20, 6, 9, 5, 3]
+
+
+def _uuid(rng):
+    return uuid.UUID(int=rng.getrandbits(128), version=4)
+
+
+def _weights(rng, count, alpha=1.3, cap=200.0):
+    """Heavy-tailed (Pareto) popularity weights, capped to keep extremes sane."""
+    return array('d', (min(rng.paretovariate(alpha), cap) for _ in range(count)))
+
+
+def allocate(total, weights, limit=None):
+    """
+    Split ``total`` into integer shares proportional to ``weights``.
+
+    Uses largest remainders so the shares add up to exactly ``total``
+    (unless ``limit`` caps them).
+    """
+    weight_sum = sum(weights) or 1.0
+    shares = array('l')
+    remainders = []
+    for index, weight in enumerate(weights):
+        exact = total * weight / weight_sum
+        share = int(exact)
+        shares.append(share)
+        remainders.append((exact - share, index))
+    missing = total - sum(shares)
+    for _, index in sorted(remainders, reverse=True)[:missing]:
+        shares[index] += 1
+    if limit is not None:
+        for index, share in enumerate(shares):
+            shares[index] = min(share, limit)
+    return shares
+
+
+def _skewed_index(rng, count, power):
+    """An index in range(count), favouring low indexes more as ``power`` grows."""
+    return min(count - 1, int(count * rng.random() ** power))
+
+
+def _create_users(kind, count, batch_size):
+    names = [f'{USER_PREFIX}{kind}-{index}' for index in range(count)]
+    for start in range(0, count, batch_size):
+        User.objects.bulk_create(
+            [User(username=name, password='!') for name in names[start:start + batch_size]],
+            ignore_conflicts=True,
+        )
+    ids = dict(User.objects.filter(username__startswith=f'{USER_PREFIX}{kind}-').values_list('username', 'pk'))
+    return array('l', (ids[name] for name in names))
+
+
+def _listing(rng, index, owner_id):
+    city, latitude, longitude, price_level, _ = rng.choices(CITIES, weights=[city[4] for city in CITIES])[0]
+    listing_type = rng.choices([name for name, _ in LISTING_TYPES], weights=[w for _, w in LISTING_TYPES])[0]
+    noun = rng.choice(NOUNS[listing_type])
+    feature = rng.choice(FEATURES)
+    # Scatter around the centre, denser close to it
+    distance = abs(rng.gauss(0, 0.08))
+    angle = rng.random() * 2 * math.pi
+    latitude = round(latitude + distance * math.cos(angle), 6)
+    longitude = round(longitude + distance * math.sin(angle) / max(math.cos(math.radians(latitude)), 0.1), 6)
+    price = max(10.0, rng.lognormvariate(math.log(price_level), 0.45))
+
+    return Listing(
+        id=_uuid(rng),
+        title=f'{rng.choice(ADJECTIVES)} {noun} {feature}',
+        description=(
+            f'A {rng.choice(ADJECTIVES).lower()} {noun} in {city} {feature}. '
+            f'{rng.choice(FEATURES).capitalize()}, {rng.choice(FEATURES)}. Listing {index}.'
+        ),
+        listing_type=listing_type,
+        price_per_night=Decimal(str(round(price, 2))),
+        location=city,
+        latitude=Decimal(str(latitude)),
+        longitude=Decimal(str(longitude)),
+        geohash=encode_geohash(latitude, longitude),
+        amenities=[name for name, probability in AMENITIES if rng.random() < probability],
+        max_guests=rng.choices(GUEST_COUNTS, weights=GUEST_COUNT_WEIGHTS)[0],
+        is_available=rng.random() > 0.03,
+        owner_id=owner_id,
+    )
+
+
+def _reviews(rng, listing, count, guest_ids):
+    reviews = []
+    for reviewer in rng.sample(range(len(guest_ids)), count):
+        rating = rng.choices(RATINGS, weights=RATING_WEIGHTS)[0]
+        reviews.append(Review(
+            id=_uuid(rng), listing_id=listing.pk, reviewer_id=guest_ids[reviewer], rating=rating,
+            comment=rng.choice(['', 'Great stay!', 'Would come back.', 'As described.', 'Noisy at night.']),
+        ))
+        listing.review_count += 1
+        listing.rating_sum += rating
+        setattr(listing, f'rating_{rating}_count', getattr(listing, f'rating_{rating}_count') + 1)
+    return reviews
+
+
+def _bookings(rng, listing, count, guest_ids, today):
+    """Back-to-back stays starting up to two years ago; (bookings, booked nights)."""
+    bookings, nights = [], []
+    day = today - timedelta(days=730 - rng.randrange(60))
+    for _ in range(count):
+        day += timedelta(days=min(int(rng.expovariate(1 / 4)), 60))
+        stay = 1 + min(int(rng.expovariate(1 / 3)), 27)
+        check_in, check_out = day, day + timedelta(days=stay)
+        day = check_out
+
+        roll = rng.random()
+        if check_out <= today:
+            status = 'completed' if roll < 0.85 else 'cancelled'
+        else:
+            status = 'confirmed' if roll < 0.7 else 'pending' if roll < 0.9 else 'cancelled'
+
+        booking = Booking(
+            id=_uuid(rng), listing_id=listing.pk,
+            guest_id=guest_ids[_skewed_index(rng, len(guest_ids), 3)],
+            check_in=check_in, check_out=check_out,
+            guests_count=1 + rng.randrange(listing.max_guests),
+            total_price=listing.price_per_night * stay, status=status,
+        )
+        bookings.append(booking)
+        if status in ACTIVE_STATUSES:
+            nights.extend(
+                BookedNight(listing_id=listing.pk, booking_id=booking.pk, night=night)
+                for night in nights_between(check_in, check_out)
+            )
+    return bookings, nights
+
+
+def generate(listings, reviews, bookings, seed=0, batch_size=2000, search_index=True, stdout=None):
+    """
+    Insert a generated data set and return the number of rows per model.
+
+    Hosts and guests are created first (one host per four listings, enough
+    guests that each can review a listing at most once), then listings with
+    their reviews, bookings and booked nights, batch by batch. Pass
+    ``search_index=False`` to skip writing search index rows.
+    """
+    rng = random.Random(seed)
+    today = date.today()
+    host_count = max(1, listings // 4)
+    guest_count = max(100, reviews // 20, bookings // 20)
+
+    host_ids = _create_users('host', host_count, batch_size)
+    guest_ids = _create_users('guest', guest_count, batch_size)
+
+    weights = _weights(rng, listings)
+    review_counts = allocate(reviews, weights, limit=guest_count)
+    booking_counts = allocate(bookings, weights)
+    counts = {'users': host_count + guest_count, 'listings': 0, 'reviews': 0, 'bookings': 0, 'booked_nights': 0}
+
+    for start in range(0, listings, batch_size):
+        batch, batch_reviews, batch_bookings, batch_nights, postings = [], [], [], [], []
+        amenities, facets = [], Counter()
+        for index in range(start, min(start + batch_size, listings)):
+            listing = _listing(rng, index, host_ids[_skewed_index(rng, host_count, 2)])
+            batch_reviews.extend(_reviews(rng, listing, review_counts[index], guest_ids))
+            stays, nights = _bookings(rng, listing, booking_counts[index], guest_ids, today)
+            batch_bookings.extend(stays)
+            batch_nights.extend(nights)
+            if search_index:
+                postings.extend(listing_postings(listing))
+            amenities.extend(
+                ListingAmenity(listing_id=listing.pk, amenity=amenity) for amenity in listing_amenities(listing)
+            )
+            facets.update(facet_values(listing))
+            batch.append(listing)
+
+        with transaction.atomic():
+            Listing.objects.bulk_create(batch, batch_size=batch_size)
+            Review.objects.bulk_create(batch_reviews, batch_size=batch_size)
+            Booking.objects.bulk_create(batch_bookings, batch_size=batch_size)
+            BookedNight.objects.bulk_create(batch_nights, batch_size=batch_size)
+            daily_stats = {}
+            for booking in batch_bookings:
+                add_booking(daily_stats, booking_state(booking))
+            ListingDailyStats.objects.bulk_create(stats_rows(daily_stats), batch_size=batch_size)
+            ListingAmenity.objects.bulk_create(amenities, batch_size=batch_size)
+            apply_facet_deltas(facets)
+            save_vectors(batch)
+            if search_index:
+                ListingToken.objects.bulk_create(postings, batch_size=batch_size)
+
+        counts['listings'] += len(batch)
+        counts['reviews'] += len(batch_reviews)
+        counts['bookings'] += len(batch_bookings)
+        counts['booked_nights'] += len(batch_nights)
+        if stdout is not None:
+            stdout.write(f"{counts['listings']}/{listings} listings")
+
+    return counts
+
+
+def generated_users():
+    return User.objects.filter(username__startswith=USER_PREFIX)
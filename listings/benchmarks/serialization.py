@@ -0,0 +1,105 @@
+"""
+CPU cost of serializing list pages with DRF versus the compiled fast path.
+
+Builds in-memory listings, reviews and bookings (no database access while
+timing) and serializes them with the DRF serializers and with
+compile_serializer(), for all fields and for a typical sparse fieldset.
+Reports CPU time per page and rows per second, and checks both paths give
+the same data.
+"""
+import json
+import time
+import uuid
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.management.base import CommandError
+from django.utils import timezone
+from rest_framework.utils.encoders import JSONEncoder
+
+from listings.fast_serializers import compile_serializer, serialize_rows
+from listings.models import Booking, Listing, Review
+from listings.serializers import BookingSerializer, ListingSerializer, ReviewSerializer
+
+from .utils import percentile
+
+
+def add_arguments(parser):
+    parser.add_argument('--rows', type=int, default=100, help='Rows per page')
+    parser.add_argument('--repeat', type=int, default=50, help='Pages serialized per case')
+
+
+def build_rows(count):
+    """Unsaved model instances with their related objects attached."""
+    now = timezone.now()
+    owner = User(id=1, username='host', first_name='Ada', last_name='Host', email='host@example.com')
+    listings, reviews, bookings = [], [], []
+    for index in range(count):
+        listing = Listing(
+            id=uuid.uuid4(), title=f'Listing {index}', description='A place to stay. ' * 10,
+            listing_type='apartment', price_per_night=Decimal('120.50'), location='Lisbon',
+            latitude=Decimal('38.722300'), longitude=Decimal('-9.139300'), amenities=['wifi', 'kitchen'],
+            max_guests=4, is_available=True, owner=owner, review_count=12, rating_sum=52,
+            rating_4_count=8, rating_5_count=4, created_at=now, updated_at=now,
+        )
+        listings.append(listing)
+        reviews.append(Review(
+            id=uuid.uuid4(), listing=listing, reviewer=owner, rating=4, comment='Lovely',
+            created_at=now, updated_at=now,
+        ))
+        bookings.append(Booking(
+            id=uuid.uuid4(), listing=listing, guest=owner, check_in=date(2030, 1, 1),
+            check_out=date(2030, 1, 1) + timedelta(days=3), guests_count=2,
+            total_price=Decimal('361.50'), status='confirmed', created_at=now, updated_at=now,
+        ))
+    return listings, reviews, bookings
+
+
+def _cpu_times(serialize, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.process_time()
+        serialize()
+        samples.append(time.process_time() - start)
+    return samples
+
+
+def _as_json(data):
+    return json.loads(json.dumps(data, cls=JSONEncoder))
+
+
+def run(options, stdout):
+    rows, repeat = options['rows'], options['repeat']
+    listings, reviews, bookings = build_rows(rows)
+    cases = [
+        ('listings, all fields', ListingSerializer, listings, None, ()),
+        ('listings, id/title/price/rating', ListingSerializer, listings,
+         ('id', 'title', 'price_per_night', 'average_rating'), ()),
+        ('listings, sparse + expand=owner', ListingSerializer, listings, ('id', 'title', 'owner'), ('owner',)),
+        ('reviews, all fields', ReviewSerializer, reviews, None, ()),
+        ('bookings, all fields', BookingSerializer, bookings, None, ()),
+    ]
+
+    for label, serializer_class, instances, fields, expand in cases:
+        kwargs = {'fields': fields, 'expand': expand} if fields is not None else {}
+        fast = compile_serializer(serializer_class, fields, expand)
+        if fast is None:
+            raise CommandError(f'{serializer_class.__name__} cannot be compiled')
+
+        def drf_page():
+            return serializer_class(instances, many=True, **kwargs).data
+
+        def fast_page():
+            return serialize_rows(fast, instances)
+
+        if _as_json(drf_page()) != _as_json(fast_page()):
+            raise CommandError(f'{label}: fast path output differs from DRF')
+
+        drf = _cpu_times(drf_page, repeat)
+        compiled = _cpu_times(fast_page, repeat)
+        drf_ms, fast_ms = percentile(drf, 50) * 1000, percentile(compiled, 50) * 1000
+        stdout.write(
+            f'{label:<36} drf={drf_ms:8.2f}ms fast={fast_ms:8.2f}ms per {rows} rows '
+            f'({rows / max(fast_ms, 1e-6) * 1000:,.0f} rows/s, {drf_ms / max(fast_ms, 1e-6):.1f}x)'
+        )
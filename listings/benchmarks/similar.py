@@ -0,0 +1,81 @@
+"""
+Recall versus latency of the similar listings index.
+
+Encodes in-memory listings spread like the seeded data (no database
+access), builds a SimilarityIndex over them and, for a sample of the
+listings, searches the index with a growing number of probes. Reports the
+share of the true nearest neighbours (from an exhaustive search) each
+setting finds and its p50/p95 latency, next to the exhaustive search
+itself, to help choose LISTINGS_SIMILAR PROBES and LISTS.
+"""
+import random
+import time
+
+import numpy as np
+from django.utils import timezone
+
+from listings.similar import SimilarityIndex, encode_listing
+
+from .seed import RATING_WEIGHTS, RATINGS, _listing
+from .utils import format_summary, summarize
+
+PROBES = (1, 2, 4, 8, 16, 32)
+
+
+def add_arguments(parser):
+    parser.add_argument('--listings', type=int, default=100000, help='Listings indexed')
+    parser.add_argument('--queries', type=int, default=200, help='Listings searched for')
+    parser.add_argument('--count', type=int, default=10, help='Neighbours searched per query')
+    parser.add_argument('--lists', type=int, default=None, help='k-means groups (default: square root of --listings)')
+    parser.add_argument('--seed', type=int, default=0)
+
+
+def build_vectors(count, rng):
+    ids, vectors = [], []
+    for index in range(count):
+        listing = _listing(rng, index, owner_id=None)
+        listing.review_count = rng.choice([0, 0, 1, 3, 10, 40, 150])
+        listing.rating_sum = sum(rng.choices(RATINGS, weights=RATING_WEIGHTS, k=listing.review_count))
+        ids.append(str(listing.pk))
+        vectors.append(encode_listing(listing))
+    return ids, np.array(vectors, dtype=np.float32)
+
+
+def _timed(search, queries):
+    samples, results = [], []
+    for vector in queries:
+        start = time.perf_counter()
+        ids, _ = search(vector)
+        samples.append(time.perf_counter() - start)
+        results.append(set(ids.tolist()))
+    return samples, results
+
+
+def run(options, stdout):
+    rng = random.Random(options['seed'])
+    count = options['count']
+
+    start = time.perf_counter()
+    ids, vectors = build_vectors(options['listings'], rng)
+    encoded = time.perf_counter() - start
+    start = time.perf_counter()
+    index = SimilarityIndex.build(ids, vectors, timezone.now(), lists=options['lists'], seed=options['seed'])
+    built = time.perf_counter() - start
+    stdout.write(
+        f'{len(index)} listings encoded in {encoded:.1f}s, '
+        f'{len(index.centroids)} lists built in {built:.1f}s'
+    )
+
+    sample = rng.sample(range(len(vectors)), min(options['queries'], len(vectors)))
+    queries = vectors[sample]
+    exact_samples, expected = _timed(lambda vector: index.exact_search(vector, count), queries)
+    stdout.write(format_summary('exact', summarize(exact_samples)) + ' recall=1.000')
+
+    for probes in PROBES:
+        if probes > len(index.centroids):
+            break
+        samples, found = _timed(lambda vector: index.search(vector, count, probes), queries)
+        recall = sum(len(hits & wanted) for hits, wanted in zip(found, expected)) / max(
+            sum(len(wanted) for wanted in expected), 1
+        )
+        stdout.write(format_summary(f'probes={probes}', summarize(samples)) + f' recall={recall:.3f}')
@@ -0,0 +1,95 @@
+"""
+Time to first response of a cold worker.
+
+Each run starts a fresh Python process which sets Django up, as a WSGI
+worker does, and serves one anonymous GET. The report splits the time into
+process start, ``django.setup()`` and the first request (URL conf and
+view imports included), and lists the modules off the hot path that were
+imported. ``--eager`` imports drf_yasg and Celery up front, as workers did
+before they were loaded lazily, for comparison. Build the static schema
+with ``manage.py build_openapi_schema`` to time the schema as it is served
+in production.
+"""
+import json
+import os
+import subprocess
+import sys
+import time
+
+from django.core.management.base import CommandError
+from django.urls import reverse
+
+from .utils import format_summary, summarize
+
+EAGER_IMPORTS = ['drf_yasg.openapi', 'drf_yasg.utils', 'celery']
+WATCHED_MODULES = ['drf_yasg', 'celery', 'pkg_resources', 'numpy']
+
+WORKER = '''
+import importlib, json, sys, time, wsgiref.util
+started = time.time()
+for module in sys.argv[2:]:
+    importlib.import_module(module)
+from django.core.wsgi import get_wsgi_application
+application = get_wsgi_application()
+ready = time.time()
+path, _, query = sys.argv[1].partition('?')
+environ = {'PATH_INFO': path, 'QUERY_STRING': query, 'REQUEST_METHOD': 'GET'}
+wsgiref.util.setup_testing_defaults(environ)
+statuses = []
+b''.join(application(environ, lambda status, headers, exc_info=None: statuses.append(status)))
+done = time.time()
+print(json.dumps({
+    'started': started, 'ready': ready, 'done': done, 'status': statuses[0],
+    'modules': [name for name in %r if name in sys.modules],
+}))
+''' % WATCHED_MODULES
+
+
+def add_arguments(parser):
+    parser.add_argument('--repeat', type=int, default=5, help='Cold workers per scenario')
+    parser.add_argument('--eager', action='store_true', help='Also time workers importing drf_yasg and Celery at startup')
+
+
+def scenarios():
+    """(name, path) of each first request."""
+    return [
+        ('listing list', reverse('listing-list')),
+        ('schema', reverse('openapi-schema')),
+    ]
+
+
+def cold_request(path, imports=()):
+    """Start a worker, serve ``path`` once, return its timings."""
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path))
+    spawned = time.time()
+    result = subprocess.run(
+        [sys.executable, '-c', WORKER, path, *imports],
+        env=env, capture_output=True, text=True,
+    )
+    if result.returncode:
+        raise CommandError(f'Worker serving {path} failed:\n{result.stderr}')
+    timings = json.loads(result.stdout.strip().splitlines()[-1])
+    if not timings['status'].startswith('200'):
+        raise CommandError(f"GET {path} returned {timings['status']}")
+    timings['spawned'] = spawned
+    return timings
+
+
+def run(options, stdout):
+    modes = [('lazy', [])]
+    if options['eager']:
+        modes.append(('eager', EAGER_IMPORTS))
+
+    for name, path in scenarios():
+        # Alternate the modes so load on the machine affects both alike
+        runs = {mode: [] for mode, _ in modes}
+        for _ in range(options['repeat']):
+            for mode, imports in modes:
+                runs[mode].append(cold_request(path, imports))
+        for mode, samples in runs.items():
+            label = f'{name} ({mode})'
+            stdout.write(format_summary(f'{label} process start', summarize([r['started'] - r['spawned'] for r in samples])))
+            stdout.write(format_summary(f'{label} setup', summarize([r['ready'] - r['started'] for r in samples])))
+            stdout.write(format_summary(f'{label} first request', summarize([r['done'] - r['ready'] for r in samples])))
+            stdout.write(format_summary(f'{label} to first response', summarize([r['done'] - r['spawned'] for r in samples])))
+            stdout.write(f"{label} imported: {', '.join(samples[-1]['modules']) or 'none of ' + ', '.join(WATCHED_MODULES)}")
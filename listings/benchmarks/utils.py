@@ -0,0 +1,42 @@
+import math
+import time
+from contextlib import contextmanager
+
+
+def percentile(samples, pct):
+    """Nearest-rank percentile of a list of numbers."""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def summarize(samples):
+    """Latency summary in milliseconds for samples measured in seconds."""
+    return {
+        'count': len(samples),
+        'p50_ms': percentile(samples, 50) * 1000,
+        'p95_ms': percentile(samples, 95) * 1000,
+        'p99_ms': percentile(samples, 99) * 1000,
+        'max_ms': max(samples, default=0.0) * 1000,
+    }
+
+
+def format_summary(label, summary):
+    """One line of a latency report."""
+    return (
+        f"{label:<40} n={summary['count']:<6} p50={summary['p50_ms']:8.2f}ms "
+        f"p95={summary['p95_ms']:8.2f}ms p99={summary['p99_ms']:8.2f}ms"
+    )
+
+
+@contextmanager
+def stopwatch():
+    """Measure the wall time of a block; read ``elapsed`` afterwards."""
+    timer = {'elapsed': 0.0}
+    start = time.perf_counter()
+    try:
+        yield timer
+    finally:
+        timer['elapsed'] = time.perf_counter() - start
@@ -0,0 +1,295 @@
+import codecs
+import csv
+import json
+from collections import Counter
+from itertools import islice
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from rest_framework import serializers
+
+from .analytics import add_booking, apply_stats_deltas, booking_state
+from .availability import ACTIVE_STATUSES, nights_between
+from .cache import AVAILABILITY_TAG, LIST_TAG, invalidate_on_commit
+from .facets import apply_facet_deltas, facet_values, index_amenities
+from .geo import encode_geohash
+from .models import BookedNight, Booking, Listing
+from .outbox import enqueue_booking_events
+from .pricing import quote_stays
+from .search import index_listings
+from .serializers import BookingImportSerializer, ListingSerializer
+from .similar import save_vectors
+
+FORMATS = ('ndjson', 'csv')
+
+CONTENT_TYPE_FORMATS = {
+    'application/x-ndjson': 'ndjson',
+    'application/ndjson': 'ndjson',
+    'application/jsonlines': 'ndjson',
+    'text/csv': 'csv',
+}
+
+
+def default_chunk_size():
+    return getattr(settings, 'LISTINGS_BULK_CHUNK_SIZE', 500)
+
+
+def _csv_value(value):
+    # Lists and objects (e.g. amenities) are given as JSON inside the cell
+    if value[:1] in ('[', '{'):
+        try:
+            return json.loads(value)
+        except ValueError:
+            pass
+    return value
+
+
+def read_rows(lines, fmt):
+    """
+    Stream rows from an iterable of text lines in NDJSON or CSV format.
+
+    Yields (row_number, row) pairs; rows that cannot be parsed are yielded
+    as (row_number, ValueError).
+    """
+    if fmt == 'csv':
+        reader = csv.DictReader(lines)
+        for number, row in enumerate(reader, start=1):
+            yield number, {
+                name: _csv_value(value)
+                for name, value in row.items()
+                if name and value not in (None, '')
+            }
+        return
+
+    number = 0
+    for line in lines:
+        if not line.strip():
+            continue
+        number += 1
+        try:
+            row = json.loads(line)
+            if not isinstance(row, dict):
+                raise ValueError('Each line must be a JSON object.')
+        except ValueError as exc:
+            row = ValueError(str(exc))
+        yield number, row
+
+
+def read_bytes(stream, fmt, encoding='utf-8'):
+    """Rows of a binary stream, such as a request body or an uploaded file."""
+    return read_rows(codecs.iterdecode(stream, encoding), fmt)
+
+
+def request_rows(request):
+    """
+    Rows of a bulk API request.
+
+    NDJSON and CSV bodies are streamed line by line; anything else is parsed
+    by DRF and must be a JSON array of objects.
+    """
+    content_type = (request.content_type or '').split(';')[0].strip().lower()
+    fmt = CONTENT_TYPE_FORMATS.get(content_type)
+    if fmt:
+        return read_bytes(request.stream or [], fmt)
+
+    data = request.data
+    if not isinstance(data, list):
+        raise serializers.ValidationError(
+            {'detail': 'Expected a JSON array, NDJSON or CSV body.'}
+        )
+    return (
+        (number, row if isinstance(row, dict) else ValueError('Each row must be a JSON object.'))
+        for number, row in enumerate(data, start=1)
+    )
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+class ImportResult:
+    """Counts and per-row errors of a bulk import."""
+
+    def __init__(self):
+        self.created = 0
+        self.errors = []
+
+    def add_error(self, row_number, errors):
+        if isinstance(errors, Exception):
+            errors = {'non_field_errors': [str(errors)]}
+        self.errors.append({'row': row_number, 'errors': errors})
+
+    def as_dict(self):
+        errors = sorted(self.errors, key=lambda error: error['row'])
+        return {'created': self.created, 'failed': len(errors), 'errors': errors}
+
+
+def import_listings(rows, owner, chunk_size=None):
+    """
+    Validate and insert listings in chunks with bulk_create.
+
+    ``rows`` yields (row_number, data) pairs. Rows are validated with
+    ListingSerializer, which needs no queries; valid rows of a chunk are
+    inserted in one transaction, then indexed for search and counted in the
+    facets as a batch.
+    """
+    result = ImportResult()
+
+    for chunk in chunked(rows, chunk_size or default_chunk_size()):
+        listings = []
+        for number, data in chunk:
+            if isinstance(data, Exception):
+                result.add_error(number, data)
+                continue
+            serializer = ListingSerializer(data=data)
+            if not serializer.is_valid():
+                result.add_error(number, serializer.errors)
+                continue
+            listing = Listing(owner=owner, **serializer.validated_data)
+            if listing.latitude is not None and listing.longitude is not None:
+                listing.geohash = encode_geohash(listing.latitude, listing.longitude)
+            listings.append(listing)
+
+        if not listings:
+            continue
+        with transaction.atomic():
+            Listing.objects.bulk_create(listings)
+            index_listings(listings)
+            index_amenities(listings)
+            save_vectors(listings)
+            apply_facet_deltas(Counter(value for listing in listings for value in facet_values(listing)))
+            invalidate_on_commit(LIST_TAG)
+        result.created += len(listings)
+
+    return result
+
+
+def _check_booking(data, listing):
+    """Business rules of BookingSerializer.validate for a resolved listing."""
+    if listing is None:
+        return 'Listing does not exist.'
+    if data['guests_count'] > listing.max_guests:
+        return (
+            f"Number of guests ({data['guests_count']}) exceeds maximum capacity "
+            f"of {listing.max_guests} for this listing."
+        )
+    if not listing.is_available:
+        return 'This listing is currently not available for booking.'
+    return None
+
+
+def price_bookings(bookings, listings):
+    """Total prices of a batch of bookings, quoted together from their listings' rates."""
+    return quote_stays(
+        (listings[booking.listing_id], booking.check_in, booking.check_out)
+        for booking in bookings
+    )
+
+
+def _insert_bookings(chunk, guest, result):
+    """Validate one chunk of booking rows against the database and insert it."""
+    parsed = []
+    for number, data in chunk:
+        if isinstance(data, Exception):
+            result.add_error(number, data)
+            continue
+        serializer = BookingImportSerializer(data=data)
+        if not serializer.is_valid():
+            result.add_error(number, serializer.errors)
+            continue
+        parsed.append((number, serializer.validated_data))
+
+    if not parsed:
+        return
+
+    listing_ids = sorted({data['listing'] for _, data in parsed})
+    first_night = min(data['check_in'] for _, data in parsed)
+    last_night = max(data['check_out'] for _, data in parsed)
+
+    with transaction.atomic():
+        # One query loads and locks every listing of the chunk
+        listings = {
+            listing.pk: listing
+            for listing in Listing.objects.select_for_update()
+            .filter(pk__in=listing_ids)
+            .order_by('pk')
+            .only('pk', 'price_per_night', 'max_guests', 'is_available')
+        }
+        taken = set(
+            BookedNight.objects.filter(
+                listing_id__in=listing_ids, night__gte=first_night, night__lt=last_night
+            ).values_list('listing_id', 'night')
+        )
+
+        accepted = []
+        for number, data in parsed:
+            error = _check_booking(data, listings.get(data['listing']))
+            nights = []
+            if error is None and data['status'] in ACTIVE_STATUSES:
+                nights = [(data['listing'], night) for night in nights_between(data['check_in'], data['check_out'])]
+                if taken.intersection(nights):
+                    error = 'This listing is already booked for some of the selected dates.'
+            if error:
+                result.add_error(number, {'non_field_errors': [error]})
+                continue
+            taken.update(nights)
+            accepted.append((number, data))
+
+        bookings = [
+            Booking(
+                listing_id=data['listing'], guest=guest, check_in=data['check_in'],
+                check_out=data['check_out'], guests_count=data['guests_count'],
+                status=data['status'], total_price=0,
+            )
+            for _, data in accepted
+        ]
+        for booking, total_price in zip(bookings, price_bookings(bookings, listings)):
+            booking.total_price = total_price
+
+        Booking.objects.bulk_create(bookings)
+        BookedNight.objects.bulk_create([
+            BookedNight(listing_id=booking.listing_id, booking=booking, night=night)
+            for booking in bookings
+            if booking.status in ACTIVE_STATUSES
+            for night in nights_between(booking.check_in, booking.check_out)
+        ])
+        deltas = {}
+        for booking in bookings:
+            add_booking(deltas, booking_state(booking))
+        apply_stats_deltas(deltas)
+        enqueue_booking_events(bookings, 'created')
+        invalidate_on_commit(AVAILABILITY_TAG)
+
+    result.created += len(bookings)
+
+
+def import_bookings(rows, guest, chunk_size=None):
+    """
+    Validate and insert bookings for a guest in chunks with bulk_create.
+
+    Per chunk, the referenced listings are loaded (and locked) with one query
+    and the occupied nights with another, so rows are checked for capacity,
+    availability and overlaps (with existing bookings and with each other)
+    without per-row queries. Total prices are computed, and the host
+    analytics rollups adjusted, for the whole chunk at once.
+    """
+    result = ImportResult()
+
+    for chunk in chunked(rows, chunk_size or default_chunk_size()):
+        try:
+            _insert_bookings(chunk, guest, result)
+        except IntegrityError:
+            # A concurrent booking took one of the nights; nothing was committed
+            failed = {error['row'] for error in result.errors}
+            for number, _ in chunk:
+                if number in failed:
+                    continue
+                result.add_error(number, {'non_field_errors': [
+                    'This listing is already booked for some of the selected dates.'
+                ]})
+    return result
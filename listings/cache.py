@@ -0,0 +1,278 @@
+import functools
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db import transaction
+from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
+
+from .replicas import is_pinned, read_from_primary
+
+# Tag of every cached listing list page
+LIST_TAG = 'listings'
+# Tag of the cached list pages filtered by a stay, which bookings change too
+AVAILABILITY_TAG = 'listings:availability'
+
+DEFAULTS = {
+    'ENABLED': True,
+    'BACKEND': 'locmem',
+    'LOCATION': 'redis://localhost:6379/1',
+    'MAX_ENTRIES': 1000,
+    'TIMEOUT': 300,
+    'KEY_PREFIX': 'listings:response',
+}
+
+
+def listing_tag(listing_id):
+    """Tag of the cached detail and reviews responses of one listing."""
+    return f'listing:{listing_id}'
+
+
+class LocMemBackend:
+    """
+    In-process LRU store with a bounded number of entries.
+
+    Only suitable for a single process: invalidations are not seen by other
+    workers, so rely on TIMEOUT to bound staleness there or use Redis.
+    """
+
+    def __init__(self, options):
+        self.max_entries = options['MAX_ENTRIES']
+        self.entries = OrderedDict()
+        self.versions = {}
+        self.counters = {'hits': 0, 'misses': 0, 'evictions': 0}
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self.entries[key]
+                self.counters['misses'] += 1
+                return None
+            self.entries.move_to_end(key)
+            self.counters['hits'] += 1
+            return entry[1]
+
+    def set(self, key, value, timeout):
+        with self.lock:
+            self.entries[key] = (time.monotonic() + timeout, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.counters['evictions'] += 1
+
+    def get_versions(self, tags):
+        with self.lock:
+            return [self.versions.get(tag, 0) for tag in tags]
+
+    def bump_versions(self, tags):
+        with self.lock:
+            for tag in tags:
+                self.versions[tag] = self.versions.get(tag, 0) + 1
+
+    def stats(self):
+        with self.lock:
+            return dict(self.counters, entries=len(self.entries), max_entries=self.max_entries)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.versions.clear()
+
+
+class RedisBackend:
+    """
+    Store shared by every worker, in Redis or any server speaking its protocol.
+
+    Entries are plain keys with a TTL; a sorted set of last-access times
+    keeps the LRU order so the store stays within MAX_ENTRIES. Tag versions
+    and hit/miss/eviction counters are shared as well.
+    """
+
+    def __init__(self, options):
+        import redis
+
+        self.client = redis.Redis.from_url(options['LOCATION'])
+        self.max_entries = options['MAX_ENTRIES']
+        self.prefix = options['KEY_PREFIX']
+        self.lru_key = f'{self.prefix}:lru'
+        self.stats_key = f'{self.prefix}:stats'
+
+    def _entry_key(self, key):
+        return f'{self.prefix}:entry:{key}'
+
+    def _version_key(self, tag):
+        return f'{self.prefix}:version:{tag}'
+
+    def get(self, key):
+        value = self.client.get(self._entry_key(key))
+        pipe = self.client.pipeline()
+        if value is None:
+            pipe.zrem(self.lru_key, key)
+            pipe.hincrby(self.stats_key, 'misses', 1)
+        else:
+            pipe.zadd(self.lru_key, {key: time.time()})
+            pipe.hincrby(self.stats_key, 'hits', 1)
+        pipe.execute()
+        return value
+
+    def set(self, key, value, timeout):
+        pipe = self.client.pipeline()
+        pipe.set(self._entry_key(key), value, ex=timeout)
+        pipe.zadd(self.lru_key, {key: time.time()})
+        pipe.zcard(self.lru_key)
+        size = pipe.execute()[-1]
+
+        overflow = size - self.max_entries
+        if overflow > 0:
+            evicted = [key for key, _ in self.client.zpopmin(self.lru_key, overflow)]
+            if evicted:
+                pipe = self.client.pipeline()
+                pipe.delete(*(self._entry_key(key.decode()) for key in evicted))
+                pipe.hincrby(self.stats_key, 'evictions', len(evicted))
+                pipe.execute()
+
+    def get_versions(self, tags):
+        values = self.client.mget([self._version_key(tag) for tag in tags])
+        return [int(value or 0) for value in values]
+
+    def bump_versions(self, tags):
+        pipe = self.client.pipeline()
+        for tag in tags:
+            pipe.incr(self._version_key(tag))
+        pipe.execute()
+
+    def stats(self):
+        counters = {
+            name.decode(): int(value)
+            for name, value in self.client.hgetall(self.stats_key).items()
+        }
+        return {
+            'hits': counters.get('hits', 0),
+            'misses': counters.get('misses', 0),
+            'evictions': counters.get('evictions', 0),
+            'entries': self.client.zcard(self.lru_key),
+            'max_entries': self.max_entries,
+        }
+
+    def clear(self):
+        keys = list(self.client.scan_iter(f'{self.prefix}:*'))
+        if keys:
+            self.client.delete(*keys)
+
+
+BACKENDS = {
+    'locmem': LocMemBackend,
+    'redis': RedisBackend,
+}
+
+
+class ResponseCache:
+    """
+    Cache of serialized API responses, invalidated by tag.
+
+    Keys combine the host, path and normalized query parameters with the
+    current version of each tag the response depends on. Invalidating a tag
+    bumps its version, so every response built on the old data misses from
+    then on and ages out of the LRU.
+    """
+
+    def __init__(self, options):
+        self.options = options
+        self.backend = BACKENDS[options['BACKEND']](options)
+
+    def make_key(self, scope, request, tags):
+        params = sorted(
+            (name, value)
+            for name, values in request.query_params.lists()
+            for value in values
+            if value != ''
+        )
+        versions = self.backend.get_versions(tags)
+        raw = json.dumps([scope, request.get_host(), request.path, params, tags, versions])
+        return hashlib.sha1(raw.encode()).hexdigest()
+
+    def get(self, key):
+        value = self.backend.get(key)
+        return None if value is None else json.loads(value)
+
+    def set(self, key, data):
+        value = json.dumps(data, cls=JSONEncoder)
+        self.backend.set(key, value, self.options['TIMEOUT'])
+
+    def invalidate(self, *tags):
+        self.backend.bump_versions(tags)
+
+    def stats(self):
+        return dict(self.backend.stats(), backend=self.options['BACKEND'])
+
+
+_response_cache = None
+_response_cache_lock = threading.Lock()
+
+
+def get_response_cache():
+    """The process-wide response cache configured by LISTINGS_RESPONSE_CACHE."""
+    global _response_cache
+    if _response_cache is None:
+        with _response_cache_lock:
+            if _response_cache is None:
+                options = dict(DEFAULTS, **getattr(settings, 'LISTINGS_RESPONSE_CACHE', {}))
+                _response_cache = ResponseCache(options)
+    return _response_cache
+
+
+def cache_enabled():
+    return dict(DEFAULTS, **getattr(settings, 'LISTINGS_RESPONSE_CACHE', {}))['ENABLED']
+
+
+def invalidate_on_commit(*tags):
+    """Invalidate tags once the current transaction commits."""
+    if cache_enabled():
+        transaction.on_commit(lambda: get_response_cache().invalidate(*tags))
+
+
+def cached_response(scope, tags):
+    """
+    Cache successful GET responses of a view method.
+
+    ``tags(view, kwargs)`` returns the tags the response depends on. The
+    response carries ``X-Cache: HIT`` or ``MISS``.
+
+    Copies are only stored when rendered from the primary: a miss reads
+    from the primary even in an action served by replicas (see
+    replicas.py), since a lagging replica could still return rows from
+    before the change that just bumped a tag, and store them under the new
+    version. Users pinned to the primary after a write neither read nor
+    store cached copies.
+    """
+    def decorator(view_method):
+        @functools.wraps(view_method)
+        def wrapper(self, request, *args, **kwargs):
+            if not cache_enabled() or request.method != 'GET':
+                return view_method(self, request, *args, **kwargs)
+
+            response_cache = get_response_cache()
+            key = response_cache.make_key(scope, request, tags(self, kwargs))
+            pinned = is_pinned(request.user)
+            data = None if pinned else response_cache.get(key)
+            if data is not None:
+                response = Response(data)
+                response['X-Cache'] = 'HIT'
+                return response
+
+            if not pinned:
+                read_from_primary()
+            response = view_method(self, request, *args, **kwargs)
+            if response.status_code == 200 and not pinned:
+                response_cache.set(key, response.data)
+            response['X-Cache'] = 'MISS'
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,99 @@
+"""
+Conditional GET for listing, review and booking reads.
+
+A decorated view method is given a validator function which describes the
+response from a few columns, ``updated_at`` above all, without loading or
+serializing the rows: the page's (pk, updated_at) pairs for a list, the
+row's ``updated_at`` for a detail. The description is hashed, with the
+path, query string and negotiated media type, into a weak ETag. Requests
+whose ``If-None-Match`` (or ``If-Modified-Since``, for details) still
+matches get a 304 before the view, its serializers or the response cache
+run; others get the full response carrying the validators.
+
+Saving a listing, and adding or removing one of its reviews, bumps the
+listing's ``updated_at``, so its aggregates are covered. Changes to the
+users nested in responses are not, as for the response cache. Disable with
+LISTINGS_CONDITIONAL_GET = False.
+"""
+import functools
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date
+from rest_framework.utils.encoders import JSONEncoder
+
+
+def conditional_enabled():
+    return getattr(settings, 'LISTINGS_CONDITIONAL_GET', True)
+
+
+def make_etag(request, parts):
+    """Weak ETag of a response described by ``parts``."""
+    raw = json.dumps(
+        [request.get_full_path(), getattr(request, 'accepted_media_type', None), parts],
+        cls=JSONEncoder,
+    )
+    return f'W/"{hashlib.sha1(raw.encode()).hexdigest()}"'
+
+
+def conditional(validators):
+    """
+    Answer GET and HEAD requests of a view method with 304 when unchanged.
+
+    ``validators(view, request, kwargs)`` returns ``(parts, last_modified)``,
+    the JSON-serializable description of the response and its modification
+    time (or None), or None to serve the request unconditionally. Validators
+    are taken before the response is built, so a response never carries a
+    newer ETag than its body.
+    """
+    def decorator(view_method):
+        @functools.wraps(view_method)
+        def wrapper(self, request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD') or not conditional_enabled():
+                return view_method(self, request, *args, **kwargs)
+            validated = validators(self, request, kwargs)
+            if validated is None:
+                return view_method(self, request, *args, **kwargs)
+
+            parts, last_modified = validated
+            etag = make_etag(request, parts)
+            timestamp = int(last_modified.timestamp()) if last_modified else None
+            response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+            if response is None:
+                response = view_method(self, request, *args, **kwargs)
+            if response.status_code in (200, 304):
+                response['ETag'] = etag
+                if timestamp is not None:
+                    response['Last-Modified'] = http_date(timestamp)
+                patch_vary_headers(response, ('Accept', 'Authorization', 'Cookie'))
+            return response
+        return wrapper
+    return decorator
+
+
+def page_validators(view, queryset, request, fields=('pk', 'updated_at')):
+    """
+    Validators of a keyset paginated list page: ``fields`` of its rows.
+
+    No Last-Modified, since a deleted row would not make it any newer.
+    """
+    return view.paginator.page_versions(queryset, request, fields), None
+
+
+def row_validators(queryset, pk, fields=('updated_at',)):
+    """
+    Validators of a single row: its ``fields``, modification times of it
+    and the rows its response includes, and the latest as Last-Modified.
+
+    None when there is no such row, leaving the 404 to the view.
+    """
+    try:
+        row = queryset.select_related(None).prefetch_related(None).filter(pk=pk).values_list(*fields).first()
+    except (TypeError, ValueError, ValidationError):
+        return None
+    if row is None:
+        return None
+    return list(row), max(value for value in row if value is not None)
@@ -0,0 +1,88 @@
+from functools import lru_cache
+
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework import serializers
+
+
+def _walk_source(model, attrs):
+    """
+    Follow a dotted serializer source through the model's relations.
+
+    Returns the select_related paths and prefetch_related paths needed to
+    read it, plus the model the source ends on.
+    """
+    select, prefetch = [], []
+    path = []
+    for attr in attrs:
+        try:
+            field = model._meta.get_field(attr)
+        except FieldDoesNotExist:
+            break
+        if not field.is_relation:
+            break
+        path.append(attr)
+        if field.many_to_many or field.one_to_many:
+            prefetch.append('__'.join(path))
+            break
+        if not prefetch:
+            select.append('__'.join(path))
+        model = field.related_model
+    return select, prefetch, model
+
+
+def _related_paths(serializer, model, prefix=''):
+    select, prefetch = set(), set()
+
+    for field in serializer.fields.values():
+        if field.source == '*':
+            continue
+
+        attrs = field.source.split('.')
+        if (len(attrs) == 1 and isinstance(field, serializers.RelatedField)
+                and field.use_pk_only_optimization()):
+            continue
+        field_select, field_prefetch, related_model = _walk_source(model, attrs)
+        select.update(prefix + path for path in field_select)
+        prefetch.update(prefix + path for path in field_prefetch)
+
+        nested = field.child if isinstance(field, serializers.ListSerializer) else field
+        if isinstance(nested, serializers.BaseSerializer) and (field_select or field_prefetch):
+            nested_prefix = prefix + '__'.join(attrs) + '__'
+            nested_select, nested_prefetch = _related_paths(nested, related_model, nested_prefix)
+            if field_prefetch:
+                prefetch.update(nested_select | nested_prefetch)
+            else:
+                select.update(nested_select)
+                prefetch.update(nested_prefetch)
+
+    return select, prefetch
+
+
+@lru_cache(maxsize=None)
+def get_related_paths(serializer_class):
+    """
+    Work out which relations a serializer reads from its declared fields.
+
+    Nested serializers and dotted sources over foreign keys become
+    select_related joins; reverse and many-to-many relations become
+    prefetch_related lookups. Primary key related fields read the local
+    ``<name>_id`` column and need no join.
+    """
+    serializer = serializer_class()
+    select, prefetch = _related_paths(serializer, serializer_class.Meta.model)
+    # A deeper join already implies the shorter ones
+    select = {
+        path for path in select
+        if not any(other.startswith(path + '__') for other in select)
+    }
+    return tuple(sorted(select)), tuple(sorted(prefetch))
+
+
+def eager_load(queryset, serializer_class):
+    """Apply the joins a serializer needs to a queryset."""
+    select, prefetch = get_related_paths(serializer_class)
+    if select:
+        queryset = queryset.select_related(*select)
+    if prefetch:
+        queryset = queryset.prefetch_related(*prefetch)
+    return queryset
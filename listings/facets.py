@@ -0,0 +1,236 @@
+"""
+Amenity filters and facet counts for listing search.
+
+``Listing.amenities`` is a free-form JSON list; its normalized values are
+mirrored into ListingAmenity rows, indexed by (amenity, listing), which the
+``amenities`` (all of) and ``amenities_any`` (any of) filters look up.
+
+Facets are the number of matching listings per listing type, price bucket
+and amenity. For a filtered queryset they take two grouped queries however
+many facet values there are: one over (listing type, price bucket) pairs
+and one over the amenities of the matching listings. Counts over all
+listings are kept in FacetCount rows, adjusted by the listing signals, and
+read with one small query.
+"""
+from collections import Counter
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, CharField, Count, F, Q, Value, When
+
+from .models import FacetCount, Listing, ListingAmenity
+
+MAX_AMENITY_LENGTH = 50
+
+
+def normalize_amenity(name):
+    return str(name).strip().lower()[:MAX_AMENITY_LENGTH]
+
+
+def listing_amenities(listing):
+    """The distinct normalized amenities of a listing."""
+    amenities = listing.amenities if isinstance(listing.amenities, (list, tuple)) else []
+    return sorted({normalize_amenity(name) for name in amenities} - {''})
+
+
+def parse_amenities(value):
+    """Normalized amenities of a comma separated filter value."""
+    return sorted({normalize_amenity(name) for name in value.split(',')} - {''})
+
+
+def price_bounds():
+    """Upper bounds of the price buckets, in ascending order."""
+    return sorted(getattr(settings, 'LISTINGS_PRICE_BUCKETS', (50, 100, 200, 500)))
+
+
+def price_labels():
+    bounds = price_bounds()
+    lower = [0] + bounds
+    return [f'{low}-{high}' for low, high in zip(lower, bounds)] + [f'{lower[-1]}+']
+
+
+def price_bucket(price):
+    """The price bucket label of a nightly price."""
+    price = Decimal(str(price))
+    for bound, label in zip(price_bounds(), price_labels()):
+        if price < bound:
+            return label
+    return price_labels()[-1]
+
+
+def price_bucket_expression():
+    """SQL for price_bucket() of ``price_per_night``."""
+    labels = price_labels()
+    return Case(
+        *(When(price_per_night__lt=bound, then=Value(label)) for bound, label in zip(price_bounds(), labels)),
+        default=Value(labels[-1]),
+        output_field=CharField(),
+    )
+
+
+def filter_amenities(queryset, amenities, match_all=True):
+    """Listings having all (or, with ``match_all=False``, any) of the amenities."""
+    if not amenities:
+        return queryset
+    matches = ListingAmenity.objects.filter(amenity__in=amenities)
+    if match_all and len(amenities) > 1:
+        matches = (
+            matches.order_by().values('listing_id')
+            .annotate(matched=Count('amenity'))
+            .filter(matched=len(amenities))
+        )
+    return queryset.filter(pk__in=matches.values('listing_id'))
+
+
+def index_amenities(listings):
+    """Replace the amenity rows of the given listings."""
+    listings = list(listings)
+    with transaction.atomic():
+        ListingAmenity.objects.filter(listing_id__in=[listing.pk for listing in listings]).delete()
+        ListingAmenity.objects.bulk_create(
+            [
+                ListingAmenity(listing_id=listing.pk, amenity=amenity)
+                for listing in listings
+                for amenity in listing_amenities(listing)
+            ],
+            batch_size=1000,
+        )
+
+
+def facet_values(listing):
+    """The (facet, value) pairs a listing counts towards."""
+    values = {('listing_type', listing.listing_type), ('price', price_bucket(listing.price_per_night))}
+    values.update(('amenities', amenity) for amenity in listing_amenities(listing))
+    return values
+
+
+def apply_facet_deltas(deltas):
+    """
+    Add a Counter of (facet, value) -> change to the stored facet counts.
+
+    Values are created at zero when missing; the changes are applied with
+    one F() update per distinct change so concurrent writers never lose one.
+    """
+    deltas = {key: change for key, change in deltas.items() if change}
+    if not deltas:
+        return
+    with transaction.atomic():
+        FacetCount.objects.bulk_create(
+            [FacetCount(facet=facet, value=value) for facet, value in deltas],
+            ignore_conflicts=True,
+        )
+        by_change = {}
+        for (facet, value), change in deltas.items():
+            by_change.setdefault(change, Q())
+            by_change[change] |= Q(facet=facet, value=value)
+        for change, keys in by_change.items():
+            FacetCount.objects.filter(keys).update(count=F('count') + change)
+
+
+def facet_deltas(previous, current):
+    """Counter of the count changes when a listing's facet values change."""
+    deltas = Counter(current - previous)
+    deltas.subtract(previous - current)
+    return deltas
+
+
+def _empty_facets():
+    return {
+        'listing_type': {value: 0 for value, _ in Listing.LISTING_TYPES},
+        'price': {label: 0 for label in price_labels()},
+        'amenities': {},
+    }
+
+
+def _top_amenities(counts, limit):
+    ranked = sorted(((name, count) for name, count in counts.items() if count > 0),
+                    key=lambda item: (-item[1], item[0]))
+    return dict(ranked[:limit])
+
+
+def amenity_facet_limit():
+    return getattr(settings, 'LISTINGS_AMENITY_FACETS', 30)
+
+
+def stored_facet_counts():
+    """Facet counts over all listings, from the FacetCount rows."""
+    facets = _empty_facets()
+    amenities = {}
+    for facet, value, count in FacetCount.objects.values_list('facet', 'value', 'count'):
+        if facet == 'amenities':
+            amenities[value] = count
+        elif facet in facets and value in facets[facet]:
+            facets[facet][value] = count
+    facets['amenities'] = _top_amenities(amenities, amenity_facet_limit())
+    return facets
+
+
+def facet_counts(queryset):
+    """Facet counts over the listings of a queryset."""
+    facets = _empty_facets()
+    queryset = queryset.order_by()
+    pairs = (
+        queryset.values('listing_type', bucket=price_bucket_expression())
+        .annotate(listings=Count('pk'))
+    )
+    for row in pairs:
+        facets['listing_type'][row['listing_type']] = (
+            facets['listing_type'].get(row['listing_type'], 0) + row['listings']
+        )
+        facets['price'][row['bucket']] += row['listings']
+
+    amenities = (
+        ListingAmenity.objects.filter(listing_id__in=queryset.values('pk'))
+        .values('amenity')
+        .annotate(listings=Count('listing_id'))
+        .order_by('-listings', 'amenity')[:amenity_facet_limit()]
+    )
+    facets['amenities'] = {row['amenity']: row['listings'] for row in amenities}
+    return facets
+
+
+def listing_facets(queryset):
+    """
+    Facet counts for a listing queryset: the stored counters when it is not
+    filtered, two grouped queries otherwise.
+    """
+    if not queryset.query.where:
+        return stored_facet_counts()
+    return facet_counts(queryset)
+
+
+def rebuild_facets(batch_size=500):
+    """
+    Rebuild the amenity rows and the stored facet counts.
+
+    Each batch of listings has its amenity rows replaced in one
+    transaction, so the amenity filters keep finding every listing while
+    they are rebuilt, and rows left by deleted listings are removed at the
+    end. The counts are swapped in one transaction too. Returns the number
+    of listings indexed.
+    """
+    listings = Listing.objects.order_by('pk').only('pk', 'listing_type', 'price_per_night', 'amenities')
+    counts = Counter()
+    indexed = 0
+    last_pk = None
+
+    while True:
+        batch = listings if last_pk is None else listings.filter(pk__gt=last_pk)
+        batch = list(batch[:batch_size])
+        if not batch:
+            break
+        index_amenities(batch)
+        for listing in batch:
+            counts.update(facet_values(listing))
+        indexed += len(batch)
+        last_pk = batch[-1].pk
+
+    ListingAmenity.objects.exclude(listing_id__in=Listing.objects.values('pk')).delete()
+    with transaction.atomic():
+        FacetCount.objects.all().delete()
+        FacetCount.objects.bulk_create(
+            [FacetCount(facet=facet, value=value, count=count) for (facet, value), count in counts.items()],
+            batch_size=1000,
+        )
+    return indexed
@@ -0,0 +1,173 @@
+"""
+Compiled, read-only serialization for list responses.
+
+DRF serializers walk their fields for every row: ``_readable_fields``,
+``get_attribute`` with its error handling, SkipField checks and an
+OrderedDict per object. A compiled serializer does that field
+introspection once per serializer class and fieldset, leaving a flat list
+of (name, getter, converter) steps that produce the same data for each
+row. Fields the compiler does not understand make it fall back to DRF,
+and so does a field whose source cannot be read on some row.
+"""
+import operator
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.exceptions import ObjectDoesNotExist
+from django.utils import timezone
+from rest_framework import ISO_8601, serializers
+from rest_framework.fields import SkipField
+from rest_framework.relations import PKOnlyObject
+from rest_framework.settings import api_settings
+
+from .instrumentation import timed
+
+
+class NotCompilable(Exception):
+    pass
+
+
+# Fields whose to_representation can be replaced by a plain call
+_CONVERTERS = {
+    serializers.ReadOnlyField: None,
+    serializers.CharField: str,
+    serializers.IntegerField: int,
+    serializers.BooleanField: bool,
+}
+
+
+def _iso_datetime(field):
+    """
+    DateTimeField.to_representation for ISO 8601 output in the current time
+    zone, which is looked up once per page instead of once per value.
+    """
+    def convert(value, tz):
+        if tz is None or not timezone.is_aware(value):
+            return field.to_representation(value)
+        value = value.astimezone(tz).isoformat()
+        if value.endswith('+00:00'):
+            value = value[:-6] + 'Z'
+        return value
+    return convert
+
+
+def _converter(field):
+    """(function converting a value, whether it takes the page's time zone)"""
+    field_type = type(field)
+    if field_type in _CONVERTERS:
+        return _CONVERTERS[field_type], False
+    if (field_type is serializers.DateTimeField and not hasattr(field, 'timezone')
+            and getattr(field, 'format', api_settings.DATETIME_FORMAT) == ISO_8601):
+        return _iso_datetime(field), True
+    if field_type is serializers.UUIDField and field.uuid_format == 'hex_verbose':
+        return str, False
+    if isinstance(field, serializers.PrimaryKeyRelatedField) and field.use_pk_only_optimization():
+        # DRF renders the raw primary key of the related object
+        return None, False
+    if isinstance(field, (serializers.SerializerMethodField, serializers.HiddenField, serializers.ManyRelatedField,
+                          serializers.ListSerializer)):
+        raise NotCompilable(field)
+    if isinstance(field, serializers.BaseSerializer):
+        return _compile(field), True
+    return field.to_representation, False
+
+
+def _getter(field):
+    attrs = field.source_attrs
+    if not attrs:
+        raise NotCompilable(field)
+    if isinstance(field, serializers.PrimaryKeyRelatedField) and field.use_pk_only_optimization():
+        # Read the local <name>_id column instead of loading the related object
+        parents = attrs[:-1]
+        name = attrs[-1]
+
+        def get_pk(instance):
+            for attr in parents:
+                instance = getattr(instance, attr)
+            return instance.serializable_value(name)
+        return get_pk
+    return operator.attrgetter('.'.join(attrs))
+
+
+def _drf_representation(field, instance):
+    """
+    DRF's value for a field whose source could not be read directly: its
+    default, None, or an error, or SkipField when the field is left out.
+    """
+    attribute = field.get_attribute(instance)
+    check_for_none = attribute.pk if isinstance(attribute, PKOnlyObject) else attribute
+    return None if check_for_none is None else field.to_representation(attribute)
+
+
+def _compile(serializer):
+    steps = []
+    for field in serializer._readable_fields:
+        convert, with_tz = _converter(field)
+        steps.append((field.field_name, field, _getter(field), convert, with_tz))
+
+    def serialize(instance, tz):
+        data = {}
+        for name, field, get, convert, with_tz in steps:
+            try:
+                value = get(instance)
+            except (AttributeError, KeyError, ObjectDoesNotExist):
+                # Only optional fields are left out; required ones raise as in DRF
+                try:
+                    data[name] = _drf_representation(field, instance)
+                except SkipField:
+                    pass
+                continue
+            if value is None:
+                data[name] = None
+            elif convert is None:
+                data[name] = value
+            elif with_tz:
+                data[name] = convert(value, tz)
+            else:
+                data[name] = convert(value)
+        return data
+    return serialize
+
+
+def serialize_rows(serialize, instances):
+    """Apply a compiled serializer to a page of instances."""
+    tz = timezone.get_current_timezone() if settings.USE_TZ else None
+    return [serialize(instance, tz) for instance in instances]
+
+
+@lru_cache(maxsize=256)
+def compile_serializer(serializer_class, fields=None, expand=()):
+    """
+    A function turning one instance into the data ``serializer_class`` would
+    give for it, or None if the serializer cannot be compiled. Call it
+    through serialize_rows(), which supplies the current time zone.
+    """
+    kwargs = {'fields': fields, 'expand': expand} if fields is not None or expand else {}
+    try:
+        return _compile(serializer_class(**kwargs))
+    except NotCompilable:
+        return None
+
+
+class FastListSerializer:
+    """
+    Read-only stand-in for ``serializer_class(instances, many=True)``.
+
+    Uses the compiled serializer when there is one, DRF otherwise.
+    """
+
+    def __init__(self, serializer_class, instance, fields=None, expand=(), context=None):
+        self.serializer_class = serializer_class
+        self.instance = instance
+        self.fields = fields
+        self.expand = expand
+        self.context = context or {}
+
+    @property
+    def data(self):
+        serialize = compile_serializer(self.serializer_class, self.fields, self.expand)
+        if serialize is None:
+            kwargs = {'fields': self.fields, 'expand': self.expand} if self.fields is not None or self.expand else {}
+            return self.serializer_class(self.instance, many=True, context=self.context, **kwargs).data
+        with timed('serializer'):
+            return serialize_rows(serialize, self.instance)
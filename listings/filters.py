@@ -0,0 +1,140 @@
+import django_filters
+from rest_framework import serializers
+from rest_framework.filters import BaseFilterBackend, OrderingFilter
+
+from .availability import filter_available
+from .facets import filter_amenities, parse_amenities
+from .geo import bounding_box_q, filter_within_radius
+from .models import Listing
+from .search import search
+
+
+class ListingFilter(django_filters.FilterSet):
+    """
+    Filters for listings, including availability for a stay.
+
+    ``check_in`` and ``check_out`` must be given together; they exclude
+    listings with a pending or confirmed booking overlapping the stay.
+    ``lat``/``lng``/``radius_km`` keep listings within a radius and annotate
+    their ``distance``; ``bbox=min_lat,min_lng,max_lat,max_lng`` keeps
+    listings inside a bounding box. ``amenities=wifi,pool`` keeps listings
+    with all of the amenities, ``amenities_any=wifi,pool`` those with any.
+    """
+    check_in = django_filters.DateFilter(method='filter_stay')
+    check_out = django_filters.DateFilter(method='filter_stay')
+    guests = django_filters.NumberFilter(field_name='max_guests', lookup_expr='gte')
+    lat = django_filters.NumberFilter(method='filter_near')
+    lng = django_filters.NumberFilter(method='filter_near')
+    radius_km = django_filters.NumberFilter(method='filter_near')
+    bbox = django_filters.CharFilter(method='filter_bbox')
+    amenities = django_filters.CharFilter(method='filter_amenities')
+    amenities_any = django_filters.CharFilter(method='filter_amenities')
+
+    class Meta:
+        model = Listing
+        fields = ['listing_type', 'is_available', 'location']
+
+    def filter_stay(self, queryset, name, value):
+        # Applied once for both dates in filter_queryset
+        return queryset
+
+    def filter_near(self, queryset, name, value):
+        # Applied once for the whole point and radius in filter_queryset
+        return queryset
+
+    def filter_bbox(self, queryset, name, value):
+        try:
+            min_lat, min_lng, max_lat, max_lng = (float(part) for part in value.split(','))
+        except ValueError:
+            raise serializers.ValidationError(
+                {'bbox': 'Expected min_lat,min_lng,max_lat,max_lng.'}
+            )
+        if min_lat > max_lat or min_lng > max_lng:
+            raise serializers.ValidationError(
+                {'bbox': 'Minimum coordinates must not exceed maximum coordinates.'}
+            )
+        return queryset.filter(bounding_box_q(min_lat, min_lng, max_lat, max_lng))
+
+    def filter_amenities(self, queryset, name, value):
+        return filter_amenities(queryset, parse_amenities(value), match_all=name == 'amenities')
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        queryset = self._filter_near(queryset)
+        return self._filter_stay(queryset)
+
+    def _filter_near(self, queryset):
+        lat = self.form.cleaned_data.get('lat')
+        lng = self.form.cleaned_data.get('lng')
+        radius_km = self.form.cleaned_data.get('radius_km')
+
+        if lat is None and lng is None and radius_km is None:
+            return queryset
+        if lat is None or lng is None or radius_km is None:
+            raise serializers.ValidationError(
+                {'detail': 'lat, lng and radius_km must be provided together.'}
+            )
+        if not (-90 <= lat <= 90 and -180 <= lng <= 180) or radius_km <= 0:
+            raise serializers.ValidationError(
+                {'detail': 'lat, lng must be valid coordinates and radius_km positive.'}
+            )
+        return filter_within_radius(queryset, float(lat), float(lng), float(radius_km))
+
+    def _filter_stay(self, queryset):
+        check_in = self.form.cleaned_data.get('check_in')
+        check_out = self.form.cleaned_data.get('check_out')
+
+        if not check_in and not check_out:
+            return queryset
+        if not (check_in and check_out):
+            raise serializers.ValidationError(
+                {'detail': 'check_in and check_out must be provided together.'}
+            )
+        if check_out <= check_in:
+            raise serializers.ValidationError(
+                {'detail': 'Check-out date must be after check-in date.'}
+            )
+        return filter_available(queryset, check_in, check_out)
+
+
+class RankedOrderingFilter(OrderingFilter):
+    """
+    Ordering filter that understands ranking annotations added by other filters.
+
+    When a filter annotates a rank (``search_rank`` from a text search or
+    ``distance`` from a radius search)
+    and the client asks for no explicit ordering, results stay in rank order
+    instead of the view's default ordering. A rank may also be requested
+    explicitly, e.g. ``?ordering=-distance``, but only when it is annotated.
+    """
+    rank_orderings = {'search_rank': '-search_rank', 'distance': 'distance'}
+
+    def _ranks(self, queryset):
+        return [name for name in self.rank_orderings if name in queryset.query.annotations]
+
+    def get_valid_fields(self, queryset, view, context={}):
+        valid_fields = super().get_valid_fields(queryset, view, context)
+        return valid_fields + [(name, name) for name in self._ranks(queryset)]
+
+    def filter_queryset(self, request, queryset, view):
+        ranks = self._ranks(queryset)
+        if ranks and not request.query_params.get(self.ordering_param):
+            return queryset.order_by(*(self.rank_orderings[name] for name in ranks))
+        return super().filter_queryset(request, queryset, view)
+
+
+class ListingSearchFilter(BaseFilterBackend):
+    """
+    Full-text search over the listing search index.
+
+    Replaces SearchFilter's ``LIKE '%term%'`` scans. Every term of
+    ``?search=`` must match, the last one as a prefix, and matches are
+    annotated with ``search_rank``.
+    """
+    search_param = 'search'
+
+    def filter_queryset(self, request, queryset, view):
+        query = request.query_params.get(self.search_param, '')
+        if not query.strip():
+            return queryset
+        return search(queryset, query)
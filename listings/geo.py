@@ -0,0 +1,130 @@
+import math
+
+from django.db.models import F, FloatField, Q, Value
+from django.db.models.functions import ASin, Cast, Cos, Least, Power, Radians, Sin, Sqrt
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = 111.32
+
+GEOHASH_PRECISION = 12
+_BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+
+
+def encode_geohash(latitude, longitude, precision=GEOHASH_PRECISION):
+    """Encode a coordinate as a base32 geohash of the given length."""
+    lat_range, lng_range = [-90.0, 90.0], [-180.0, 180.0]
+    latitude, longitude = float(latitude), float(longitude)
+    chars, bits, value, even = [], 0, 0, True
+
+    while len(chars) < precision:
+        interval, coordinate = (lng_range, longitude) if even else (lat_range, latitude)
+        middle = (interval[0] + interval[1]) / 2
+        value <<= 1
+        if coordinate >= middle:
+            value |= 1
+            interval[0] = middle
+        else:
+            interval[1] = middle
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(_BASE32[value])
+            bits, value = 0, 0
+
+    return ''.join(chars)
+
+
+def cell_size(precision):
+    """Height and width in degrees of a geohash cell of the given length."""
+    total_bits = 5 * precision
+    lng_bits = (total_bits + 1) // 2
+    lat_bits = total_bits // 2
+    return 180.0 / (2 ** lat_bits), 360.0 / (2 ** lng_bits)
+
+
+def covering_prefixes(min_lat, min_lng, max_lat, max_lng):
+    """
+    Geohash prefixes whose cells together cover a bounding box.
+
+    Picks the longest prefix whose cells are at least as large as the box,
+    so the box touches at most 2x2 cells, found from its corners. Returns an
+    empty list when the box is too large for any prefix to narrow it down.
+    """
+    height, width = max_lat - min_lat, max_lng - min_lng
+    precision = 0
+    while precision < GEOHASH_PRECISION:
+        cell_height, cell_width = cell_size(precision + 1)
+        if cell_height < height or cell_width < width:
+            break
+        precision += 1
+
+    if precision == 0:
+        return []
+    corners = [(min_lat, min_lng), (min_lat, max_lng), (max_lat, min_lng), (max_lat, max_lng)]
+    return sorted({encode_geohash(lat, lng, precision) for lat, lng in corners})
+
+
+def radius_bounding_box(latitude, longitude, radius_km):
+    """Bounding box (min_lat, min_lng, max_lat, max_lng) around a circle."""
+    lat_delta = radius_km / KM_PER_DEGREE
+    min_lat, max_lat = max(latitude - lat_delta, -90.0), min(latitude + lat_delta, 90.0)
+
+    cos_lat = math.cos(math.radians(max(abs(min_lat), abs(max_lat))))
+    if cos_lat < 1e-6:
+        return min_lat, -180.0, max_lat, 180.0
+    lng_delta = min(radius_km / (KM_PER_DEGREE * cos_lat), 180.0)
+    return min_lat, longitude - lng_delta, max_lat, longitude + lng_delta
+
+
+def bounding_box_q(min_lat, min_lng, max_lat, max_lng):
+    """
+    Filter for listings inside a bounding box.
+
+    The geohash prefix condition lets the database use the geohash index;
+    the coordinate ranges then trim the cells to the exact box. Boxes that
+    cross the antimeridian skip the prefix condition.
+    """
+    q = Q(latitude__gte=min_lat, latitude__lte=max_lat)
+
+    if min_lng < -180.0 or max_lng > 180.0:
+        west, east = (min_lng + 360.0, max_lng) if min_lng < -180.0 else (min_lng, max_lng - 360.0)
+        return q & (Q(longitude__gte=west) | Q(longitude__lte=east))
+
+    q &= Q(longitude__gte=min_lng, longitude__lte=max_lng)
+    prefixes = covering_prefixes(min_lat, min_lng, max_lat, max_lng)
+    if prefixes:
+        prefix_q = Q()
+        for prefix in prefixes:
+            prefix_q |= Q(geohash__startswith=prefix)
+        q &= prefix_q
+    return q
+
+
+def distance_expression(latitude, longitude):
+    """Great-circle (haversine) distance in km from a point, as an ORM expression."""
+    lat = Radians(Cast(F('latitude'), FloatField()))
+    lng = Radians(Cast(F('longitude'), FloatField()))
+    origin_lat = math.radians(float(latitude))
+    origin_lng = math.radians(float(longitude))
+
+    a = (
+        Power(Sin((lat - Value(origin_lat)) / 2), 2)
+        + Cos(lat) * Value(math.cos(origin_lat)) * Power(Sin((lng - Value(origin_lng)) / 2), 2)
+    )
+    # Rounding can push a a hair above 1 for antipodal points
+    return Value(2 * EARTH_RADIUS_KM) * ASin(Sqrt(Least(a, Value(1.0))))
+
+
+def filter_within_radius(queryset, latitude, longitude, radius_km):
+    """
+    Listings within a radius, annotated with their ``distance`` in km.
+
+    The bounding box prefilter runs on the indexes; the exact haversine
+    check only sees the rows that survive it.
+    """
+    box = radius_bounding_box(latitude, longitude, radius_km)
+    return (
+        queryset.filter(bounding_box_q(*box))
+        .annotate(distance=distance_expression(latitude, longitude))
+        .filter(distance__lte=radius_km)
+    )
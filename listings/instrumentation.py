@@ -0,0 +1,281 @@
+"""
+Per-request performance measurements.
+
+RequestMetricsMiddleware starts a RequestMetrics for each request and keeps
+it in a context variable, so code anywhere below the view can add to it
+without being passed a request:
+
+* every database query, through a wrapper installed on each connection,
+* serializer ``.data`` calls, through TimedSerializerMixin and
+  TimedListSerializer,
+* signal receivers decorated with ``timed_receiver``.
+
+Finished requests are folded into per-view histograms held by the process
+(see ``registry``), which the metrics endpoint reports.
+"""
+import bisect
+import functools
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from rest_framework import serializers
+
+DEFAULTS = {
+    'ENABLED': True,
+    'SERVER_TIMING': True,
+    # Fraction of requests run under cProfile, and how slow one must be to be kept
+    'PROFILE_SAMPLE_RATE': 0.0,
+    'PROFILE_THRESHOLD_MS': 1000,
+    # Directory for .prof files of slow profiled requests; they are logged either way
+    'PROFILE_DIR': None,
+}
+
+DURATION_BUCKETS_MS = (1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 200)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+_current = ContextVar('listings_request_metrics', default=None)
+
+
+def get_options():
+    return dict(DEFAULTS, **getattr(settings, 'LISTINGS_INSTRUMENTATION', {}))
+
+
+class RequestMetrics:
+    """What one request spent its time on."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.view = None
+        self.db_queries = 0
+        self.db_time = 0.0
+        self.timings = {'serializer': 0.0, 'signals': 0.0}
+        self.depth = {'serializer': 0, 'signals': 0}
+        self.duration = None
+        self.response_bytes = None
+
+    def finish(self, response):
+        self.duration = time.perf_counter() - self.started
+        if not getattr(response, 'streaming', False):
+            self.response_bytes = len(response.content)
+
+    def server_timing(self):
+        """Value of the Server-Timing header, durations in milliseconds."""
+        entries = [
+            f'db;dur={self.db_time * 1000:.2f};desc="{self.db_queries} queries"',
+            f"serialize;dur={self.timings['serializer'] * 1000:.2f}",
+            f"signals;dur={self.timings['signals'] * 1000:.2f}",
+        ]
+        if self.duration is not None:
+            entries.append(f'total;dur={self.duration * 1000:.2f}')
+        return ', '.join(entries)
+
+
+def current():
+    """The RequestMetrics of the request being served, or None."""
+    return _current.get()
+
+
+def begin():
+    metrics = RequestMetrics()
+    return metrics, _current.set(metrics)
+
+
+def end(token):
+    _current.reset(token)
+
+
+@contextmanager
+def timed(kind):
+    """
+    Add the time spent in a block to the current request's ``kind`` timing.
+
+    Nested blocks of the same kind (a receiver saving a model that fires
+    another receiver) are only counted once.
+    """
+    metrics = _current.get()
+    if metrics is None:
+        yield
+        return
+    metrics.depth[kind] += 1
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.depth[kind] -= 1
+        if not metrics.depth[kind]:
+            metrics.timings[kind] += time.perf_counter() - start
+
+
+def timed_receiver(receiver):
+    """Count a signal receiver's time as signal-handler time."""
+    @functools.wraps(receiver)
+    def wrapper(*args, **kwargs):
+        with timed('signals'):
+            return receiver(*args, **kwargs)
+    return wrapper
+
+
+def record_query(execute, sql, params, many, context):
+    """Database execute wrapper counting the queries and time of the current request."""
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.db_queries += 1
+        metrics.db_time += time.perf_counter() - start
+
+
+def install_query_recorder(connection):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+def _on_connection_created(sender, connection, **kwargs):
+    install_query_recorder(connection)
+
+
+# Connections are per thread (sync_to_async runs queries in other threads),
+# so the recorder is attached to each one as it connects
+connection_created.connect(_on_connection_created, dispatch_uid='listings_record_query')
+
+
+class TimedListSerializer(serializers.ListSerializer):
+    """ListSerializer counting ``.data`` as serializer time."""
+
+    @property
+    def data(self):
+        with timed('serializer'):
+            return super().data
+
+
+class TimedSerializerMixin:
+    """
+    Count ``.data`` as serializer time.
+
+    Lists (``many=True``) are timed too when the serializer's Meta sets
+    ``list_serializer_class = TimedListSerializer``.
+    """
+
+    @property
+    def data(self):
+        with timed('serializer'):
+            return super().data
+
+
+class Histogram:
+    """Cumulative bucket counts plus count and sum, like a Prometheus histogram."""
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.total += value
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-quantile (None beyond the last bound)."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.bounds, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return None
+
+    def snapshot(self):
+        buckets, seen = {}, 0
+        for bound, count in zip(self.bounds, self.counts):
+            seen += count
+            buckets[str(bound)] = seen
+        buckets['+Inf'] = self.count
+        return {
+            'count': self.count,
+            'sum': round(self.total, 3),
+            'p50': self.quantile(0.5),
+            'p95': self.quantile(0.95),
+            'p99': self.quantile(0.99),
+            'buckets': buckets,
+        }
+
+
+METRICS = {
+    'duration_ms': DURATION_BUCKETS_MS,
+    'db_ms': DURATION_BUCKETS_MS,
+    'db_queries': QUERY_BUCKETS,
+    'serializer_ms': DURATION_BUCKETS_MS,
+    'signals_ms': DURATION_BUCKETS_MS,
+    'response_bytes': SIZE_BUCKETS,
+}
+
+
+class MetricsRegistry:
+    """
+    Histograms of finished requests per view, in this process.
+
+    Each worker process keeps its own; scrape every worker, or run one, to
+    see all traffic.
+    """
+
+    def __init__(self):
+        self.views = {}
+        self.lock = threading.Lock()
+
+    def observe(self, metrics):
+        values = {
+            'duration_ms': metrics.duration * 1000,
+            'db_ms': metrics.db_time * 1000,
+            'db_queries': metrics.db_queries,
+            'serializer_ms': metrics.timings['serializer'] * 1000,
+            'signals_ms': metrics.timings['signals'] * 1000,
+            'response_bytes': metrics.response_bytes,
+        }
+        with self.lock:
+            histograms = self.views.get(metrics.view)
+            if histograms is None:
+                histograms = self.views[metrics.view] = {
+                    name: Histogram(bounds) for name, bounds in METRICS.items()
+                }
+            for name, value in values.items():
+                if value is not None:
+                    histograms[name].observe(value)
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                view: {name: histogram.snapshot() for name, histogram in histograms.items()}
+                for view, histograms in sorted(self.views.items())
+            }
+
+    def reset(self):
+        with self.lock:
+            self.views.clear()
+
+
+registry = MetricsRegistry()
+
+
+def view_name(request, view_func):
+    """
+    ``ViewSet.action`` for DRF viewsets (``ListingViewSet.list``), else the
+    view function's dotted name.
+    """
+    cls = getattr(view_func, 'cls', None)
+    if cls is not None:
+        actions = getattr(view_func, 'actions', None) or {}
+        action = actions.get(request.method.lower(), request.method.lower())
+        return f'{cls.__name__}.{action}'
+    return f'{view_func.__module__}.{view_func.__name__}'
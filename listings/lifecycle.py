@@ -0,0 +1,153 @@
+"""
+Booking lifecycle jobs, run periodically by Celery beat.
+
+Confirmed bookings whose check-out date has come are completed, and pending
+bookings that were not confirmed within BOOKING_PENDING_TTL_HOURS, or whose
+check-in date has passed, are cancelled.
+
+Bookings move in chunks of BOOKING_LIFECYCLE_CHUNK_SIZE, one transaction
+each. A chunk is one UPDATE rather than ``booking.save()`` per row, so the
+booking signals do not run; what they would do is done per chunk instead:
+the released booked nights are deleted, the host analytics rollups are
+adjusted, notifications are written to the outbox in one insert (and sent
+as coalesced batches when it is drained), and cached list pages are
+invalidated. Moved bookings no longer match the
+job's filter, so a run that stops (after BOOKING_LIFECYCLE_MAX_CHUNKS
+chunks, or by failing) picks up where it left off next time.
+
+Each run records the rows moved and rows per second in the Django cache,
+reported by the metrics endpoint. The archival of old bookings (see
+archive.py) runs and is reported the same way.
+"""
+import logging
+import time
+from datetime import timedelta
+from functools import partial
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .analytics import BOOKING_FIELDS, add_booking, apply_stats_deltas
+from .cache import AVAILABILITY_TAG, invalidate_on_commit
+from .models import BookedNight, Booking
+from .outbox import enqueue_booking_events
+
+logger = logging.getLogger('listings.lifecycle')
+
+STATS_KEY = 'listings:lifecycle:{job}'
+JOBS = ('complete_past_bookings', 'expire_stale_pending', 'archive_bookings')
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def transition_chunk(queryset, chunk_size, status):
+    """
+    Move up to ``chunk_size`` bookings of a queryset to ``status``.
+
+    Rows locked by another worker are skipped. Returns the number moved.
+    """
+    with transaction.atomic():
+        rows = list(
+            queryset.select_for_update(skip_locked=True)
+            .order_by()
+            .values('pk', *BOOKING_FIELDS)[:chunk_size]
+        )
+        if not rows:
+            return 0
+        ids = [row['pk'] for row in rows]
+        Booking.objects.filter(pk__in=ids).update(status=status, updated_at=timezone.now())
+        # Neither completed nor cancelled bookings hold nights
+        BookedNight.objects.filter(booking_id__in=ids).delete()
+        deltas = {}
+        for row in rows:
+            previous = {name: row[name] for name in BOOKING_FIELDS}
+            add_booking(deltas, previous, sign=-1)
+            add_booking(deltas, dict(previous, status=status))
+        apply_stats_deltas(deltas)
+        enqueue_booking_events(
+            [Booking(pk=row['pk'], listing_id=row['listing_id'], status=status) for row in rows],
+            'updated',
+        )
+        invalidate_on_commit(AVAILABILITY_TAG)
+    return len(rows)
+
+
+def run_job(job, queryset, move, chunk_size=None, max_chunks=None):
+    """
+    Move the bookings of a queryset chunk by chunk with
+    ``move(queryset, chunk_size)``, which returns the number it moved.
+
+    Returns {'rows', 'seconds', 'rows_per_second', 'has_more'}; ``has_more``
+    means the run stopped at the chunk limit.
+    """
+    chunk_size = chunk_size or _setting('BOOKING_LIFECYCLE_CHUNK_SIZE', 500)
+    max_chunks = max_chunks or _setting('BOOKING_LIFECYCLE_MAX_CHUNKS', 20)
+    start = time.perf_counter()
+    rows, has_more = 0, True
+
+    for _ in range(max_chunks):
+        moved = move(queryset, chunk_size)
+        rows += moved
+        if moved < chunk_size:
+            has_more = False
+            break
+
+    seconds = time.perf_counter() - start
+    result = {
+        'rows': rows,
+        'seconds': round(seconds, 3),
+        'rows_per_second': round(rows / seconds, 1) if rows and seconds else 0.0,
+        'has_more': has_more,
+    }
+    record_run(job, result)
+    logger.info('%s moved %d bookings in %.2fs (%.0f rows/s)',
+                job, rows, seconds, result['rows_per_second'])
+    return result
+
+
+def complete_past_bookings(today=None, **kwargs):
+    """Complete confirmed bookings whose check-out date has come."""
+    today = today or timezone.localdate()
+    queryset = Booking.objects.filter(status='confirmed', check_out__lte=today)
+    return run_job('complete_past_bookings', queryset, partial(transition_chunk, status='completed'), **kwargs)
+
+
+def expire_stale_pending(now=None, **kwargs):
+    """Cancel pending bookings left unconfirmed too long or past their check-in."""
+    now = now or timezone.now()
+    cutoff = now - timedelta(hours=_setting('BOOKING_PENDING_TTL_HOURS', 24))
+    queryset = Booking.objects.filter(
+        Q(created_at__lt=cutoff) | Q(check_in__lt=timezone.localdate(now)),
+        status='pending',
+    )
+    return run_job('expire_stale_pending', queryset, partial(transition_chunk, status='cancelled'), **kwargs)
+
+
+def record_run(job, result):
+    """Store the last run and running totals of a job in the cache."""
+    key = STATS_KEY.format(job=job)
+    stats = cache.get(key) or {'runs': 0, 'total_rows': 0, 'total_seconds': 0.0}
+    stats['runs'] += 1
+    stats['total_rows'] += result['rows']
+    stats['total_seconds'] = round(stats['total_seconds'] + result['seconds'], 3)
+    stats['last_run'] = dict(result, finished_at=timezone.now().isoformat())
+    cache.set(key, stats, timeout=None)
+
+
+def job_stats():
+    """The recorded runs of every lifecycle job, with overall rows per second."""
+    stats = {}
+    for job in JOBS:
+        recorded = cache.get(STATS_KEY.format(job=job))
+        if recorded:
+            recorded = dict(recorded, rows_per_second=(
+                round(recorded['total_rows'] / recorded['total_seconds'], 1)
+                if recorded['total_seconds'] else 0.0
+            ))
+        stats[job] = recorded
+    return stats
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from listings.archive import archive_bookings
+
+
+class Command(BaseCommand):
+    """
+    Move completed and cancelled bookings past BOOKING_ARCHIVE_AFTER_DAYS
+    to the archive now, e.g. for the first archival of a large table.
+    """
+    help = 'Archive completed and cancelled bookings that checked out before the cutoff'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size', type=int, default=None,
+            help='Bookings moved per transaction (default: BOOKING_LIFECYCLE_CHUNK_SIZE)'
+        )
+        parser.add_argument(
+            '--max-chunks', type=int, default=None,
+            help='Stop after this many chunks (default: BOOKING_LIFECYCLE_MAX_CHUNKS); run again to resume'
+        )
+
+    def handle(self, *args, **options):
+        result = archive_bookings(chunk_size=options['chunk_size'], max_chunks=options['max_chunks'])
+        more = ' More remain; run it again to continue.' if result['has_more'] else ''
+        self.stdout.write(self.style.SUCCESS(
+            f"Archived {result['rows']} bookings in {result['seconds']}s.{more}"
+        ))
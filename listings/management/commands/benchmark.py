@@ -0,0 +1,23 @@
+from importlib import import_module
+
+from django.core.management.base import BaseCommand
+
+from listings.benchmarks import BENCHMARKS
+
+
+class Command(BaseCommand):
+    """
+    Run one of the benchmarks registered in listings.benchmarks.
+    """
+    help = 'Run a performance benchmark (see listings/benchmarks)'
+
+    def add_arguments(self, parser):
+        subparsers = parser.add_subparsers(dest='benchmark', required=True)
+        for name, module_path in BENCHMARKS.items():
+            module = import_module(module_path)
+            subparser = subparsers.add_parser(name, help=(module.__doc__ or '').strip().splitlines()[0])
+            module.add_arguments(subparser)
+
+    def handle(self, *args, **options):
+        module = import_module(BENCHMARKS[options['benchmark']])
+        module.run(options, self.stdout)
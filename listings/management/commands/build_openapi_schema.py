@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from listings.schema import schema_is_current, schema_path, write_schema
+
+
+class Command(BaseCommand):
+    """
+    Generate the OpenAPI schema once, for the schema endpoint to serve as is.
+    """
+    help = 'Build the static OpenAPI schema file'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--output',
+            help='File to write (default: LISTINGS_OPENAPI_SCHEMA_PATH)'
+        )
+        parser.add_argument(
+            '--check', action='store_true',
+            help='Only check that the file matches the schema the views generate now'
+        )
+
+    def handle(self, *args, **options):
+        if options['check']:
+            path = options['output'] or schema_path()
+            if not schema_is_current(path):
+                raise CommandError(f'{path} is missing or out of date; run build_openapi_schema.')
+            self.stdout.write(self.style.SUCCESS(f'{path} is up to date.'))
+            return
+        path, size = write_schema(options['output'])
+        self.stdout.write(self.style.SUCCESS(f'Wrote {size} bytes to {path}.'))
@@ -0,0 +1,50 @@
+import sys
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from listings.bulk import FORMATS, import_bookings, import_listings, read_rows
+
+
+class Command(BaseCommand):
+    """
+    Stream listings or bookings from an NDJSON or CSV file into the database.
+    """
+    help = 'Bulk import listings or bookings from NDJSON or CSV'
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=['listings', 'bookings'])
+        parser.add_argument('path', help="File to import, or '-' for standard input")
+        parser.add_argument(
+            '--format', choices=FORMATS,
+            help='Input format (default: guessed from the file extension, else ndjson)'
+        )
+        parser.add_argument(
+            '--user', required=True,
+            help='Username that owns the imported listings or is the guest of the bookings'
+        )
+        parser.add_argument('--chunk-size', type=int, help='Rows validated and inserted per transaction')
+        parser.add_argument('--max-errors', type=int, default=20, help='Row errors to print')
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['user'])
+        except User.DoesNotExist:
+            raise CommandError(f"User {options['user']!r} does not exist.")
+
+        path = options['path']
+        fmt = options['format'] or ('csv' if path.lower().endswith('.csv') else 'ndjson')
+        importer = import_listings if options['kind'] == 'listings' else import_bookings
+
+        stream = sys.stdin if path == '-' else open(path, newline='', encoding='utf-8')
+        try:
+            result = importer(read_rows(stream, fmt), user, chunk_size=options['chunk_size'])
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+
+        for error in result.errors[:options['max_errors']]:
+            self.stderr.write(f"row {error['row']}: {error['errors']}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {result.created} {options['kind']}, {len(result.errors)} rows failed."
+        ))
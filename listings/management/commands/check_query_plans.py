@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from listings.query_plans import SCOPES, access_paths, explain, plan_problems
+
+
+class Command(BaseCommand):
+    """
+    EXPLAIN the list query of every filter and ordering combination the API
+    accepts, and fail when one needs a full table scan or a sort.
+    """
+    help = 'Check that every list query is served by an index'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--only', nargs='+', choices=[scope[0] for scope in SCOPES],
+                            help='Endpoints to check (default: all)')
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+        parser.add_argument('--show-plans', action='store_true', help='Print every plan')
+
+    def handle(self, *args, **options):
+        vendor = connections[options['database']].vendor
+        checked, failures = 0, []
+        for label, queryset in access_paths(options['only']):
+            plan = explain(queryset, options['database'])
+            try:
+                problems = plan_problems(plan, vendor)
+            except ValueError as exc:
+                raise CommandError(str(exc))
+            checked += 1
+            if problems:
+                failures.append(f"{label}: {', '.join(problems)}")
+            if options['show_plans'] or problems:
+                self.stdout.write(f"{label}{'  ' + ', '.join(problems) if problems else ''}")
+                self.stdout.write('    ' + plan.replace('\n', '\n    '))
+
+        if failures:
+            raise CommandError(f'{len(failures)} of {checked} queries are not served by an index:\n'
+                               + '\n'.join(failures))
+        self.stdout.write(self.style.SUCCESS(f'All {checked} list queries are served by an index.'))
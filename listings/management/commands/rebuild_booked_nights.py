@@ -0,0 +1,48 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from listings.availability import ACTIVE_STATUSES, nights_between
+from listings.models import BookedNight, Booking
+
+
+class Command(BaseCommand):
+    """
+    Recreate the booked-night occupancy index from pending and confirmed bookings.
+    """
+    help = 'Rebuild the booked nights used by availability search and overlap checks'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Number of bookings processed per transaction'
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        bookings = (
+            Booking.objects.filter(status__in=ACTIVE_STATUSES)
+            .order_by('pk')
+            .only('pk', 'listing_id', 'check_in', 'check_out')
+        )
+
+        BookedNight.objects.all().delete()
+        processed = 0
+        last_pk = None
+        while True:
+            batch = bookings if last_pk is None else bookings.filter(pk__gt=last_pk)
+            batch = list(batch[:batch_size])
+            if not batch:
+                break
+
+            nights = [
+                BookedNight(listing_id=booking.listing_id, booking=booking, night=night)
+                for booking in batch
+                for night in nights_between(booking.check_in, booking.check_out)
+            ]
+            with transaction.atomic():
+                # Overlapping legacy bookings keep the first night claimed
+                BookedNight.objects.bulk_create(nights, ignore_conflicts=True)
+            processed += len(batch)
+            last_pk = batch[-1].pk
+
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt booked nights for {processed} bookings.'))
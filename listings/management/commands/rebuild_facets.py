@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from listings.facets import rebuild_facets
+
+
+class Command(BaseCommand):
+    """
+    Recreate the amenity index and the stored facet counts from the listings.
+    """
+    help = 'Rebuild the listing amenity index and facet counts'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help='Number of listings indexed per query'
+        )
+
+    def handle(self, *args, **options):
+        indexed = rebuild_facets(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Indexed {indexed} listings.'))
@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand
+
+from listings.geo import encode_geohash
+from listings.models import Listing
+
+
+class Command(BaseCommand):
+    """
+    Recompute the geohash column used by location searches.
+    """
+    help = 'Rebuild the geohash of every listing from its coordinates'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Number of listings updated per query'
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        listings = Listing.objects.order_by('pk').only('pk', 'latitude', 'longitude', 'geohash')
+        updated = 0
+        last_pk = None
+
+        while True:
+            batch = listings if last_pk is None else listings.filter(pk__gt=last_pk)
+            batch = list(batch[:batch_size])
+            if not batch:
+                break
+
+            for listing in batch:
+                if listing.latitude is not None and listing.longitude is not None:
+                    listing.geohash = encode_geohash(listing.latitude, listing.longitude)
+                else:
+                    listing.geohash = ''
+            Listing.objects.bulk_update(batch, ['geohash'])
+            updated += len(batch)
+            last_pk = batch[-1].pk
+
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt geohashes for {updated} listings.'))
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+
+from listings.analytics import rebuild_stats
+from listings.models import Listing
+
+
+class Command(BaseCommand):
+    """
+    Backfill the host analytics rollups, recomputing the daily stats of
+    listings from their bookings.
+    """
+    help = 'Rebuild the daily occupancy, revenue and cancellation stats of listings from their bookings'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'listing_ids', nargs='*',
+            help='Only rebuild these listings (default: all listings)'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help='Number of listings recomputed per transaction'
+        )
+
+    def handle(self, *args, **options):
+        listings = Listing.objects.all()
+        if options['listing_ids']:
+            listings = listings.filter(pk__in=options['listing_ids'])
+
+        counts = rebuild_stats(listings, batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt {counts['rows']} daily stats rows for {counts['listings']} listings."
+        ))
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from listings.models import Listing
+from listings.ratings import rebuild_rating_aggregates
+
+
+class Command(BaseCommand):
+    """
+    Recompute review count, rating sum and rating histogram for listings
+    from the Review table.
+    """
+    help = 'Rebuild the stored rating aggregates of listings from their reviews'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'listing_ids', nargs='*',
+            help='Only rebuild these listings (default: all listings)'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Number of listings recomputed per query'
+        )
+
+    def handle(self, *args, **options):
+        listings = Listing.objects.all()
+        if options['listing_ids']:
+            listings = listings.filter(pk__in=options['listing_ids'])
+
+        updated = rebuild_rating_aggregates(listings, batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt rating aggregates for {updated} listings.'))
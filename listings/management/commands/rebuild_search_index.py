@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from listings.search import rebuild_index
+
+
+class Command(BaseCommand):
+    """
+    Recreate the listing search index from listing titles, locations and descriptions.
+    """
+    help = 'Rebuild the full-text search index of listings'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help='Number of listings indexed per query'
+        )
+
+    def handle(self, *args, **options):
+        indexed = rebuild_index(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Indexed {indexed} listings.'))
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from listings.similar import get_options, rebuild_index
+
+
+class Command(BaseCommand):
+    """
+    Re-encode every listing and rebuild the similar listings index now,
+    instead of waiting for the periodic task.
+    """
+    help = 'Rebuild the listing feature vectors and the similar listings index'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=2000,
+            help='Number of listings encoded per query'
+        )
+
+    def handle(self, *args, **options):
+        indexed = rebuild_index(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Indexed {indexed} listings in {get_options()['INDEX_PATH']}."
+        ))
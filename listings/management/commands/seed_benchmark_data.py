@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from listings.benchmarks.seed import PRESETS, generate, generated_users
+
+
+class Command(BaseCommand):
+    """
+    Fill the database with a deterministic, realistically distributed data set
+    for the benchmarks. ``--scale full`` is 1M listings, 10M reviews and 10M
+    bookings; individual counts override the preset.
+    """
+    help = 'Generate listings, reviews and bookings for benchmarking'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', choices=PRESETS, default='small')
+        parser.add_argument('--listings', type=int)
+        parser.add_argument('--reviews', type=int)
+        parser.add_argument('--bookings', type=int)
+        parser.add_argument('--seed', type=int, default=0, help='Random seed; the same seed gives the same rows')
+        parser.add_argument('--batch-size', type=int, default=2000, help='Listings inserted per transaction')
+        parser.add_argument('--no-search-index', action='store_true', help='Do not index the listings for search')
+        parser.add_argument('--flush', action='store_true', help='Delete previously generated data first')
+
+    def handle(self, *args, **options):
+        if generated_users().exists():
+            if not options['flush']:
+                raise CommandError('Generated data already exists; pass --flush to replace it.')
+            self.stdout.write('Deleting previously generated data...')
+            generated_users().delete()
+
+        counts = dict(PRESETS[options['scale']])
+        for name in counts:
+            if options[name] is not None:
+                counts[name] = options[name]
+
+        created = generate(
+            counts['listings'], counts['reviews'], counts['bookings'],
+            seed=options['seed'], batch_size=options['batch_size'],
+            search_index=not options['no_search_index'], stdout=self.stdout,
+        )
+        self.stdout.write(self.style.SUCCESS(
+            'Created ' + ', '.join(f'{count} {name}' for name, count in created.items()) + '.'
+        ))
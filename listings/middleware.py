@@ -0,0 +1,154 @@
+import cProfile
+import io
+import logging
+import os
+import pstats
+import random
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.db import connections
+
+from . import instrumentation, replicas
+
+logger = logging.getLogger('listings.profiling')
+
+
+class RequestMetricsMiddleware:
+    """
+    Measure each request and report it in a ``Server-Timing`` header.
+
+    Records the queries and database time, serializer time, signal handler
+    time and response size of the request (see instrumentation.py) and adds
+    them to the per-view histograms. A sample of requests
+    (PROFILE_SAMPLE_RATE) runs under cProfile; those slower than
+    PROFILE_THRESHOLD_MS are logged and, with PROFILE_DIR, saved as .prof
+    files. Configure with LISTINGS_INSTRUMENTATION; put it first in
+    MIDDLEWARE so it times the rest of the stack.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        options = instrumentation.get_options()
+        if not options['ENABLED']:
+            return self.get_response(request)
+
+        for connection in connections.all():
+            instrumentation.install_query_recorder(connection)
+        metrics, token = instrumentation.begin()
+        profiler = self._start_profiler(options)
+        try:
+            response = self.get_response(request)
+        finally:
+            instrumentation.end(token)
+        return self._finish(request, response, metrics, profiler, options)
+
+    async def __acall__(self, request):
+        options = instrumentation.get_options()
+        if not options['ENABLED']:
+            return await self.get_response(request)
+
+        metrics, token = instrumentation.begin()
+        # Only sees the event loop thread, not queries run by sync_to_async
+        profiler = self._start_profiler(options)
+        try:
+            response = await self.get_response(request)
+        finally:
+            instrumentation.end(token)
+        return self._finish(request, response, metrics, profiler, options)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        metrics = instrumentation.current()
+        if metrics is not None:
+            metrics.view = instrumentation.view_name(request, view_func)
+
+    def _start_profiler(self, options):
+        if options['PROFILE_SAMPLE_RATE'] <= 0 or random.random() >= options['PROFILE_SAMPLE_RATE']:
+            return None
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Another profiler is already active in this thread
+            return None
+        return profiler
+
+    def _finish(self, request, response, metrics, profiler, options):
+        if profiler is not None:
+            profiler.disable()
+        metrics.finish(response)
+        if metrics.view is None:
+            metrics.view = 'unresolved'
+        instrumentation.registry.observe(metrics)
+
+        if options['SERVER_TIMING']:
+            response['Server-Timing'] = metrics.server_timing()
+        if profiler is not None and metrics.duration * 1000 >= options['PROFILE_THRESHOLD_MS']:
+            self._report_profile(request, metrics, profiler, options)
+        return response
+
+    def _report_profile(self, request, metrics, profiler, options):
+        output = io.StringIO()
+        pstats.Stats(profiler, stream=output).sort_stats('cumulative').print_stats(25)
+        logger.warning(
+            'Slow request %s %s (%s) took %.0fms\n%s',
+            request.method, request.path, metrics.view, metrics.duration * 1000, output.getvalue(),
+        )
+        if options['PROFILE_DIR']:
+            name = f"{time.strftime('%Y%m%d-%H%M%S')}-{metrics.view}-{os.getpid()}.prof"
+            profiler.dump_stats(os.path.join(options['PROFILE_DIR'], name))
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Give each request its read routing state, and pin users who write.
+
+    Reads start on the primary; ReplicaReadMixin moves those of eligible
+    viewset actions to a replica. After a successful unsafe request by a
+    signed-in user, that user reads from the primary for PIN_SECONDS (see
+    replicas.py). Put it after AuthenticationMiddleware.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        token = replicas.begin()
+        try:
+            response = self.get_response(request)
+        finally:
+            replicas.end(token)
+        self._pin_writer(request, response)
+        return response
+
+    async def __acall__(self, request):
+        token = replicas.begin()
+        try:
+            response = await self.get_response(request)
+        finally:
+            replicas.end(token)
+        self._pin_writer(request, response)
+        return response
+
+    def _pin_writer(self, request, response):
+        # DRF copies the user it authenticated onto the Django request
+        user = getattr(request, 'user', None)
+        if (request.method not in replicas.SAFE_METHODS and response.status_code < 400
+                and user is not None and user.is_authenticated):
+            replicas.pin_to_primary(user)
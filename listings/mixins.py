@@ -0,0 +1,91 @@
+from rest_framework.response import Response
+
+from .eager import eager_load
+from .fast_serializers import FastListSerializer
+from .replicas import SAFE_METHODS, is_pinned, read_from_replica
+from .sparse import apply_sparse_fields, requested_fields
+
+
+class EagerLoadingMixin:
+    """
+    Viewset mixin that joins or prefetches every relation the serializer reads,
+    so serializing a page costs a fixed number of queries.
+    """
+
+    def get_queryset(self):
+        return eager_load(super().get_queryset(), self.get_serializer_class())
+
+
+class FilteredListMixin:
+    """
+    Viewset mixin building the list's filtered queryset once per request,
+    so list and its conditional GET validators (see conditional.py) share
+    it and filters such as the ranked search run once.
+    """
+
+    def get_list_queryset(self):
+        if not hasattr(self, '_list_queryset'):
+            self._list_queryset = self.filter_queryset(self.get_queryset())
+        return self._list_queryset
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.get_list_queryset()
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            serializer = self.get_serializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
+        serializer = self.get_serializer(queryset, many=True)
+        return Response(serializer.data)
+
+
+class SparseFieldsetMixin:
+    """
+    Viewset mixin for ``?fields=`` and ``?expand=`` (see sparse.py).
+
+    list and retrieve load only the columns of the requested fields; other
+    actions opt in with ``sparse_queryset()``. Pages (``many=True``) are
+    serialized by the compiled fast path.
+    """
+    sparse_actions = ('list', 'retrieve')
+
+    def get_sparse_fields(self):
+        if not hasattr(self, '_sparse_fields'):
+            self._sparse_fields = requested_fields(getattr(self, 'request', None))
+        return self._sparse_fields
+
+    def sparse_queryset(self, queryset, serializer_class=None):
+        fields, expand = self.get_sparse_fields()
+        return apply_sparse_fields(queryset, serializer_class or self.get_serializer_class(), fields, expand)
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        if self.action in self.sparse_actions:
+            queryset = self.sparse_queryset(queryset)
+        return queryset
+
+    def get_serializer(self, *args, serializer_class=None, **kwargs):
+        serializer_class = serializer_class or self.get_serializer_class()
+        kwargs.setdefault('context', self.get_serializer_context())
+        fields, expand = self.get_sparse_fields()
+        if kwargs.get('many') and args and self.request.method in ('GET', 'HEAD'):
+            return FastListSerializer(serializer_class, args[0], fields, expand, kwargs['context'])
+        if fields is not None or expand:
+            kwargs.update(fields=fields, expand=expand)
+        return serializer_class(*args, **kwargs)
+
+
+class ReplicaReadMixin:
+    """
+    Viewset mixin serving the reads of safe ``replica_actions`` from a read
+    replica, unless the user wrote recently (see replicas.py).
+
+    The choice is made once the request is authenticated, so the
+    authentication queries themselves run on the primary.
+    """
+    replica_actions = ('list', 'retrieve')
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if (request.method in SAFE_METHODS and self.action in self.replica_actions
+                and not is_pinned(request.user)):
+            read_from_replica()
@@ -1,5 +1,7 @@
 from django.db import models
 from django.contrib.auth.models import User
+from django.utils import timezone
+from django.core.exceptions import ValidationError
 from django.core.validators import MinValueValidator, MaxValueValidator
 import uuid
 
@@ -24,28 +26,80 @@ class Listing(models.Model):
     location = models.CharField(max_length=200)
     latitude = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True)
     longitude = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True)
+    geohash = models.CharField(max_length=12, blank=True, default='', db_index=True, editable=False)
     amenities = models.JSONField(default=list, blank=True)
     max_guests = models.PositiveIntegerField(default=1)
     is_available = models.BooleanField(default=True)
     owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name='listings')
+    
+    # Rating aggregates, kept current by the review signals in signals.py
+    review_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_sum = models.PositiveIntegerField(default=0, editable=False)
+    rating_1_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_2_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_3_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_4_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_5_count = models.PositiveIntegerField(default=0, editable=False)
+    
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
         ordering = ['-created_at']
+        # Keyset pagination orders by the requested field plus id; see
+        # ``manage.py check_query_plans`` for the queries these serve
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='listing_created_idx'),
+            models.Index(fields=['price_per_night', 'id'], name='listing_price_idx'),
+            models.Index(fields=['title', 'id'], name='listing_title_idx'),
+            models.Index(fields=['location', '-created_at', '-id'], name='listing_location_created_idx'),
+            models.Index(fields=['location', 'price_per_night', 'id'], name='listing_location_price_idx'),
+            models.Index(fields=['location', 'title', 'id'], name='listing_location_title_idx'),
+            models.Index(fields=['owner', '-created_at', '-id'], name='listing_owner_created_idx'),
+        ]
         verbose_name = 'Listing'
         verbose_name_plural = 'Listings'
     
+    # Columns the facet counts are derived from (see facets.py)
+    FACET_FIELDS = ('listing_type', 'price_per_night', 'amenities')
+    
     def __str__(self):
         return f"{self.title} - {self.location}"
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """
+        Remember the facet columns as loaded, so saving the listing can
+        adjust the facet counts without reading them back
+        """
+        instance = super().from_db(db, field_names, values)
+        if all(name in field_names for name in cls.FACET_FIELDS):
+            instance._stored_facets = instance.facet_columns()
+        return instance
+    
+    def facet_columns(self):
+        """The values of FACET_FIELDS, amenities copied"""
+        amenities = self.amenities
+        return {
+            'listing_type': self.listing_type,
+            'price_per_night': self.price_per_night,
+            'amenities': list(amenities) if isinstance(amenities, (list, tuple)) else amenities,
+        }
+    
     @property
     def average_rating(self):
-        """Calculate average rating for this listing"""
-        reviews = self.reviews.all()
-        if reviews:
-            return sum(review.rating for review in reviews) / len(reviews)
+        """Average rating for this listing, from the stored aggregates"""
+        if self.review_count:
+            return self.rating_sum / self.review_count
         return 0
+    
+    @property
+    def rating_histogram(self):
+        """Number of reviews per star rating, from the stored aggregates"""
+        return {
+            star: getattr(self, f'rating_{star}_count')
+            for star in range(1, 6)
+        }
 
 
 class Review(models.Model):
@@ -65,6 +119,14 @@ class Review(models.Model):
     class Meta:
         unique_together = ('listing', 'reviewer')
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='review_created_idx'),
+            models.Index(fields=['rating', 'id'], name='review_rating_idx'),
+            models.Index(fields=['rating', '-created_at', '-id'], name='review_rating_created_idx'),
+            models.Index(fields=['listing', '-created_at', '-id'], name='review_listing_created_idx'),
+            models.Index(fields=['listing', 'rating', 'id'], name='review_listing_rating_idx'),
+            models.Index(fields=['reviewer', '-created_at', '-id'], name='review_reviewer_created_idx'),
+        ]
         verbose_name = 'Review'
         verbose_name_plural = 'Reviews'
     
@@ -96,6 +158,17 @@ class Booking(models.Model):
     
     class Meta:
         ordering = ['-created_at']
+        # Guests only ever see their own bookings
+        indexes = [
+            models.Index(fields=['guest', '-created_at', '-id'], name='booking_guest_created_idx'),
+            models.Index(fields=['guest', 'check_in', 'id'], name='booking_guest_check_in_idx'),
+            models.Index(fields=['guest', 'check_out', 'id'], name='booking_guest_check_out_idx'),
+            # Admin changelist order and date drill-down
+            models.Index(fields=['-created_at', '-id'], name='booking_created_idx'),
+            models.Index(fields=['check_in', 'id'], name='booking_check_in_idx'),
+            # Bookings due for a lifecycle step (see lifecycle.py)
+            models.Index(fields=['status', 'check_out'], name='booking_status_check_out_idx'),
+        ]
         verbose_name = 'Booking'
         verbose_name_plural = 'Bookings'
     
@@ -106,3 +179,252 @@ class Booking(models.Model):
     def duration_days(self):
         """Calculate the duration of the booking in days"""
         return (self.check_out - self.check_in).days
+
+
+class BookedNight(models.Model):
+    """
+    One night of a listing held by a pending or confirmed booking.
+    
+    The unique (listing, night) pair is the occupancy index used by the
+    availability search, and makes overlapping bookings impossible to store.
+    """
+    listing = models.ForeignKey(Listing, on_delete=models.CASCADE, related_name='booked_nights')
+    booking = models.ForeignKey(Booking, on_delete=models.CASCADE, related_name='booked_nights')
+    night = models.DateField()
+    
+    class Meta:
+        unique_together = ('listing', 'night')
+        verbose_name = 'Booked Night'
+        verbose_name_plural = 'Booked Nights'
+    
+    def __str__(self):
+        return f"{self.listing_id} - {self.night}"
+
+
+class ArchivedBooking(models.Model):
+    """
+    Completed or cancelled booking moved out of Booking by the archival job.
+    
+    Same fields as Booking, copied as they were, so the Booking table only
+    holds the bookings current requests touch; see archive.py. Archived
+    bookings are read-only and listed with ``?include_archived=1``.
+    """
+    id = models.UUIDField(primary_key=True, editable=False)
+    listing = models.ForeignKey(Listing, on_delete=models.CASCADE, related_name='archived_bookings')
+    guest = models.ForeignKey(User, on_delete=models.CASCADE, related_name='archived_bookings')
+    check_in = models.DateField()
+    check_out = models.DateField()
+    guests_count = models.PositiveIntegerField(default=1)
+    total_price = models.DecimalField(max_digits=10, decimal_places=2)
+    status = models.CharField(max_length=20, choices=Booking.STATUS_CHOICES)
+    # Copied from the booking, not set on save
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['-created_at']
+        # The guest orderings of Booking, for listings that include the archive
+        indexes = [
+            models.Index(fields=['guest', '-created_at', '-id'], name='archive_guest_created_idx'),
+            models.Index(fields=['guest', 'check_in', 'id'], name='archive_guest_check_in_idx'),
+            models.Index(fields=['guest', 'check_out', 'id'], name='archive_guest_check_out_idx'),
+        ]
+        verbose_name = 'Archived Booking'
+        verbose_name_plural = 'Archived Bookings'
+    
+    def __str__(self):
+        return f"Archived booking {self.id} - {self.listing_id}"
+    
+    @property
+    def duration_days(self):
+        """Calculate the duration of the booking in days"""
+        return (self.check_out - self.check_in).days
+
+
+class ListingToken(models.Model):
+    """
+    Posting in the listing search index: one token of a listing's text and its weight.
+    
+    Maintained by the listing signals; see search.py.
+    """
+    listing = models.ForeignKey(Listing, on_delete=models.CASCADE, related_name='search_tokens')
+    token = models.CharField(max_length=40)
+    weight = models.PositiveIntegerField(default=1)
+    
+    class Meta:
+        unique_together = ('token', 'listing')
+        verbose_name = 'Listing Token'
+        verbose_name_plural = 'Listing Tokens'
+    
+    def __str__(self):
+        return f"{self.token} ({self.weight}) - {self.listing_id}"
+
+
+class ListingAmenity(models.Model):
+    """
+    One amenity of a listing, normalized from ``Listing.amenities``.
+    
+    Maintained by the listing signals; see facets.py.
+    """
+    listing = models.ForeignKey(Listing, on_delete=models.CASCADE, related_name='amenity_index')
+    amenity = models.CharField(max_length=50)
+    
+    class Meta:
+        unique_together = ('amenity', 'listing')
+        verbose_name = 'Listing Amenity'
+        verbose_name_plural = 'Listing Amenities'
+    
+    def __str__(self):
+        return f"{self.amenity} - {self.listing_id}"
+
+
+class FacetCount(models.Model):
+    """
+    Number of listings with a facet value (a listing type, price bucket or
+    amenity), over all listings.
+    
+    Kept current by the listing signals so unfiltered facet counts are a
+    single small read; see facets.py.
+    """
+    facet = models.CharField(max_length=20)
+    value = models.CharField(max_length=50)
+    count = models.IntegerField(default=0)
+    
+    class Meta:
+        unique_together = ('facet', 'value')
+        verbose_name = 'Facet Count'
+        verbose_name_plural = 'Facet Counts'
+    
+    def __str__(self):
+        return f"{self.facet}={self.value}: {self.count}"
+
+
+class ListingRate(models.Model):
+    """
+    A seasonal, weekend or length-of-stay rate of a listing; see pricing.py.
+    
+    A season prices the nights from ``start_date`` up to (not including)
+    ``end_date`` at its ``price_per_night``. The weekend rate adjusts weekend
+    nights by ``adjustment_percent``, and a length-of-stay rate adjusts the
+    total of stays of at least ``min_nights`` nights.
+    """
+    KINDS = [
+        ('season', 'Season'),
+        ('weekend', 'Weekend'),
+        ('length_of_stay', 'Length of stay'),
+    ]
+    
+    listing = models.ForeignKey(Listing, on_delete=models.CASCADE, related_name='rates')
+    kind = models.CharField(max_length=20, choices=KINDS)
+    start_date = models.DateField(null=True, blank=True)
+    end_date = models.DateField(null=True, blank=True)
+    price_per_night = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    adjustment_percent = models.DecimalField(
+        max_digits=5, decimal_places=2, null=True, blank=True,
+        validators=[MinValueValidator(-100), MaxValueValidator(500)]
+    )
+    min_nights = models.PositiveIntegerField(null=True, blank=True)
+    
+    class Meta:
+        ordering = ['listing', 'kind', 'start_date', 'min_nights']
+        verbose_name = 'Listing Rate'
+        verbose_name_plural = 'Listing Rates'
+    
+    def __str__(self):
+        return f"{self.get_kind_display()} rate - {self.listing_id}"
+    
+    def clean(self):
+        required = {
+            'season': ['start_date', 'end_date', 'price_per_night'],
+            'weekend': ['adjustment_percent'],
+            'length_of_stay': ['min_nights', 'adjustment_percent'],
+        }.get(self.kind, [])
+        errors = {name: 'This field is required for this kind of rate.'
+                  for name in required if getattr(self, name) is None}
+        if not errors and self.kind == 'season' and self.end_date <= self.start_date:
+            errors['end_date'] = 'End date must be after start date.'
+        if errors:
+            raise ValidationError(errors)
+
+
+class ListingVector(models.Model):
+    """
+    Feature vector of a listing for the similar listings search; see similar.py.
+    
+    Kept current by the listing signals and re-encoded for every listing by
+    the periodic index rebuild.
+    """
+    listing = models.OneToOneField(
+        Listing, on_delete=models.CASCADE, primary_key=True, related_name='feature_vector'
+    )
+    vector = models.BinaryField()
+    # Set by the writer: the periodic rebuild dates its rows to its start
+    updated_at = models.DateTimeField(db_index=True)
+    
+    class Meta:
+        verbose_name = 'Listing Vector'
+        verbose_name_plural = 'Listing Vectors'
+    
+    def __str__(self):
+        return f"Vector of {self.listing_id}"
+
+
+class ListingDailyStats(models.Model):
+    """
+    Booking activity of a listing on one day, for host analytics; see analytics.py.
+    
+    Nights and revenue are those of confirmed and completed bookings on the
+    night of ``date``; bookings and cancellations count bookings checking
+    in on ``date``. Kept current from booking changes by adding deltas.
+    """
+    listing = models.ForeignKey(Listing, on_delete=models.CASCADE, related_name='daily_stats')
+    date = models.DateField()
+    booked_nights = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    bookings = models.IntegerField(default=0)
+    cancellations = models.IntegerField(default=0)
+    
+    class Meta:
+        unique_together = ('listing', 'date')
+        verbose_name = 'Listing Daily Stats'
+        verbose_name_plural = 'Listing Daily Stats'
+    
+    def __str__(self):
+        return f"{self.listing_id} - {self.date}"
+
+
+class NotificationOutbox(models.Model):
+    """
+    Booking notification waiting to be sent.
+    
+    Rows are written in the same transaction as the booking change and
+    drained in batches by the drain_notification_outbox Celery task.
+    Bookings are referenced by id only so pending notifications survive
+    the booking being deleted.
+    """
+    EVENT_CHOICES = [
+        ('created', 'Created'),
+        ('updated', 'Updated'),
+    ]
+    
+    booking_id = models.UUIDField()
+    listing_id = models.UUIDField()
+    event = models.CharField(max_length=20, choices=EVENT_CHOICES)
+    status = models.CharField(max_length=20, choices=Booking.STATUS_CHOICES)
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    available_at = models.DateTimeField(default=timezone.now)
+    sent_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['available_at']
+        indexes = [
+            models.Index(fields=['sent_at', 'available_at'], name='outbox_pending_idx'),
+        ]
+        verbose_name = 'Notification Outbox Entry'
+        verbose_name_plural = 'Notification Outbox'
+    
+    def __str__(self):
+        return f"{self.event} {self.booking_id} - {self.status}"
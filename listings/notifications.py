@@ -0,0 +1,14 @@
+def send_booking_notifications(messages):
+    """
+    Send a batch of booking notifications.
+    
+    Each message is a dict with booking_id, listing_title, event and status.
+    This is where you would integrate with an email or SMS provider's batch
+    API; raising makes the outbox retry the whole batch with backoff.
+    """
+    for message in messages:
+        # For now, we'll just print to console
+        if message['event'] == 'created':
+            print(f"New booking created: {message['booking_id']} for {message['listing_title']}")
+        else:
+            print(f"Booking updated: {message['booking_id']} - Status: {message['status']}")
@@ -0,0 +1,173 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Listing, NotificationOutbox
+from .notifications import send_booking_notifications
+
+DRAIN_SCHEDULED_KEY = 'listings:outbox:drain-scheduled'
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def enqueue_booking_events(bookings, event):
+    """
+    Record notifications for bookings in the current transaction.
+
+    The rows commit or roll back together with the booking change; a drain
+    is scheduled once the transaction commits.
+    """
+    NotificationOutbox.objects.bulk_create([
+        NotificationOutbox(
+            booking_id=booking.pk, listing_id=booking.listing_id,
+            event=event, status=booking.status,
+        )
+        for booking in bookings
+    ])
+    transaction.on_commit(schedule_drain)
+
+
+def schedule_drain():
+    """
+    Ask a worker to drain the outbox.
+
+    Bursts of booking changes schedule a single drain: the task is delayed
+    by OUTBOX_DRAIN_DELAY seconds and not scheduled again meanwhile. With
+    CELERY_TASK_ALWAYS_EAGER (e.g. in tests) the outbox is drained at once.
+    """
+    from .tasks import drain_notification_outbox
+
+    if drain_notification_outbox.app.conf.task_always_eager:
+        drain_notification_outbox.apply()
+        return
+
+    delay = _setting('OUTBOX_DRAIN_DELAY', 2)
+    if cache.add(DRAIN_SCHEDULED_KEY, True, timeout=delay):
+        drain_notification_outbox.apply_async(countdown=delay)
+
+
+def retry_delay(attempts):
+    """Exponential backoff before retrying a batch that failed ``attempts`` times."""
+    base = _setting('OUTBOX_RETRY_BACKOFF', 30)
+    return min(base * 2 ** (attempts - 1), _setting('OUTBOX_RETRY_BACKOFF_MAX', 3600))
+
+
+def coalesce(entries):
+    """
+    Collapse the entries of each booking into one message.
+
+    A booking created and then updated within the batch is announced once
+    as created, with its latest status; several updates become one update.
+    """
+    messages = {}
+    for entry in sorted(entries, key=lambda entry: (entry.created_at, entry.pk)):
+        message = messages.get(entry.booking_id)
+        if message is None:
+            messages[entry.booking_id] = {
+                'booking_id': entry.booking_id,
+                'listing_id': entry.listing_id,
+                'event': entry.event,
+                'status': entry.status,
+            }
+        else:
+            if entry.event == 'created':
+                message['event'] = 'created'
+            message['status'] = entry.status
+    return list(messages.values())
+
+
+def claim_batch(batch_size):
+    """
+    Lease a batch of due entries to this worker.
+
+    Claimed entries are pushed OUTBOX_LEASE_SECONDS into the future, so a
+    worker that dies mid-batch only delays them. Other workers skip rows
+    that are locked while being claimed.
+    """
+    now = timezone.now()
+    lease = timedelta(seconds=_setting('OUTBOX_LEASE_SECONDS', 300))
+    with transaction.atomic():
+        entries = list(
+            NotificationOutbox.objects.select_for_update(skip_locked=True)
+            .filter(
+                sent_at__isnull=True,
+                available_at__lte=now,
+                attempts__lt=_setting('OUTBOX_MAX_ATTEMPTS', 8),
+            )
+            .order_by('available_at', 'pk')[:batch_size]
+        )
+        if entries:
+            NotificationOutbox.objects.filter(pk__in=[entry.pk for entry in entries]).update(
+                available_at=now + lease, attempts=F('attempts') + 1,
+            )
+    for entry in entries:
+        entry.attempts += 1
+    return entries
+
+
+def send_batch(entries):
+    """
+    Send the coalesced notifications of claimed entries.
+
+    Marks them sent on success; on failure reschedules them with backoff
+    and re-raises.
+    """
+    messages = coalesce(entries)
+    titles = dict(
+        Listing.objects.filter(pk__in={message['listing_id'] for message in messages})
+        .values_list('pk', 'title')
+    )
+    for message in messages:
+        message['listing_title'] = titles.get(message['listing_id'], '')
+
+    ids = [entry.pk for entry in entries]
+    try:
+        send_booking_notifications(messages)
+    except Exception as exc:
+        attempts = max(entry.attempts for entry in entries)
+        NotificationOutbox.objects.filter(pk__in=ids).update(
+            available_at=timezone.now() + timedelta(seconds=retry_delay(attempts)),
+            last_error=repr(exc)[:1000],
+        )
+        raise
+    NotificationOutbox.objects.filter(pk__in=ids).update(sent_at=timezone.now(), last_error='')
+    return len(messages)
+
+
+def purge_sent(now=None):
+    """
+    Delete the entries sent more than OUTBOX_RETENTION_HOURS (168) hours ago.
+
+    Returns the number deleted.
+    """
+    now = now or timezone.now()
+    cutoff = now - timedelta(hours=_setting('OUTBOX_RETENTION_HOURS', 168))
+    deleted, _ = NotificationOutbox.objects.filter(sent_at__lt=cutoff).delete()
+    return deleted
+
+
+def drain(batch_size=None, max_batches=None):
+    """
+    Send every due outbox entry, batch by batch.
+
+    Stops after OUTBOX_MAX_BATCHES batches. Returns (entries processed,
+    messages sent, whether due entries may remain). Raises the first send
+    error after rescheduling the failed batch.
+    """
+    batch_size = batch_size or _setting('OUTBOX_BATCH_SIZE', 200)
+    max_batches = max_batches or _setting('OUTBOX_MAX_BATCHES', 50)
+    processed = sent = 0
+
+    for _ in range(max_batches):
+        entries = claim_batch(batch_size)
+        if not entries:
+            return processed, sent, False
+        sent += send_batch(entries)
+        processed += len(entries)
+    return processed, sent, True
@@ -0,0 +1,266 @@
+import base64
+import datetime
+import decimal
+import json
+import uuid
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+def get_ordering(queryset):
+    """
+    The (name, descending) keys a queryset is ordered by, ending with the
+    primary key so that every row has a unique position.
+    """
+    terms = list(queryset.query.order_by) or list(queryset.query.get_meta().ordering)
+    ordering = []
+    for term in terms:
+        if not isinstance(term, str):
+            raise ValueError(f'Keyset pagination needs named orderings, got {term!r}')
+        name = term.lstrip('-')
+        ordering.append(('pk' if name == 'id' else name, term.startswith('-')))
+
+    if not any(name == 'pk' for name, _ in ordering):
+        ordering.append(('pk', ordering[0][1] if ordering else False))
+    return ordering
+
+
+def row_position(row, ordering):
+    """The values of a row for the ordering keys."""
+    position = []
+    for name, _ in ordering:
+        value = row
+        for attr in name.split('__'):
+            value = value.get(attr) if isinstance(value, dict) else getattr(value, attr)
+        position.append(value)
+    return position
+
+
+def keyset_filter(ordering, position):
+    """
+    Q selecting the rows strictly after a position, in the given ordering.
+
+    For keys (a, b, c) that is a > x OR (a = x AND b > y) OR (a = x AND b = y
+    AND c > z), with < for descending keys, which databases answer with a
+    range scan on a matching index.
+    """
+    condition = Q()
+    equal = Q()
+    for (name, descending), value in zip(ordering, position):
+        lookup = 'lt' if descending else 'gt'
+        condition |= equal & Q(**{f'{name}__{lookup}': value})
+        equal &= Q(**{name: value})
+    return condition
+
+
+def _encode_value(value):
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    if isinstance(value, (decimal.Decimal, uuid.UUID)):
+        return str(value)
+    return value
+
+
+def _decode_value(model, name, value):
+    if value is None:
+        return value
+    try:
+        field = model._meta.pk if name == 'pk' else model._meta.get_field(name)
+    except FieldDoesNotExist:
+        # Annotations such as distance or search_rank are plain numbers
+        return value
+    return field.to_python(value)
+
+
+def encode_cursor(ordering, position, reverse=False):
+    """Opaque cursor for a position in an ordering."""
+    payload = {
+        'o': [('-' if descending else '') + name for name, descending in ordering],
+        'p': [_encode_value(value) for value in position],
+        'r': int(reverse),
+    }
+    data = json.dumps(payload, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(data).decode().rstrip('=')
+
+
+def decode_cursor(cursor, ordering, model):
+    """
+    Position and direction of a cursor.
+
+    Raises ValueError if the cursor is malformed or was issued for another ordering.
+    """
+    try:
+        data = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        payload = json.loads(data)
+        expected = [('-' if descending else '') + name for name, descending in ordering]
+        if payload['o'] != expected or len(payload['p']) != len(ordering):
+            raise ValueError('Cursor does not match the requested ordering')
+        position = [
+            _decode_value(model, name, value)
+            for (name, _), value in zip(ordering, payload['p'])
+        ]
+        return position, bool(payload['r'])
+    except (TypeError, KeyError, ValueError, ValidationError) as exc:
+        raise ValueError('Invalid cursor') from exc
+
+
+def _page_queryset(queryset, ordering, page_size, position, reverse):
+    if reverse:
+        ordering = [(name, not descending) for name, descending in ordering]
+    if position is not None:
+        queryset = queryset.filter(keyset_filter(ordering, position))
+    queryset = queryset.order_by(*(('-' if descending else '') + name for name, descending in ordering))
+    return queryset[:page_size + 1]
+
+
+def _trim_page(rows, page_size, reverse):
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    if reverse:
+        rows.reverse()
+    return rows, has_more
+
+
+def paginate(queryset, ordering, page_size, position=None, reverse=False):
+    """
+    Fetch one page of rows after (or, with reverse, before) a position.
+
+    Returns (rows, has_more) where has_more tells whether rows exist beyond
+    the page in the direction of travel.
+    """
+    rows = list(_page_queryset(queryset, ordering, page_size, position, reverse))
+    return _trim_page(rows, page_size, reverse)
+
+
+def paginate_merged(querysets, ordering, page_size, position=None, reverse=False):
+    """
+    paginate() over several querysets in the same ordering, as if they were one.
+
+    Each queryset gives the rows of a full page from the position, and the
+    page is the first of those in the merged order.
+    """
+    rows = []
+    for queryset in querysets:
+        rows.extend(_page_queryset(queryset, ordering, page_size, position, reverse))
+    # Stable sorts from the last key to the first give the full ordering
+    for index in reversed(range(len(ordering))):
+        name, descending = ordering[index]
+        rows.sort(key=lambda row: row_position(row, [(name, descending)])[0], reverse=descending != reverse)
+    return _trim_page(rows[:page_size + 1], page_size, reverse)
+
+
+async def apaginate(queryset, ordering, page_size, position=None, reverse=False):
+    """Async version of paginate(), for views running on the event loop."""
+    rows = [row async for row in _page_queryset(queryset, ordering, page_size, position, reverse).aiterator()]
+    return _trim_page(rows, page_size, reverse)
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination keyed on the requested ordering plus the primary key.
+
+    Unlike offset pagination, fetching a page costs the same at any depth:
+    the cursor carries the last row's ordering values and the next page is a
+    range scan from there. The ordering comes from the queryset, so it follows
+    whatever OrderingFilter allowed (defaulting to ``-created_at``), with
+    ``id`` added as a tie-breaker.
+    """
+    page_size = getattr(settings, 'LISTINGS_PAGE_SIZE', 25)
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(page_size, self.max_page_size))
+
+    def get_position(self, request, ordering, model):
+        """Position and direction of the requested cursor; (None, False) for the first page."""
+        cursor = request.query_params.get(self.cursor_query_param)
+        if not cursor:
+            return None, False
+        try:
+            return decode_cursor(cursor, ordering, model)
+        except ValueError:
+            raise NotFound(self.invalid_cursor_message)
+
+    def page_versions(self, queryset, request, fields=('pk', 'updated_at')):
+        """
+        ``fields`` of the rows the requested page holds, plus the one that
+        tells whether there is a next page, without loading the rows.
+
+        Runs the page's query selecting only those columns, which the
+        ordering index serves like the page itself.
+        """
+        ordering = get_ordering(queryset)
+        position, reverse = self.get_position(request, ordering, queryset.model)
+        rows = queryset.select_related(None).prefetch_related(None).values_list(*fields)
+        return list(_page_queryset(rows, ordering, self.get_page_size(request), position, reverse))
+
+    def paginate_queryset(self, queryset, request, view=None):
+        return self.paginate_querysets([queryset], request, view)
+
+    def paginate_querysets(self, querysets, request, view=None):
+        """Page through several querysets in the same ordering as one, such as a table and its archive."""
+        self.request = request
+        self.ordering = get_ordering(querysets[0])
+        page_size = self.get_page_size(request)
+        position, reverse = self.get_position(request, self.ordering, querysets[0].model)
+
+        if len(querysets) == 1:
+            rows, has_more = paginate(querysets[0], self.ordering, page_size, position, reverse)
+        else:
+            rows, has_more = paginate_merged(querysets, self.ordering, page_size, position, reverse)
+
+        if reverse:
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, position is not None
+        if rows:
+            self.first_position = row_position(rows[0], self.ordering)
+            self.last_position = row_position(rows[-1], self.ordering)
+        else:
+            self.has_next = self.has_previous = False
+        return rows
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        cursor = encode_cursor(self.ordering, self.last_position)
+        return replace_query_param(url, self.cursor_query_param, cursor)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        url = self.request.build_absolute_uri()
+        cursor = encode_cursor(self.ordering, self.first_position, reverse=True)
+        return replace_query_param(url, self.cursor_query_param, cursor)
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
@@ -0,0 +1,169 @@
+"""
+Stay prices from per-listing rate tables.
+
+A night costs the listing's ``price_per_night``, or the price of the
+season (ListingRate of kind 'season') covering it, the latest starting one
+when seasons overlap. Weekend nights (LISTINGS_WEEKEND_NIGHTS, Friday and
+Saturday by default) are adjusted by the listing's weekend rate, and the
+total of a stay by the length-of-stay rate with the highest ``min_nights``
+the stay reaches. Adjusted amounts round half up to the cent.
+
+Prices are worked out for many listings at once. PriceCalendar lays the
+nightly prices of a set of listings over a date range out as an integer
+array of cents, one row per listing and one column per night, and keeps
+the running totals of each row, so the price of any stay is a subtraction
+of two of them; a batch of stays is priced with a few numpy array
+operations whatever its size. Amounts are whole cents throughout, so the
+totals are exact Decimals.
+"""
+from datetime import timedelta
+from decimal import ROUND_HALF_UP, Decimal
+
+import numpy as np
+from django.conf import settings
+
+from .models import ListingRate
+
+CENT = Decimal('0.01')
+
+
+def weekend_nights():
+    """Weekdays (Monday is 0) of the nights priced at the weekend rate."""
+    return tuple(getattr(settings, 'LISTINGS_WEEKEND_NIGHTS', (4, 5)))
+
+
+def to_cents(amount):
+    return int((Decimal(amount) * 100).to_integral_value(ROUND_HALF_UP))
+
+
+def to_basis(percent):
+    """A percentage in hundredths of a percent."""
+    return int((Decimal(percent) * 100).to_integral_value(ROUND_HALF_UP))
+
+
+def adjust(cents, basis):
+    """Cents adjusted by ``basis`` hundredths of a percent, rounded half up; works on arrays."""
+    return (cents * (10000 + basis) + 5000) // 10000
+
+
+def from_cents(cents):
+    return (Decimal(int(cents)) / 100).quantize(CENT)
+
+
+class PriceCalendar:
+    """
+    Nightly prices of some listings from ``start`` up to (not including) ``end``.
+
+    ``rates`` are the ListingRate rows of the listings, loaded in one query
+    when not given.
+    """
+
+    def __init__(self, listings, start, end, rates=None):
+        listings = list(listings)
+        self.start = start
+        self.nights = max((end - start).days, 0)
+        self.rows = {listing.pk: row for row, listing in enumerate(listings)}
+        if rates is None:
+            rates = ListingRate.objects.filter(listing_id__in=list(self.rows))
+
+        base = np.array([to_cents(listing.price_per_night) for listing in listings], dtype=np.int64)
+        cents = np.repeat(base.reshape(-1, 1), self.nights, axis=1)
+        weekend = np.zeros(len(listings), dtype=np.int64)
+        length_of_stay = [[] for _ in listings]
+
+        for rate in sorted(rates, key=lambda rate: (rate.start_date is None, rate.start_date, rate.pk)):
+            row = self.rows.get(rate.listing_id)
+            if row is None:
+                continue
+            if rate.kind == 'season':
+                first = max((rate.start_date - start).days, 0)
+                last = min((rate.end_date - start).days, self.nights)
+                if first < last:
+                    cents[row, first:last] = to_cents(rate.price_per_night)
+            elif rate.kind == 'weekend':
+                weekend[row] = to_basis(rate.adjustment_percent)
+            elif rate.kind == 'length_of_stay':
+                length_of_stay[row].append((rate.min_nights, to_basis(rate.adjustment_percent)))
+
+        weekdays = (start.weekday() + np.arange(self.nights)) % 7
+        on_weekend = np.isin(weekdays, weekend_nights())
+        cents[:, on_weekend] = adjust(cents[:, on_weekend], weekend.reshape(-1, 1))
+
+        self.cumulative = np.zeros((len(listings), self.nights + 1), dtype=np.int64)
+        np.cumsum(cents, axis=1, out=self.cumulative[:, 1:])
+
+        # Length-of-stay thresholds per row in ascending order, padded with
+        # thresholds no stay reaches
+        width = max((len(rules) for rules in length_of_stay), default=0)
+        self.min_nights = np.full((len(listings), width), np.iinfo(np.int64).max, dtype=np.int64)
+        self.stay_basis = np.zeros((len(listings), width), dtype=np.int64)
+        for row, rules in enumerate(length_of_stay):
+            for column, (min_nights, basis) in enumerate(sorted(rules)):
+                self.min_nights[row, column] = min_nights
+                self.stay_basis[row, column] = basis
+
+    def totals(self, listing_ids, check_ins, check_outs):
+        """Prices in cents (an integer array) of stays given as parallel sequences."""
+        rows = np.array([self.rows[listing_id] for listing_id in listing_ids], dtype=np.int64)
+        starts = np.array([(day - self.start).days for day in check_ins], dtype=np.int64)
+        ends = np.array([(day - self.start).days for day in check_outs], dtype=np.int64)
+        if len(rows) and (starts.min() < 0 or ends.max() > self.nights or (ends < starts).any()):
+            raise ValueError('Stays must fall within the calendar.')
+
+        totals = self.cumulative[rows, ends] - self.cumulative[rows, starts]
+        if self.min_nights.shape[1]:
+            nights = ends - starts
+            reached = (self.min_nights[rows] <= nights.reshape(-1, 1)).sum(axis=1)
+            basis = np.where(
+                reached > 0,
+                self.stay_basis[rows, np.maximum(reached - 1, 0)],
+                0,
+            )
+            totals = adjust(totals, basis)
+        return totals
+
+
+def quote_listings(listings, check_in, check_out, rates=None):
+    """Total price of the same stay at each of the listings, as Decimals."""
+    listings = list(listings)
+    calendar = PriceCalendar(listings, check_in, check_out, rates)
+    totals = calendar.totals(
+        [listing.pk for listing in listings],
+        [check_in] * len(listings),
+        [check_out] * len(listings),
+    )
+    return [from_cents(total) for total in totals]
+
+
+def quote_stays(stays, rates=None):
+    """
+    Total prices of (listing, check_in, check_out) stays, as Decimals.
+
+    One calendar spans every stay, so keep a batch to dates close together.
+    """
+    stays = list(stays)
+    if not stays:
+        return []
+    listings = list({listing.pk: listing for listing, _, _ in stays}.values())
+    start = min(check_in for _, check_in, _ in stays)
+    end = max(check_out for _, _, check_out in stays)
+    calendar = PriceCalendar(listings, start, max(end, start + timedelta(days=1)), rates)
+    totals = calendar.totals(
+        [listing.pk for listing, _, _ in stays],
+        [check_in for _, check_in, _ in stays],
+        [check_out for _, _, check_out in stays],
+    )
+    return [from_cents(total) for total in totals]
+
+
+def quote_stay(listing, check_in, check_out, rates=None):
+    """Total price of one stay."""
+    return quote_listings([listing], check_in, check_out, rates)[0]
+
+
+def set_stay_prices(listings, check_in, check_out):
+    """Quote a stay at each listing of a page as its ``stay_total_price``."""
+    listings = list(listings)
+    for listing, total in zip(listings, quote_listings(listings, check_in, check_out)):
+        listing.stay_total_price = total
+    return listings
@@ -0,0 +1,156 @@
+"""
+EXPLAIN checks for the list queries the API runs.
+
+Every list endpoint pages through a queryset with keyset pagination, so
+each query is ``WHERE <filters> [AND <keyset position>] ORDER BY <ordering>,
+id LIMIT n``. ``access_paths()`` enumerates these queries for every
+``filterset_fields`` x ``ordering_fields`` combination of the viewsets (plus
+the fixed filters of actions such as my_listings), and ``plan_problems()``
+reads the database's plan for full table scans and sorts.
+
+A plan that walks an index in the requested order and checks a filter on
+each row is accepted: with a LIMIT it stops after a page, which is what
+low-cardinality filters such as ``status`` or ``is_available`` rely on.
+"""
+import datetime
+import decimal
+import re
+import uuid
+
+from django.db import connections, transaction
+from django.db.models import ForeignKey
+
+from .eager import eager_load
+from .pagination import KeysetPagination, _page_queryset, get_ordering
+
+# (name, viewset, fields the view always filters on, whether the client's
+# filters and ordering apply)
+SCOPES = [
+    ('listings', 'ListingViewSet', (), True),
+    ('my_listings', 'ListingViewSet', ('owner',), False),
+    ('listing reviews', 'ReviewViewSet', ('listing',), False),
+    ('reviews', 'ReviewViewSet', (), True),
+    ('my_reviews', 'ReviewViewSet', ('reviewer',), False),
+    ('bookings', 'BookingViewSet', ('guest',), True),
+]
+
+
+def _sample_value(field):
+    """A value of the right type for a filter on ``field``."""
+    if isinstance(field, ForeignKey):
+        return _sample_value(field.target_field)
+    if field.choices:
+        return field.choices[0][0]
+    internal_type = field.get_internal_type()
+    if internal_type == 'UUIDField':
+        return uuid.UUID(int=1)
+    if internal_type == 'BooleanField':
+        return True
+    if internal_type == 'DateTimeField':
+        return datetime.datetime(2030, 1, 1, tzinfo=datetime.timezone.utc)
+    if internal_type == 'DateField':
+        return datetime.date(2030, 1, 1)
+    if internal_type == 'DecimalField':
+        return decimal.Decimal('100')
+    if internal_type in ('CharField', 'TextField'):
+        return 'x'
+    return 1
+
+
+def _filter_fields(viewset):
+    filterset_class = getattr(viewset, 'filterset_class', None)
+    if filterset_class is not None:
+        return list(filterset_class._meta.fields)
+    return list(getattr(viewset, 'filterset_fields', []))
+
+
+def _filtered(queryset, names):
+    model = queryset.model
+    return queryset.filter(**{name: _sample_value(model._meta.get_field(name)) for name in names})
+
+
+def access_paths(only=None):
+    """
+    (label, queryset) of the first and a following page of every list query.
+    """
+    from . import views
+
+    page_size = KeysetPagination.page_size
+    for name, viewset_name, scope, client_params in SCOPES:
+        if only and name not in only:
+            continue
+        viewset = getattr(views, viewset_name)
+        base = eager_load(_filtered(viewset.queryset.all(), scope), viewset.serializer_class)
+        filters = [None] + _filter_fields(viewset) if client_params else [None]
+        if client_params:
+            orderings = [
+                prefix + field for field in viewset.ordering_fields for prefix in ('', '-')
+            ]
+        else:
+            orderings = [None]
+
+        for filter_name in filters:
+            queryset = _filtered(base, [filter_name] if filter_name else [])
+            for ordering in orderings:
+                ordered = queryset.order_by(ordering) if ordering else queryset
+                keys = get_ordering(ordered)
+                model = ordered.model
+                position = [
+                    _sample_value(model._meta.pk if key == 'pk' else model._meta.get_field(key))
+                    for key, _ in keys
+                ]
+                label = ' '.join(filter(None, [
+                    name,
+                    f'{filter_name}=?' if filter_name else None,
+                    f'ordering={ordering}' if ordering else None,
+                ]))
+                yield f'{label} (first page)', _page_queryset(ordered, keys, page_size, None, False)
+                yield f'{label} (next page)', _page_queryset(ordered, keys, page_size, position, False)
+
+
+# Plan lines that mean a full scan of a table, or sorting rows, per vendor
+_SQLITE_SCAN = re.compile(r'\bSCAN (\w+)$')
+_SQLITE_SORT = re.compile(r'USE TEMP B-TREE FOR (ORDER BY|RIGHT PART OF ORDER BY)')
+_POSTGRES_SCAN = re.compile(r'Seq Scan on (\w+)')
+_POSTGRES_SORT = re.compile(r'\b(Incremental )?Sort\b(?! Key| Method)')
+_MYSQL_SCAN = re.compile(r'^\S+\s+\S+\s+(\w+)\s+\S+\s+ALL\b', re.MULTILINE)
+_MYSQL_SORT = re.compile(r'Using filesort')
+
+
+def explain(queryset, using='default'):
+    """
+    The database's plan for a queryset.
+
+    On PostgreSQL sequential scans and sorts are disabled while planning, so
+    they only show up when no index can replace them, however small the
+    tables are.
+    """
+    connection = connections[using]
+    if connection.vendor != 'postgresql':
+        return queryset.using(using).explain()
+    with transaction.atomic(using=using):
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+            cursor.execute('SET LOCAL enable_sort = off')
+        return queryset.using(using).explain()
+
+
+def plan_problems(plan, vendor):
+    """Descriptions of the full table scans and sorts in a plan."""
+    if vendor == 'sqlite':
+        scan, sort = _SQLITE_SCAN, _SQLITE_SORT
+    elif vendor == 'postgresql':
+        scan, sort = _POSTGRES_SCAN, _POSTGRES_SORT
+    elif vendor == 'mysql':
+        scan, sort = _MYSQL_SCAN, _MYSQL_SORT
+    else:
+        raise ValueError(f'Cannot read query plans of {vendor}')
+
+    problems = []
+    for line in plan.splitlines():
+        match = scan.search(line.strip())
+        if match:
+            problems.append(f'full scan of {match.group(1)}')
+        if sort.search(line):
+            problems.append('sort')
+    return problems
@@ -0,0 +1,73 @@
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+from django.utils import timezone
+
+from .models import Listing, Review
+
+
+def _rating_field(rating):
+    """Name of the histogram column counting reviews with this rating"""
+    return f'rating_{rating}_count'
+
+
+def apply_rating_delta(listing_id, rating, sign=1):
+    """
+    Add (sign=1) or remove (sign=-1) a single rating from a listing's aggregates.
+
+    Uses F() expressions so concurrent reviews never lose an update. Bumps
+    ``updated_at``, which the listing's ETag and Last-Modified derive from.
+    """
+    Listing.objects.filter(pk=listing_id).update(updated_at=timezone.now(), **{
+        'review_count': F('review_count') + sign,
+        'rating_sum': F('rating_sum') + sign * rating,
+        _rating_field(rating): F(_rating_field(rating)) + sign,
+    })
+
+
+def rebuild_rating_aggregates(listings=None, batch_size=1000):
+    """
+    Recompute the stored rating aggregates from the Review table.
+
+    Returns the number of listings updated.
+    """
+    if listings is None:
+        listings = Listing.objects.all()
+
+    listing_ids = list(listings.values_list('pk', flat=True))
+    updated = 0
+
+    for start in range(0, len(listing_ids), batch_size):
+        batch_ids = listing_ids[start:start + batch_size]
+        totals = {
+            row['listing_id']: row
+            for row in Review.objects.filter(listing_id__in=batch_ids)
+            .order_by()
+            .values('listing_id')
+            .annotate(
+                review_count=Count('pk'),
+                rating_sum=Sum('rating'),
+                **{
+                    _rating_field(star): Count('pk', filter=Q(rating=star))
+                    for star in range(1, 6)
+                }
+            )
+        }
+
+        batch = list(Listing.objects.filter(pk__in=batch_ids).only('pk'))
+        now = timezone.now()
+        for listing in batch:
+            listing.updated_at = now
+            row = totals.get(listing.pk, {})
+            listing.review_count = row.get('review_count', 0)
+            listing.rating_sum = row.get('rating_sum') or 0
+            for star in range(1, 6):
+                setattr(listing, _rating_field(star), row.get(_rating_field(star), 0))
+
+        with transaction.atomic():
+            Listing.objects.bulk_update(
+                batch,
+                ['review_count', 'rating_sum', 'updated_at'] + [_rating_field(star) for star in range(1, 6)],
+            )
+        updated += len(batch)
+
+    return updated
@@ -0,0 +1,121 @@
+"""
+Read replica routing with read-your-writes stickiness.
+
+ReplicaRouter sends every write to the primary (``default``) and reads to
+the primary too, except while a request routed to a replica is being
+served. Three pieces decide that:
+
+* ReplicaRoutingMiddleware (middleware.py) gives each request its routing
+  state, and after a successful write by a signed-in user pins that user
+  to the primary for PIN_SECONDS, so they read back what they wrote while
+  the replicas catch up.
+* ReplicaReadMixin, on the viewsets, moves the reads of a safe request to
+  a replica once the user is authenticated, for the actions in
+  ``replica_actions``, unless the user is pinned.
+* Anything else (Celery tasks, management commands, requests without the
+  middleware) reads from the primary.
+
+Configure with LISTINGS_READ_REPLICAS, e.g. ``{'ALIASES': ['replica'],
+'PIN_SECONDS': 10}``, and add 'listings.replicas.ReplicaRouter' to
+DATABASE_ROUTERS. Pins are kept in the Django cache, which must be shared
+by all web workers for them to hold across processes.
+"""
+import random
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+
+DEFAULTS = {
+    # Database aliases of the read replicas; none means every read goes to the primary
+    'ALIASES': [],
+    # How long a user reads from the primary after writing
+    'PIN_SECONDS': 10,
+}
+
+PIN_KEY = 'listings:replicas:pin:{user}'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+_route = ContextVar('listings_replica_route', default=None)
+
+
+def get_options():
+    return dict(DEFAULTS, **getattr(settings, 'LISTINGS_READ_REPLICAS', {}))
+
+
+class Route:
+    """Where the reads of one request go; ``replica`` None means the primary."""
+
+    def __init__(self):
+        self.replica = None
+
+
+def begin():
+    """Start routing a request, with reads on the primary. Returns a reset token."""
+    return _route.set(Route())
+
+
+def end(token):
+    _route.reset(token)
+
+
+def current_replica():
+    """The replica serving the current request's reads, or None."""
+    route = _route.get()
+    return route.replica if route is not None else None
+
+
+def read_from_replica():
+    """
+    Send the rest of the current request's reads to one of the replicas.
+
+    Does nothing outside a request routed by the middleware or without replicas.
+    """
+    route = _route.get()
+    aliases = get_options()['ALIASES']
+    if route is not None and aliases:
+        route.replica = random.choice(aliases)
+
+
+def read_from_primary():
+    route = _route.get()
+    if route is not None:
+        route.replica = None
+
+
+def pin_to_primary(user):
+    """Make ``user`` read from the primary for PIN_SECONDS."""
+    seconds = get_options()['PIN_SECONDS']
+    if seconds > 0:
+        cache.set(PIN_KEY.format(user=user.pk), True, timeout=seconds)
+
+
+def is_pinned(user):
+    """Whether ``user`` wrote within the last PIN_SECONDS (always False without replicas)."""
+    if not get_options()['ALIASES'] or not user.is_authenticated:
+        return False
+    return bool(cache.get(PIN_KEY.format(user=user.pk)))
+
+
+class ReplicaRouter:
+    """Database router for the primary and its read replicas."""
+
+    def db_for_read(self, model, **hints):
+        return current_replica()
+
+    def db_for_write(self, model, **hints):
+        # Also objects read from a replica are saved to the primary
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        pool = {DEFAULT_DB_ALIAS, *get_options()['ALIASES']}
+        if obj1._state.db in pool and obj2._state.db in pool:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas get their schema from the primary, by replication
+        if db in get_options()['ALIASES']:
+            return False
+        return None
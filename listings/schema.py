@@ -0,0 +1,253 @@
+"""
+The OpenAPI schema, built once and served as a static file.
+
+drf_yasg builds the schema by introspecting every view, serializer and
+``swagger_auto_schema`` override, and importing drf_yasg alone (with the
+pkg_resources it pulls in) costs a cold worker more than the rest of the
+views. The views therefore declare their overrides with the stand-ins
+below, which only record them: ``openapi.Parameter(...)``,
+``openapi.IN_QUERY`` and friends are looked up in drf_yasg when the
+schema is built, and ``swagger_auto_schema`` keeps the overrides of each
+view method. Every schema is built by SchemaGenerator (see
+schema_generator.py), which replays the recorded decorators with drf_yasg
+first, so the overrides never depend on what imported drf_yasg when.
+
+``python manage.py build_openapi_schema`` writes the schema to
+LISTINGS_OPENAPI_SCHEMA_PATH (``openapi.json`` next to this module) as a
+deploy step, and ``--check`` tells whether the file is still current.
+SchemaView serves that file with a strong ETag, read once per process;
+without the file, the schema is generated on the first request instead
+(e.g. in development). SchemaUIView serves Swagger UI or ReDoc on the
+schema built at runtime, importing drf_yasg on its first request.
+"""
+import hashlib
+import os
+import threading
+
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.views import View
+
+DEFAULT_SCHEMA_PATH = os.path.join(os.path.dirname(__file__), 'openapi.json')
+
+_decorated = []
+_applied = False
+_apply_lock = threading.Lock()
+
+
+class Deferred:
+    """A drf_yasg.openapi object to be built with the schema."""
+
+    def __init__(self, name, *args, **kwargs):
+        self.name = name
+        self.args = args
+        self.kwargs = kwargs
+
+    def __repr__(self):
+        return f'openapi.{self.name}(...)'
+
+    def build(self):
+        from drf_yasg import openapi as yasg_openapi
+
+        return getattr(yasg_openapi, self.name)(*resolve(self.args), **resolve(self.kwargs))
+
+
+class DeferredConstant(Deferred):
+    """A drf_yasg.openapi constant, such as IN_QUERY, to be looked up with the schema."""
+
+    def __repr__(self):
+        return f'openapi.{self.name}'
+
+    def build(self):
+        from drf_yasg import openapi as yasg_openapi
+
+        return getattr(yasg_openapi, self.name)
+
+
+def resolve(value):
+    """``value`` with the Deferred objects in it built."""
+    if isinstance(value, Deferred):
+        return value.build()
+    if isinstance(value, dict):
+        return {key: resolve(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return type(value)(resolve(item) for item in value)
+    return value
+
+
+class LazyOpenAPI:
+    """
+    Stand-in for ``drf_yasg.openapi``: constants such as IN_QUERY and
+    classes such as Parameter and Response are deferred.
+    """
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        if name.isupper():
+            return DeferredConstant(name)
+        return lambda *args, **kwargs: Deferred(name, *args, **kwargs)
+
+
+openapi = LazyOpenAPI()
+
+
+class ListResponse:
+    """
+    A response of ``serializer`` rows under ``results``: a page of the
+    view's paginator, or with ``paginated=False`` the results alone, plus
+    the given ``properties`` (openapi.Schema objects) beside them.
+    """
+
+    def __init__(self, serializer, description='', paginated=True, **properties):
+        self.serializer = serializer
+        self.description = description
+        self.paginated = paginated
+        self.properties = properties
+
+
+def swagger_auto_schema(**overrides):
+    """Record drf_yasg ``swagger_auto_schema`` overrides of a view method."""
+    def decorator(view_method):
+        with _apply_lock:
+            _decorated.append((view_method, overrides))
+            if _applied:
+                # A view imported after the others were replayed
+                _apply(view_method, overrides)
+        return view_method
+    return decorator
+
+
+def _apply(view_method, overrides):
+    from drf_yasg.utils import swagger_auto_schema as yasg_swagger_auto_schema
+
+    overrides = resolve(overrides)
+    if any(isinstance(response, ListResponse) for response in overrides.get('responses', {}).values()):
+        from .schema_generator import ListResponseAutoSchema
+
+        overrides.setdefault('auto_schema', ListResponseAutoSchema)
+    yasg_swagger_auto_schema(**overrides)(view_method)
+
+
+def apply_overrides():
+    """Apply the recorded overrides with drf_yasg, once per process."""
+    global _applied
+    # The views must be imported, with their overrides recorded, first
+    from . import views  # noqa: F401
+
+    with _apply_lock:
+        if _applied:
+            return
+        for view_method, overrides in _decorated:
+            _apply(view_method, overrides)
+        _applied = True
+
+
+def schema_info():
+    """The drf_yasg Info of the API, from LISTINGS_OPENAPI_INFO."""
+    from drf_yasg import openapi as yasg_openapi
+
+    info = getattr(settings, 'LISTINGS_OPENAPI_INFO', {})
+    return yasg_openapi.Info(
+        title=info.get('title', 'ALX Travel App API'),
+        default_version=info.get('version', 'v1'),
+        description=info.get('description', 'Travel listings, bookings and reviews'),
+    )
+
+
+def generate_schema():
+    """Generate the schema with drf_yasg and return it encoded as JSON."""
+    from drf_yasg.codecs import OpenAPICodecJson
+
+    from .schema_generator import SchemaGenerator
+
+    generator = SchemaGenerator(schema_info(), url=getattr(settings, 'LISTINGS_OPENAPI_URL', None))
+    return OpenAPICodecJson(validators=[]).encode(generator.get_schema(request=None, public=True))
+
+
+def schema_path():
+    return getattr(settings, 'LISTINGS_OPENAPI_SCHEMA_PATH', DEFAULT_SCHEMA_PATH)
+
+
+def write_schema(path=None):
+    """Build the schema file. Returns its path and size in bytes."""
+    path = path or schema_path()
+    content = generate_schema()
+    with open(path, 'wb') as schema_file:
+        schema_file.write(content)
+    return path, len(content)
+
+
+def schema_is_current(path=None):
+    """Whether the schema file holds the schema the views generate now."""
+    try:
+        with open(path or schema_path(), 'rb') as schema_file:
+            return schema_file.read() == generate_schema()
+    except FileNotFoundError:
+        return False
+
+
+class StaticSchema:
+    """The schema bytes and their ETag, loaded once per process."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._loaded = None
+
+    def get(self):
+        if self._loaded is None:
+            with self._lock:
+                if self._loaded is None:
+                    try:
+                        with open(schema_path(), 'rb') as schema_file:
+                            content = schema_file.read()
+                    except FileNotFoundError:
+                        content = generate_schema()
+                    self._loaded = (content, f'"{hashlib.sha256(content).hexdigest()[:32]}"')
+        return self._loaded
+
+
+static_schema = StaticSchema()
+
+
+class SchemaView(View):
+    """The OpenAPI schema as JSON, answering ``If-None-Match`` with 304."""
+
+    def get(self, request):
+        content, etag = static_schema.get()
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = HttpResponse(content, content_type='application/json')
+        response['ETag'] = etag
+        patch_cache_control(response, public=True, max_age=getattr(settings, 'LISTINGS_OPENAPI_MAX_AGE', 300))
+        return response
+
+
+_ui_views = {}
+
+
+class SchemaUIView(View):
+    """
+    Swagger UI (``renderer='swagger'``) or ReDoc (``renderer='redoc'``) on
+    the schema generated at runtime; drf_yasg is imported on the first
+    request.
+    """
+    renderer = 'swagger'
+
+    def dispatch(self, request, *args, **kwargs):
+        return self.get_ui_view()(request, *args, **kwargs)
+
+    def get_ui_view(self):
+        view = _ui_views.get(self.renderer)
+        if view is None:
+            from drf_yasg.views import get_schema_view
+
+            from .schema_generator import SchemaGenerator
+
+            view = get_schema_view(
+                schema_info(), url=getattr(settings, 'LISTINGS_OPENAPI_URL', None),
+                public=True, generator_class=SchemaGenerator,
+            ).with_ui(self.renderer, cache_timeout=0)
+            _ui_views[self.renderer] = view
+        return view
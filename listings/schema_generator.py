@@ -0,0 +1,43 @@
+"""
+drf_yasg's schema generator with the views' overrides applied.
+
+Imports drf_yasg, so it is only imported when a schema is built (see
+schema.py). Projects serving drf_yasg's own schema views should set
+SWAGGER_SETTINGS['DEFAULT_GENERATOR_CLASS'] to
+'listings.schema_generator.SchemaGenerator'.
+"""
+from drf_yasg import openapi
+from drf_yasg.generators import OpenAPISchemaGenerator
+from drf_yasg.inspectors import SwaggerAutoSchema
+from drf_yasg.utils import force_serializer_instance
+
+from .schema import ListResponse, apply_overrides, resolve
+
+
+class SchemaGenerator(OpenAPISchemaGenerator):
+    """OpenAPISchemaGenerator that replays the recorded ``swagger_auto_schema`` overrides first."""
+
+    def get_schema(self, request=None, public=False):
+        apply_overrides()
+        return super().get_schema(request=request, public=public)
+
+
+class ListResponseAutoSchema(SwaggerAutoSchema):
+    """SwaggerAutoSchema that also describes ListResponse responses."""
+
+    def get_response_schemas(self, response_serializers):
+        lists = {code: response for code, response in response_serializers.items() if isinstance(response, ListResponse)}
+        responses = super().get_response_schemas(
+            {code: response for code, response in response_serializers.items() if code not in lists}
+        )
+        for code, response in lists.items():
+            results = openapi.Schema(
+                type=openapi.TYPE_ARRAY,
+                items=self.serializer_to_schema(force_serializer_instance(response.serializer)),
+            )
+            schema = self.get_paginated_response(results) if response.paginated else None
+            if schema is None:
+                schema = openapi.Schema(type=openapi.TYPE_OBJECT, properties={'results': results}, required=['results'])
+            schema.properties.update(resolve(response.properties))
+            responses[str(code)] = openapi.Response(response.description, schema=schema)
+        return responses
@@ -0,0 +1,162 @@
+import math
+import re
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import (
+    Case, ExpressionWrapper, F, FloatField, OuterRef, Q, Subquery, Sum, Value, When,
+)
+
+from .models import Listing, ListingToken
+
+# How much one occurrence of a token counts, per listing field
+FIELD_WEIGHTS = {
+    'title': 3,
+    'location': 2,
+    'description': 1,
+}
+MAX_TOKEN_LENGTH = 40
+MAX_QUERY_TERMS = 8
+MIN_PREFIX_LENGTH = 2
+DOCUMENT_COUNT_CACHE_KEY = 'listings:search:document-count'
+
+STOP_WORDS = frozenset({
+    'a', 'an', 'and', 'are', 'as', 'at', 'be', 'by', 'for', 'from', 'in',
+    'is', 'it', 'of', 'on', 'or', 'the', 'to', 'with',
+})
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def tokenize(text):
+    """Lower-cased word tokens of a text, without stop words."""
+    return [
+        token[:MAX_TOKEN_LENGTH]
+        for token in _TOKEN_RE.findall((text or '').lower())
+        if len(token) > 1 and token not in STOP_WORDS
+    ]
+
+
+def listing_postings(listing):
+    """Search index rows for one listing."""
+    weights = Counter()
+    for field, field_weight in FIELD_WEIGHTS.items():
+        for token in tokenize(getattr(listing, field)):
+            weights[token] += field_weight
+    return [
+        ListingToken(listing_id=listing.pk, token=token, weight=weight)
+        for token, weight in weights.items()
+    ]
+
+
+def index_listings(listings):
+    """Replace the search index rows of the given listings."""
+    listings = list(listings)
+    with transaction.atomic():
+        ListingToken.objects.filter(listing_id__in=[listing.pk for listing in listings]).delete()
+        ListingToken.objects.bulk_create(
+            [posting for listing in listings for posting in listing_postings(listing)],
+            batch_size=1000,
+        )
+
+
+def rebuild_index(batch_size=500):
+    """
+    Rebuild the whole search index. Returns the number of listings indexed.
+
+    Each batch of listings has its rows replaced in one transaction, so
+    searches keep finding every listing while the index is rebuilt. Rows
+    of deleted listings go with them (the foreign key cascades).
+    """
+    listings = Listing.objects.order_by('pk').only('pk', *FIELD_WEIGHTS)
+    indexed = 0
+    last_pk = None
+
+    while True:
+        batch = listings if last_pk is None else listings.filter(pk__gt=last_pk)
+        batch = list(batch[:batch_size])
+        if not batch:
+            break
+        index_listings(batch)
+        indexed += len(batch)
+        last_pk = batch[-1].pk
+
+    cache.delete(DOCUMENT_COUNT_CACHE_KEY)
+    return indexed
+
+
+def parse_query(query):
+    """
+    Split a search query into (term, is_prefix) pairs.
+
+    The last term is matched as a prefix, for search-as-you-type, unless the
+    query ends with whitespace.
+    """
+    words = _TOKEN_RE.findall(query.lower())
+    prefix = None
+    if words and not query[-1:].isspace() and len(words[-1]) >= MIN_PREFIX_LENGTH:
+        # Kept even if it is a stop word: "be" may be the start of "beach"
+        prefix = words.pop()[:MAX_TOKEN_LENGTH]
+
+    terms = [(term, False) for term in tokenize(' '.join(words))]
+    if prefix:
+        terms.append((prefix, True))
+    return terms[-MAX_QUERY_TERMS:]
+
+
+def _document_count():
+    timeout = getattr(settings, 'LISTINGS_SEARCH_DOCUMENT_COUNT_TTL', 600)
+    return cache.get_or_set(DOCUMENT_COUNT_CACHE_KEY, Listing.objects.count, timeout)
+
+
+def search(queryset, query):
+    """
+    Restrict a listing queryset to listings matching every term of a query,
+    annotated with a ``search_rank`` relevance score (higher is better).
+
+    Postings are looked up through the (token, listing) index. The score sums
+    each term's stored weight multiplied by its inverse document frequency.
+    """
+    terms = parse_query(query)
+    if not terms:
+        return queryset
+
+    term_filters = [
+        Q(token__startswith=term) if is_prefix else Q(token=term)
+        for term, is_prefix in terms
+    ]
+    any_term = Q()
+    for term_filter in term_filters:
+        any_term |= term_filter
+
+    document_frequencies = ListingToken.objects.filter(any_term).aggregate(**{
+        f'df_{index}': Sum(Case(When(term_filter, then=1), default=0))
+        for index, term_filter in enumerate(term_filters)
+    })
+    document_count = _document_count()
+    idf = [
+        math.log(1 + (document_count + 1) / ((document_frequencies[f'df_{index}'] or 0) + 0.5))
+        for index in range(len(term_filters))
+    ]
+
+    hits = ListingToken.objects.filter(any_term).values('listing_id').annotate(**{
+        f'hit_{index}': Sum(Case(When(term_filter, then=F('weight')), default=0))
+        for index, term_filter in enumerate(term_filters)
+    })
+    for index in range(len(term_filters)):
+        hits = hits.filter(**{f'hit_{index}__gt': 0})
+
+    rank = sum(
+        F(f'hit_{index}') * Value(weight, output_field=FloatField())
+        for index, weight in enumerate(idf)
+    )
+    hits = hits.annotate(rank=ExpressionWrapper(rank, output_field=FloatField()))
+
+    return queryset.filter(pk__in=hits.values('listing_id')).annotate(
+        search_rank=Subquery(
+            hits.filter(listing_id=OuterRef('pk')).values('rank')[:1],
+            output_field=FloatField(),
+        )
+    )
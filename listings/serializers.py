@@ -1,5 +1,13 @@
+import uuid
+from datetime import timedelta
+
 from rest_framework import serializers
+from django.conf import settings
+from django.utils import timezone
 from django.contrib.auth.models import User
+from .availability import is_available
+from .instrumentation import TimedListSerializer, TimedSerializerMixin
+from .sparse import SparseFieldsSerializerMixin
 from .models import Listing, Review, Booking
 
 
@@ -13,21 +21,34 @@ class UserSerializer(serializers.ModelSerializer):
         read_only_fields = ['id']
 
 
-class ListingSerializer(serializers.ModelSerializer):
+class ListingSerializer(SparseFieldsSerializerMixin, TimedSerializerMixin, serializers.ModelSerializer):
     """
     Serializer for Listing model
     """
     owner = UserSerializer(read_only=True)
     average_rating = serializers.ReadOnlyField()
+    rating_histogram = serializers.ReadOnlyField()
+    # Only on list pages filtered by check_in and check_out (see pricing.py)
+    stay_total_price = serializers.DecimalField(max_digits=12, decimal_places=2, read_only=True)
+    sparse_columns = {
+        'average_rating': ['review_count', 'rating_sum'],
+        'rating_histogram': [f'rating_{star}_count' for star in range(1, 6)],
+        'stay_total_price': ['price_per_night'],
+    }
     
     class Meta:
         model = Listing
+        list_serializer_class = TimedListSerializer
         fields = [
             'id', 'title', 'description', 'listing_type', 'price_per_night',
             'location', 'latitude', 'longitude', 'amenities', 'max_guests',
-            'is_available', 'owner', 'average_rating', 'created_at', 'updated_at'
+            'is_available', 'owner', 'average_rating', 'review_count',
+            'rating_histogram', 'stay_total_price', 'created_at', 'updated_at'
+        ]
+        read_only_fields = [
+            'id', 'owner', 'average_rating', 'review_count', 'rating_histogram',
+            'stay_total_price', 'created_at', 'updated_at'
         ]
-        read_only_fields = ['id', 'owner', 'average_rating', 'created_at', 'updated_at']
     
     def validate_price_per_night(self, value):
         """Validate that price per night is positive"""
@@ -42,7 +63,7 @@ class ListingSerializer(serializers.ModelSerializer):
         return value
 
 
-class ReviewSerializer(serializers.ModelSerializer):
+class ReviewSerializer(SparseFieldsSerializerMixin, TimedSerializerMixin, serializers.ModelSerializer):
     """
     Serializer for Review model
     """
@@ -51,6 +72,7 @@ class ReviewSerializer(serializers.ModelSerializer):
     
     class Meta:
         model = Review
+        list_serializer_class = TimedListSerializer
         fields = [
             'id', 'listing', 'listing_title', 'reviewer', 'rating',
             'comment', 'created_at', 'updated_at'
@@ -85,23 +107,26 @@ class ReviewSerializer(serializers.ModelSerializer):
         return data
 
 
-class BookingSerializer(serializers.ModelSerializer):
+class BookingSerializer(SparseFieldsSerializerMixin, TimedSerializerMixin, serializers.ModelSerializer):
     """
     Serializer for Booking model
     """
     guest = UserSerializer(read_only=True)
     listing_title = serializers.CharField(source='listing.title', read_only=True)
     duration_days = serializers.ReadOnlyField()
+    sparse_columns = {'duration_days': ['check_in', 'check_out']}
     
     class Meta:
         model = Booking
+        list_serializer_class = TimedListSerializer
         fields = [
             'id', 'listing', 'listing_title', 'guest', 'check_in', 'check_out',
             'guests_count', 'total_price', 'status', 'duration_days',
             'created_at', 'updated_at'
         ]
+        # total_price is quoted from the listing's rates when the stay is saved (see pricing.py)
         read_only_fields = [
-            'id', 'guest', 'listing_title', 'duration_days', 
+            'id', 'guest', 'listing_title', 'total_price', 'duration_days', 
             'created_at', 'updated_at'
         ]
     
@@ -131,6 +156,13 @@ class BookingSerializer(serializers.ModelSerializer):
                 "This listing is currently not available for booking."
             )
         
+        # Validate no other pending or confirmed booking overlaps the stay
+        exclude_booking = self.instance.pk if self.instance else None
+        if listing and not is_available(listing.pk, check_in, check_out, exclude_booking):
+            raise serializers.ValidationError(
+                "This listing is already booked for some of the selected dates."
+            )
+        
         return data
     
     def validate_guests_count(self, value):
@@ -138,9 +170,85 @@ class BookingSerializer(serializers.ModelSerializer):
         if value <= 0:
             raise serializers.ValidationError("Number of guests must be greater than 0.")
         return value
+
+
+class StayQuoteSerializer(serializers.Serializer):
+    """
+    Query of the batch stay quote: the stay and up to
+    LISTINGS_QUOTE_MAX_LISTINGS comma separated listing ids
+    """
+    check_in = serializers.DateField()
+    check_out = serializers.DateField()
+    ids = serializers.CharField()
     
-    def validate_total_price(self, value):
-        """Validate that total price is positive"""
+    def validate_ids(self, value):
+        """Parse the listing ids"""
+        ids = [part.strip() for part in value.split(',') if part.strip()]
+        limit = getattr(settings, 'LISTINGS_QUOTE_MAX_LISTINGS', 500)
+        if len(ids) > limit:
+            raise serializers.ValidationError(f"At most {limit} listings can be quoted at once.")
+        try:
+            return [uuid.UUID(listing_id) for listing_id in ids]
+        except ValueError:
+            raise serializers.ValidationError("Expected comma separated listing ids.")
+    
+    def validate(self, data):
+        """Validate check-out is after check-in, within a year"""
+        nights = (data['check_out'] - data['check_in']).days
+        if nights <= 0:
+            raise serializers.ValidationError(
+                "Check-out date must be after check-in date."
+            )
+        if nights > 365:
+            raise serializers.ValidationError("Stays are quoted for at most 365 nights.")
+        return data
+
+
+class HostAnalyticsSerializer(serializers.Serializer):
+    """
+    Query of the host analytics: the period to group days by, the date
+    range (the last 30 days by default) and optionally one listing
+    """
+    period = serializers.ChoiceField(choices=['day', 'week', 'month'], default='day')
+    start = serializers.DateField(required=False)
+    end = serializers.DateField(required=False)
+    listing = serializers.UUIDField(required=False)
+    
+    def validate(self, data):
+        """Fill in the default range and validate it is in order and not too long"""
+        end = data.get('end') or timezone.localdate()
+        start = data.get('start') or end - timedelta(days=29)
+        if end < start:
+            raise serializers.ValidationError("End date must not be before start date.")
+        limit = getattr(settings, 'LISTINGS_ANALYTICS_MAX_DAYS', 731)
+        if (end - start).days >= limit:
+            raise serializers.ValidationError(f"Analytics cover at most {limit} days at once.")
+        return dict(data, start=start, end=end)
+
+
+class BookingImportSerializer(serializers.Serializer):
+    """
+    Serializer for one row of a bulk booking import
+    
+    The listing is referenced by id only; bulk.py resolves the listings of
+    a whole batch with one query and applies the checks that need them.
+    """
+    listing = serializers.UUIDField()
+    check_in = serializers.DateField()
+    check_out = serializers.DateField()
+    guests_count = serializers.IntegerField(default=1)
+    status = serializers.ChoiceField(choices=Booking.STATUS_CHOICES, default='pending')
+    
+    def validate_guests_count(self, value):
+        """Validate that guests count is positive"""
         if value <= 0:
-            raise serializers.ValidationError("Total price must be greater than 0.")
+            raise serializers.ValidationError("Number of guests must be greater than 0.")
         return value
+    
+    def validate(self, data):
+        """Validate check-out is after check-in"""
+        if data['check_out'] <= data['check_in']:
+            raise serializers.ValidationError(
+                "Check-out date must be after check-in date."
+            )
+        return data
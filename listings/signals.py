@@ -1,36 +1,293 @@
-from django.db.models.signals import post_save, pre_save
+from types import SimpleNamespace
+
+from django.db.models.signals import post_delete, post_save, pre_save
 from django.dispatch import receiver
 from django.contrib.auth.models import User
-from .models import Booking, Listing
-from decimal import Decimal
+from .models import Booking, Listing, ListingRate, Review
+from .analytics import BOOKING_FIELDS, apply_stats_deltas, booking_deltas, booking_state
+from .archive import is_archiving
+from .availability import occupancy_key, sync_booked_nights
+from .cache import AVAILABILITY_TAG, LIST_TAG, invalidate_on_commit, listing_tag
+from .facets import apply_facet_deltas, facet_deltas, facet_values, index_amenities, listing_amenities
+from .geo import encode_geohash
+from .instrumentation import timed_receiver
+from .outbox import enqueue_booking_events
+from .pricing import quote_stay
+from .ratings import apply_rating_delta
+from .search import index_listings
+from .similar import forget_listing, save_vector
+from django.utils import timezone
+
+
+@receiver(pre_save, sender=Booking)
+@timed_receiver
+def remember_previous_booking(sender, instance, **kwargs):
+    """
+    Remember the stored state of a booking that is being updated
+    so its booked nights and daily stats can be adjusted after saving
+    """
+    instance._previous_booking = None
+    if not instance._state.adding:
+        instance._previous_booking = (
+            Booking.objects.filter(pk=instance.pk)
+            .values(*BOOKING_FIELDS)
+            .first()
+        )
 
 
 @receiver(pre_save, sender=Booking)
+@timed_receiver
 def calculate_total_price(sender, instance, **kwargs):
     """
-    Calculate total price for a booking before saving
+    Price a new booking, or one whose stay changed, from its listing's rates
     """
+    previous = getattr(instance, '_previous_booking', None)
+    stay = (instance.listing_id, instance.check_in, instance.check_out)
+    if previous and (previous['listing_id'], previous['check_in'], previous['check_out']) == stay:
+        return
     if instance.listing and instance.check_in and instance.check_out:
-        duration = (instance.check_out - instance.check_in).days
-        if duration > 0:
-            instance.total_price = instance.listing.price_per_night * Decimal(duration)
+        if (instance.check_out - instance.check_in).days > 0:
+            instance.total_price = quote_stay(instance.listing, instance.check_in, instance.check_out)
+
+
+@receiver(post_save, sender=Booking)
+@timed_receiver
+def update_booked_nights(sender, instance, created, **kwargs):
+    """
+    Hold the nights of pending and confirmed bookings, release the others
+    """
+    previous = getattr(instance, '_previous_booking', None)
+    previous_key = None
+    if previous:
+        previous_key = occupancy_key(
+            previous['listing_id'], previous['check_in'], previous['check_out'], previous['status']
+        )
+    sync_booked_nights(instance, previous_key)
+
+
+@receiver(post_save, sender=Booking)
+@timed_receiver
+def update_daily_stats(sender, instance, **kwargs):
+    """
+    Move the booking's share of the host analytics from its previous state
+    to the new one, e.g. when it is confirmed or cancelled
+    """
+    previous = getattr(instance, '_previous_booking', None)
+    apply_stats_deltas(booking_deltas(previous, booking_state(instance)))
+
+
+@receiver(post_delete, sender=Booking)
+@timed_receiver
+def remove_from_daily_stats(sender, instance, **kwargs):
+    """
+    Take a deleted booking out of the host analytics, unless it was archived
+    """
+    if is_archiving():
+        return
+    apply_stats_deltas(booking_deltas(booking_state(instance), None))
 
 
 @receiver(post_save, sender=Booking)
+@timed_receiver
 def send_booking_notification(sender, instance, created, **kwargs):
     """
-    Send notification when a booking is created or updated
-    This is where you would integrate with email service, SMS, etc.
+    Queue a notification when a booking is created or updated
+    
+    The outbox row commits with the booking; a Celery task sends queued
+    notifications in batches off the request path (see outbox.py).
     """
-    if created:
-        # Here you would typically send email/SMS notifications
-        # For now, we'll just print to console
-        print(f"New booking created: {instance.id} for {instance.listing.title}")
+    enqueue_booking_events([instance], 'created' if created else 'updated')
+
+
+@receiver(pre_save, sender=Listing)
+@timed_receiver
+def set_geohash(sender, instance, **kwargs):
+    """
+    Keep the geohash used by location searches in step with the coordinates
+    """
+    if instance.latitude is not None and instance.longitude is not None:
+        instance.geohash = encode_geohash(instance.latitude, instance.longitude)
     else:
-        print(f"Booking updated: {instance.id} - Status: {instance.status}")
+        instance.geohash = ''
+
+
+@receiver(post_save, sender=Listing)
+@timed_receiver
+def update_search_index(sender, instance, **kwargs):
+    """
+    Re-index the listing's title, location and description for search
+    """
+    index_listings([instance])
+
+
+@receiver(post_save, sender=Listing)
+@timed_receiver
+def update_feature_vector(sender, instance, **kwargs):
+    """
+    Re-encode the listing for the similar listings search
+    """
+    save_vector(instance)
+
+
+@receiver(post_delete, sender=Listing)
+@timed_receiver
+def remove_feature_vector(sender, instance, **kwargs):
+    """
+    Leave the deleted listing out of the similar listings search
+    """
+    forget_listing(instance.pk)
+
+
+@receiver(pre_save, sender=Listing)
+@timed_receiver
+def remember_previous_facets(sender, instance, update_fields=None, **kwargs):
+    """
+    Remember the stored facet values of a listing that is being updated
+    so the amenity index and facet counts can be adjusted after saving
+    
+    Listings loaded with their facet columns carry them (see
+    Listing.from_db), so only other instances are read back, and saves
+    of other columns only are skipped.
+    """
+    instance._previous_facets = set()
+    if instance._state.adding:
+        return
+    if update_fields is not None and not set(update_fields) & set(Listing.FACET_FIELDS):
+        instance._previous_facets = None
+        return
+    stored = getattr(instance, '_stored_facets', None)
+    if stored is not None:
+        instance._previous_facets = facet_values(SimpleNamespace(**stored))
+        return
+    previous = (
+        Listing.objects.filter(pk=instance.pk)
+        .only(*Listing.FACET_FIELDS)
+        .first()
+    )
+    if previous is not None:
+        instance._previous_facets = facet_values(previous)
+
+
+@receiver(post_save, sender=Listing)
+@timed_receiver
+def update_facets(sender, instance, created, **kwargs):
+    """
+    Re-index the listing's amenities and adjust the facet counts
+    """
+    previous = getattr(instance, '_previous_facets', set())
+    if previous is None:
+        return
+    instance._stored_facets = instance.facet_columns()
+    current = facet_values(instance)
+    if previous == current:
+        return
+    previous_amenities = {value for facet, value in previous if facet == 'amenities'}
+    if created or previous_amenities != set(listing_amenities(instance)):
+        index_amenities([instance])
+    apply_facet_deltas(facet_deltas(previous, current))
+
+
+@receiver(post_delete, sender=Listing)
+@timed_receiver
+def remove_from_facets(sender, instance, **kwargs):
+    """
+    Keep the facet counts current when a listing is deleted
+    """
+    apply_facet_deltas(facet_deltas(facet_values(instance), set()))
+
+
+@receiver(pre_save, sender=Review)
+@timed_receiver
+def remember_previous_rating(sender, instance, **kwargs):
+    """
+    Remember the stored listing and rating of a review that is being updated
+    so the listing aggregates can be adjusted after saving
+    """
+    instance._previous_rating = None
+    if not instance._state.adding:
+        instance._previous_rating = (
+            Review.objects.filter(pk=instance.pk)
+            .values_list('listing_id', 'rating')
+            .first()
+        )
+
+
+@receiver(post_save, sender=Review)
+@timed_receiver
+def update_rating_aggregates(sender, instance, created, **kwargs):
+    """
+    Keep the listing rating aggregates current when a review is saved
+    """
+    previous = getattr(instance, '_previous_rating', None)
+    current = (instance.listing_id, instance.rating)
+    
+    if previous == current:
+        return
+    if previous:
+        apply_rating_delta(previous[0], previous[1], sign=-1)
+    apply_rating_delta(instance.listing_id, instance.rating)
+
+
+@receiver(post_delete, sender=Review)
+@timed_receiver
+def remove_rating_from_aggregates(sender, instance, **kwargs):
+    """
+    Keep the listing rating aggregates current when a review is deleted
+    """
+    apply_rating_delta(instance.listing_id, instance.rating, sign=-1)
+
+
+@receiver(post_save, sender=Listing)
+@receiver(post_delete, sender=Listing)
+@timed_receiver
+def invalidate_listing_cache(sender, instance, **kwargs):
+    """
+    Drop cached list pages and the listing's own cached responses
+    """
+    invalidate_on_commit(LIST_TAG, listing_tag(instance.pk))
+
+
+@receiver(post_save, sender=ListingRate)
+@receiver(post_delete, sender=ListingRate)
+@timed_receiver
+def touch_rated_listing(sender, instance, **kwargs):
+    """
+    Rates change the listing's stay prices; bump its ``updated_at`` (which
+    its ETag derives from) and drop its cached responses
+    """
+    Listing.objects.filter(pk=instance.listing_id).update(updated_at=timezone.now())
+    invalidate_on_commit(LIST_TAG, listing_tag(instance.listing_id))
+
+
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+@timed_receiver
+def invalidate_review_cache(sender, instance, **kwargs):
+    """
+    Reviews change the listing's rating aggregates and its reviews page
+    """
+    tags = {LIST_TAG, listing_tag(instance.listing_id)}
+    previous = getattr(instance, '_previous_rating', None)
+    if previous:
+        tags.add(listing_tag(previous[0]))
+    invalidate_on_commit(*tags)
+
+
+@receiver(post_save, sender=Booking)
+@receiver(post_delete, sender=Booking)
+@timed_receiver
+def invalidate_booking_cache(sender, instance, **kwargs):
+    """
+    Bookings change which listings the availability filters return;
+    archived bookings held no nights
+    """
+    if is_archiving():
+        return
+    invalidate_on_commit(AVAILABILITY_TAG)
 
 
 @receiver(post_save, sender=User)
+@timed_receiver
 def create_user_profile(sender, instance, created, **kwargs):
     """
     Create user profile or perform other actions when a user is created
@@ -0,0 +1,333 @@
+"""
+Similar listings from precomputed feature vectors.
+
+Each listing is encoded as a vector of its listing type, nightly price,
+capacity, location, rating and amenities, weighted by FEATURE_WEIGHTS, and
+listings are similar when their vectors are close. Vectors are stored in
+ListingVector rows, written by the listing signals whenever a listing is
+saved.
+
+Searching every vector per request is out of the question, so the search
+runs on an inverted file (IVF) index: k-means groups the vectors around
+LISTS centroids (the square root of the number of listings by default),
+and a query only compares itself with the listings of its PROBES nearest
+groups. The index is built offline by the rebuild_similar_listings task,
+which first re-encodes every listing (rating aggregates change without a
+listing save), and is saved to INDEX_PATH, which web workers load and
+reload when it changes. Vectors written since the build started are
+compared directly and take the place of their indexed copies, so new and
+edited listings are found straight away; at most FRESH_LIMIT of them, the
+latest, are read per query. Deleted listings are marked in the cache by the
+listing signals and skipped until the next build drops them.
+
+Configure with LISTINGS_SIMILAR. Workers on other hosts than the Celery
+worker need INDEX_PATH on shared storage.
+"""
+import math
+import os
+import tempfile
+import threading
+import zlib
+from datetime import datetime, timezone as dt_timezone
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from .facets import listing_amenities
+from .models import Listing, ListingVector
+
+DEFAULTS = {
+    'INDEX_PATH': os.path.join(tempfile.gettempdir(), 'listings-similar-index.npz'),
+    # Number of k-means groups; None means the square root of the number of listings
+    'LISTS': None,
+    # Groups searched per query; more is slower and finds more of the true neighbours
+    'PROBES': 8,
+    'FRESH_LIMIT': 2000,
+    'TRAIN_SIZE': 50000,
+    # Candidates searched per listing asked for, as some are filtered out
+    'OVERFETCH': 4,
+    # How long deleted listings are remembered; longer than between two builds
+    'DELETED_TIMEOUT': 2 * 24 * 3600,
+}
+DELETED_CACHE_KEY = 'listings:similar:deleted:{}'
+
+# How much each feature counts towards the distance between two listings
+FEATURE_WEIGHTS = {
+    'listing_type': 1.0,
+    # Per doubling of the price or the capacity
+    'price': 1.0,
+    'guests': 0.5,
+    # Per radian on the unit sphere, about 0.03 per 10 km
+    'location': 20.0,
+    'rating': 1.0,
+    'reviews': 0.5,
+    'amenities': 1.0,
+}
+AMENITY_BUCKETS = 32
+LISTING_TYPES = [value for value, _ in Listing.LISTING_TYPES]
+DIMENSIONS = len(LISTING_TYPES) + 2 + 3 + 2 + AMENITY_BUCKETS
+VECTOR_FIELDS = (
+    'pk', 'listing_type', 'price_per_night', 'max_guests', 'latitude', 'longitude',
+    'review_count', 'rating_sum', 'amenities',
+)
+
+
+def get_options():
+    return dict(DEFAULTS, **getattr(settings, 'LISTINGS_SIMILAR', {}))
+
+
+def encode_listing(listing):
+    """The feature vector of a listing, as float32."""
+    weights = FEATURE_WEIGHTS
+    vector = np.zeros(DIMENSIONS, dtype=np.float32)
+    if listing.listing_type in LISTING_TYPES:
+        vector[LISTING_TYPES.index(listing.listing_type)] = weights['listing_type']
+    offset = len(LISTING_TYPES)
+    vector[offset] = weights['price'] * math.log2(max(float(listing.price_per_night), 1.0))
+    vector[offset + 1] = weights['guests'] * math.log2(max(listing.max_guests, 1))
+    if listing.latitude is not None and listing.longitude is not None:
+        lat, lng = math.radians(float(listing.latitude)), math.radians(float(listing.longitude))
+        vector[offset + 2:offset + 5] = weights['location'] * np.array(
+            [math.cos(lat) * math.cos(lng), math.cos(lat) * math.sin(lng), math.sin(lat)]
+        )
+    if listing.review_count:
+        vector[offset + 5] = weights['rating'] * listing.rating_sum / listing.review_count / 5
+        vector[offset + 6] = weights['reviews'] * math.log1p(listing.review_count) / math.log1p(1000)
+
+    # Amenities hashed into a fixed number of buckets, with unit length
+    amenities = listing_amenities(listing)
+    if amenities:
+        start = offset + 7
+        for amenity in amenities:
+            vector[start + zlib.crc32(amenity.encode()) % AMENITY_BUCKETS] += 1
+        buckets = vector[start:]
+        buckets *= weights['amenities'] / np.linalg.norm(buckets)
+    return vector
+
+
+def save_vectors(listings, at=None):
+    """Store the feature vectors of the given listings, as written at ``at`` (now)."""
+    at = at or timezone.now()
+    ListingVector.objects.bulk_create(
+        [ListingVector(listing_id=listing.pk, vector=encode_listing(listing).tobytes(), updated_at=at)
+         for listing in listings],
+        update_conflicts=True,
+        unique_fields=['listing'],
+        update_fields=['vector', 'updated_at'],
+        batch_size=1000,
+    )
+
+
+def save_vector(listing):
+    """Store the feature vector of one listing; an update, inserting only the first time."""
+    updated = ListingVector.objects.filter(listing_id=listing.pk).update(
+        vector=encode_listing(listing).tobytes(), updated_at=timezone.now(),
+    )
+    if not updated:
+        save_vectors([listing])
+
+
+def forget_listing(listing_pk):
+    """Leave a deleted listing out of the results until the index is rebuilt without it."""
+    cache.set(DELETED_CACHE_KEY.format(listing_pk), True, get_options()['DELETED_TIMEOUT'])
+
+
+def decode_vector(value):
+    return np.frombuffer(bytes(value), dtype=np.float32)
+
+
+def _nearest(vectors, centroids, batch_size=10000):
+    """Index of the nearest centroid of each vector."""
+    squared = (centroids ** 2).sum(axis=1)
+    nearest = np.empty(len(vectors), dtype=np.int64)
+    for start in range(0, len(vectors), batch_size):
+        batch = vectors[start:start + batch_size]
+        # |v - c|^2 without the |v|^2 term, which is the same for every centroid
+        nearest[start:start + batch_size] = (squared - 2 * batch @ centroids.T).argmin(axis=1)
+    return nearest
+
+
+class SimilarityIndex:
+    """
+    IVF index over listing vectors: k-means centroids, and the listings
+    nearest each centroid stored together in ``members``.
+    """
+
+    def __init__(self, ids, vectors, centroids, offsets, members, built_at):
+        self.ids = ids
+        self.vectors = vectors
+        self.centroids = centroids
+        self.offsets = offsets
+        self.members = members
+        self.built_at = built_at
+
+    @classmethod
+    def build(cls, ids, vectors, built_at, lists=None, train_size=50000, iterations=10, seed=0):
+        """Cluster vectors (one row per id) with ``iterations`` rounds of k-means."""
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(-1, DIMENSIONS)
+        count = len(vectors)
+        lists = max(1, min(lists or int(math.sqrt(count)), count))
+        rng = np.random.default_rng(seed)
+        train = vectors if count <= train_size else vectors[rng.choice(count, train_size, replace=False)]
+
+        if count:
+            centroids = train[rng.choice(len(train), min(lists, len(train)), replace=False)].copy()
+            for _ in range(iterations):
+                assigned = _nearest(train, centroids)
+                sums = np.zeros_like(centroids)
+                np.add.at(sums, assigned, train)
+                sizes = np.bincount(assigned, minlength=len(centroids))
+                filled = sizes > 0
+                centroids[filled] = sums[filled] / sizes[filled].reshape(-1, 1)
+            assigned = _nearest(vectors, centroids)
+        else:
+            centroids = np.zeros((0, DIMENSIONS), dtype=np.float32)
+            assigned = np.zeros(0, dtype=np.int64)
+
+        members = np.argsort(assigned, kind='stable')
+        offsets = np.searchsorted(assigned[members], np.arange(len(centroids) + 1))
+        return cls(np.asarray(ids, dtype='U36'), vectors, centroids, offsets, members, built_at)
+
+    def save(self, path):
+        """Write the index to ``path``, replacing it in one step."""
+        directory = os.path.dirname(os.path.abspath(path))
+        handle, temporary = tempfile.mkstemp(dir=directory, suffix='.npz')
+        with os.fdopen(handle, 'wb') as output:
+            np.savez(
+                output, ids=self.ids, vectors=self.vectors, centroids=self.centroids,
+                offsets=self.offsets, members=self.members, built_at=np.float64(self.built_at.timestamp()),
+            )
+        os.replace(temporary, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            built_at = datetime.fromtimestamp(float(data['built_at']), tz=dt_timezone.utc)
+            return cls(data['ids'], data['vectors'], data['centroids'], data['offsets'], data['members'], built_at)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def search(self, vector, count, probes):
+        """(ids, squared distances) of up to ``count`` indexed listings nearest a vector, nearest first."""
+        if not len(self.ids):
+            return self.ids, np.zeros(0, dtype=np.float32)
+        probes = min(probes, len(self.centroids))
+        distances = ((self.centroids - vector) ** 2).sum(axis=1)
+        groups = np.argpartition(distances, probes - 1)[:probes]
+        candidates = np.concatenate([self.members[self.offsets[group]:self.offsets[group + 1]] for group in groups])
+        return self._top(candidates, vector, count)
+
+    def exact_search(self, vector, count):
+        """The same as search(), comparing with every indexed listing."""
+        return self._top(np.arange(len(self.ids)), vector, count)
+
+    def _top(self, candidates, vector, count):
+        distances = ((self.vectors[candidates] - vector) ** 2).sum(axis=1)
+        if len(candidates) > count:
+            top = np.argpartition(distances, count - 1)[:count]
+            candidates, distances = candidates[top], distances[top]
+        order = np.argsort(distances, kind='stable')
+        return self.ids[candidates[order]], distances[order]
+
+
+_loaded = {'path': None, 'mtime': None, 'index': None}
+_load_lock = threading.Lock()
+
+
+def get_index():
+    """The saved index, reloaded when its file changes; None before the first build."""
+    path = get_options()['INDEX_PATH']
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return None
+    with _load_lock:
+        if _loaded['path'] != path or _loaded['mtime'] != mtime:
+            _loaded.update(path=path, mtime=mtime, index=SimilarityIndex.load(path))
+        return _loaded['index']
+
+
+def rebuild_index(batch_size=2000):
+    """
+    Re-encode every listing and build and save the index.
+
+    Returns the number of listings indexed.
+    """
+    options = get_options()
+    started = timezone.now()
+    listings = Listing.objects.order_by('pk').only(*VECTOR_FIELDS)
+    ids, vectors = [], []
+    last_pk = None
+
+    while True:
+        batch = listings if last_pk is None else listings.filter(pk__gt=last_pk)
+        batch = list(batch[:batch_size])
+        if not batch:
+            break
+        # Written as of the start, so vectors saved by the signals meanwhile
+        # still count as newer than the index
+        save_vectors(batch, at=started)
+        ids.extend(str(listing.pk) for listing in batch)
+        vectors.extend(encode_listing(listing) for listing in batch)
+        last_pk = batch[-1].pk
+
+    index = SimilarityIndex.build(
+        ids, np.array(vectors, dtype=np.float32), started,
+        lists=options['LISTS'], train_size=options['TRAIN_SIZE'],
+    )
+    index.save(options['INDEX_PATH'])
+    return len(index)
+
+
+def similar_listing_ids(listing, count):
+    """
+    Ids of the ``count`` listings most similar to a listing, nearest first.
+
+    Reads the vectors written since the index was built with one query;
+    without an index, the FRESH_LIMIT most recently written.
+    """
+    options = get_options()
+    vector = encode_listing(listing)
+    index = get_index()
+    wanted = count + 1
+    distances = {}
+    if index is not None:
+        ids, found = index.search(vector, wanted, options['PROBES'])
+        distances = dict(zip(ids.tolist(), found.tolist()))
+        keys = {DELETED_CACHE_KEY.format(listing_id): listing_id for listing_id in distances}
+        for key in cache.get_many(list(keys)):
+            del distances[keys[key]]
+
+    fresh = ListingVector.objects.order_by('-updated_at')
+    if index is not None:
+        fresh = fresh.filter(updated_at__gt=index.built_at)
+    fresh = list(fresh.values_list('listing_id', 'vector')[:options['FRESH_LIMIT']])
+    if fresh:
+        matrix = np.stack([decode_vector(value) for _, value in fresh])
+        for (listing_id, _), distance in zip(fresh, ((matrix - vector) ** 2).sum(axis=1).tolist()):
+            distances[str(listing_id)] = distance
+
+    distances.pop(str(listing.pk), None)
+    return sorted(distances, key=distances.get)[:count]
+
+
+def similar_listings(listing, count, queryset):
+    """
+    The ``count`` listings of a queryset most similar to a listing, nearest first.
+
+    Searches OVERFETCH times as many candidates as asked for, since the
+    queryset filters some out (e.g. unavailable listings), and searches
+    again for more while too few are left and more may be found.
+    """
+    overfetch = max(get_options()['OVERFETCH'], 2)
+    wanted = count * overfetch
+    while True:
+        ids = similar_listing_ids(listing, wanted)
+        found = {str(candidate.pk): candidate for candidate in queryset.filter(pk__in=ids)}
+        listings = [found[listing_id] for listing_id in ids if listing_id in found]
+        if len(listings) >= count or len(ids) < wanted:
+            return listings[:count]
+        wanted *= overfetch
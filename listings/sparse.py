@@ -0,0 +1,169 @@
+"""
+Sparse fieldsets: ``?fields=id,title,price_per_night`` returns only those
+fields and ``?expand=owner`` renders a related object in full instead of
+by id.
+
+Without ``fields`` responses are unchanged. With it, nested relations that
+are requested but not expanded are rendered as their primary key, and the
+queryset loads only the columns the requested fields read.
+"""
+from functools import lru_cache
+
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework import serializers
+
+from .pagination import get_ordering
+
+FIELDS_PARAM = 'fields'
+EXPAND_PARAM = 'expand'
+SAFE_METHODS = ('GET', 'HEAD')
+
+
+def _names(value):
+    if value is None or not value.strip():
+        return None
+    return tuple(dict.fromkeys(name.strip() for name in value.split(',') if name.strip()))
+
+
+def requested_fields(request):
+    """
+    (fields, expand) asked for by a read request: a tuple of field names or
+    None for all fields, and a tuple of relations to expand.
+    """
+    if request is None or request.method not in SAFE_METHODS:
+        return None, ()
+    params = getattr(request, 'query_params', request.GET)
+    return _names(params.get(FIELDS_PARAM)), _names(params.get(EXPAND_PARAM)) or ()
+
+
+class SparseFieldsSerializerMixin:
+    """
+    Serializer accepting ``fields`` and ``expand`` arguments.
+
+    ``fields`` limits the serializer to those fields; nested serializers
+    among them are replaced by primary key fields unless named in ``expand``.
+    Unknown names raise a ValidationError.
+    """
+
+    # Model columns read by fields that are not model fields (e.g. properties)
+    sparse_columns = {}
+
+    def __init__(self, *args, fields=None, expand=(), **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields is None and not expand:
+            return
+
+        expandable = {
+            name for name, field in self.fields.items()
+            if isinstance(field, serializers.BaseSerializer)
+        }
+        unknown = set(expand) - expandable
+        if unknown:
+            raise serializers.ValidationError({
+                EXPAND_PARAM: [f"Cannot expand: {', '.join(sorted(unknown))}."]
+            })
+        if fields is None:
+            return
+
+        unknown = set(fields) - set(self.fields)
+        if unknown:
+            raise serializers.ValidationError({
+                FIELDS_PARAM: [f"Unknown fields: {', '.join(sorted(unknown))}."]
+            })
+        for name in list(self.fields):
+            if name not in fields:
+                self.fields.pop(name)
+        for name in expandable & set(fields) - set(expand):
+            source = self.fields[name].source
+            self.fields[name] = serializers.PrimaryKeyRelatedField(
+                read_only=True, **({} if source == name else {'source': source})
+            )
+
+
+def _concrete_field(model, name):
+    try:
+        field = model._meta.get_field(name)
+    except FieldDoesNotExist:
+        return None
+    if not getattr(field, 'concrete', False) or field.many_to_many:
+        return None
+    return field
+
+
+def _nested_columns(serializer, model, path):
+    columns = []
+    for field in serializer.fields.values():
+        if isinstance(field, serializers.BaseSerializer) or _concrete_field(model, field.source) is None:
+            # Anything but plain columns: load the related object in full
+            return [path]
+        columns.append(f'{path}__{field.source}')
+    return columns
+
+
+@lru_cache(maxsize=256)
+def sparse_plan(serializer_class, fields, expand):
+    """
+    The select_related paths and only() columns needed to serialize ``fields``.
+
+    Returns None when some field reads something that cannot be mapped to
+    columns, in which case every column should be loaded.
+    """
+    serializer = serializer_class(fields=fields, expand=expand)
+    model = serializer_class.Meta.model
+    select, columns = set(), {model._meta.pk.name}
+
+    for name, field in serializer.fields.items():
+        if name in serializer.sparse_columns:
+            columns.update(serializer.sparse_columns[name])
+            continue
+        if field.source == '*':
+            return None
+
+        attrs = field.source.split('.')
+        current, path = model, []
+        for attr in attrs[:-1]:
+            relation = _concrete_field(current, attr)
+            if relation is None or not relation.is_relation:
+                return None
+            path.append(attr)
+            current = relation.related_model
+        target = _concrete_field(current, attrs[-1])
+        if target is None:
+            return None
+
+        if isinstance(field, serializers.BaseSerializer):
+            # An expanded relation is joined, loading the columns its serializer reads
+            path.append(attrs[-1])
+            select.add('__'.join(path))
+            columns.update(_nested_columns(field, target.related_model, '__'.join(path)))
+            continue
+        if path:
+            select.add('__'.join(path))
+        columns.add('__'.join(attrs))
+
+    return sorted(select), sorted(columns)
+
+
+def apply_sparse_fields(queryset, serializer_class, fields, expand):
+    """
+    Restrict a queryset to the columns the requested fields need.
+
+    The columns of the queryset's ordering are kept too, so keyset
+    pagination can read the position of the last row.
+    """
+    if fields is None:
+        return queryset
+    plan = sparse_plan(serializer_class, fields, expand)
+    if plan is None:
+        return queryset
+
+    select, columns = plan
+    columns = set(columns)
+    for name, _ in get_ordering(queryset):
+        if name != 'pk' and name not in queryset.query.annotations:
+            columns.add(name)
+
+    queryset = queryset.select_related(None)
+    if select:
+        queryset = queryset.select_related(*select)
+    return queryset.only(*sorted(columns))
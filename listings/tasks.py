@@ -0,0 +1,79 @@
+from celery import shared_task
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+from . import archive, lifecycle, outbox, similar
+
+# The project's Celery app is loaded on first use, not at startup; load it
+# before this module's tasks can be sent so they go through its broker
+CELERY_APP = getattr(settings, 'LISTINGS_CELERY_APP', 'alx_travel_app.celery_app')
+if CELERY_APP:
+    import_string(CELERY_APP)
+
+
+@shared_task(bind=True, max_retries=None)
+def drain_notification_outbox(self, batch_size=None):
+    """
+    Send pending booking notifications in coalesced batches.
+
+    A failed batch is rescheduled in the outbox with exponential backoff and
+    the task retries itself after the same delay.
+    """
+    try:
+        processed, sent, has_more = outbox.drain(batch_size=batch_size)
+    except Exception as exc:
+        raise self.retry(exc=exc, countdown=outbox.retry_delay(self.request.retries + 1))
+    if has_more:
+        drain_notification_outbox.apply_async(kwargs={'batch_size': batch_size})
+    return {'processed': processed, 'sent': sent}
+
+
+@shared_task
+def purge_notification_outbox():
+    """Delete notification outbox entries sent longer ago than the retention period."""
+    return {'deleted': outbox.purge_sent()}
+
+
+@shared_task
+def complete_past_bookings(chunk_size=None):
+    """
+    Complete confirmed bookings whose stay is over, in chunks.
+
+    Queues another run when the chunk limit was reached.
+    """
+    result = lifecycle.complete_past_bookings(chunk_size=chunk_size)
+    if result['has_more']:
+        complete_past_bookings.apply_async(kwargs={'chunk_size': chunk_size})
+    return result
+
+
+@shared_task
+def expire_stale_pending_bookings(chunk_size=None):
+    """
+    Cancel pending bookings that were never confirmed, in chunks.
+
+    Queues another run when the chunk limit was reached.
+    """
+    result = lifecycle.expire_stale_pending(chunk_size=chunk_size)
+    if result['has_more']:
+        expire_stale_pending_bookings.apply_async(kwargs={'chunk_size': chunk_size})
+    return result
+
+
+@shared_task
+def archive_old_bookings(chunk_size=None):
+    """
+    Move completed and cancelled bookings past the cutoff to the archive, in chunks.
+
+    Queues another run when the chunk limit was reached.
+    """
+    result = archive.archive_bookings(chunk_size=chunk_size)
+    if result['has_more']:
+        archive_old_bookings.apply_async(kwargs={'chunk_size': chunk_size})
+    return result
+
+
+@shared_task
+def rebuild_similar_listings(batch_size=2000):
+    """Re-encode every listing and rebuild the similar listings index."""
+    return {'indexed': similar.rebuild_index(batch_size=batch_size)}
@@ -0,0 +1,56 @@
+"""
+Settings for the listings test suite, on SQLite.
+
+Run with ``DJANGO_SETTINGS_MODULE=listings.tests.settings python -m django
+test listings.tests``.
+"""
+SECRET_KEY = 'listings-tests'
+DEBUG = False
+ALLOWED_HOSTS = ['*']
+INSTALLED_APPS = [
+    'django.contrib.auth',
+    'django.contrib.contenttypes',
+    'django.contrib.sessions',
+    'django.contrib.admin',
+    'django.contrib.messages',
+    'rest_framework',
+    'django_filters',
+    'listings',
+]
+MIDDLEWARE = [
+    'listings.middleware.RequestMetricsMiddleware',
+    'django.contrib.sessions.middleware.SessionMiddleware',
+    'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'django.contrib.messages.middleware.MessageMiddleware',
+    'listings.middleware.ReplicaRoutingMiddleware',
+]
+TEMPLATES = [{
+    'BACKEND': 'django.template.backends.django.DjangoTemplates',
+    'APP_DIRS': True,
+    'OPTIONS': {'context_processors': [
+        'django.contrib.auth.context_processors.auth',
+        'django.contrib.messages.context_processors.messages',
+        'django.template.context_processors.request',
+    ]},
+}]
+# The replica reads the primary's test database; ReplicaRouterTests turn it on
+DATABASES = {
+    'default': {'ENGINE': 'django.db.backends.sqlite3', 'NAME': ':memory:'},
+    'replica': {'ENGINE': 'django.db.backends.sqlite3', 'NAME': ':memory:', 'TEST': {'MIRROR': 'default'}},
+}
+DATABASE_ROUTERS = ['listings.replicas.ReplicaRouter']
+ROOT_URLCONF = 'listings.tests.urls'
+STATIC_URL = '/static/'
+USE_TZ = True
+DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+REST_FRAMEWORK = {
+    'DEFAULT_AUTHENTICATION_CLASSES': ['rest_framework.authentication.SessionAuthentication'],
+}
+
+# Tasks run in process, through the app's own Celery app
+LISTINGS_CELERY_APP = 'listings.celery.app'
+CELERY_TASK_ALWAYS_EAGER = True
+CELERY_BROKER_URL = 'memory://'
+
+# Count the queries of rendering responses, not of serving cached copies
+LISTINGS_RESPONSE_CACHE = {'ENABLED': False}
@@ -0,0 +1,47 @@
+"""
+Bookings saved in the admin hold their nights like those made through the API.
+"""
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.urls import reverse
+
+from listings.models import BookedNight, Booking, Listing
+
+
+class BookingAdminTests(TestCase):
+
+    def setUp(self):
+        admin_user = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        self.guest = User.objects.create(username='guest')
+        self.listing = Listing.objects.create(
+            title='Sunny flat', description='Near the old town', location='Lisbon',
+            price_per_night=Decimal('80.00'), max_guests=4, owner=admin_user,
+        )
+        self.day = date.today() + timedelta(days=30)
+        Booking.objects.create(
+            listing=self.listing, guest=self.guest, check_in=self.day, check_out=self.day + timedelta(days=3),
+            total_price=Decimal('240.00'), status='confirmed',
+        )
+        self.client.force_login(admin_user)
+
+    def add(self, first, last, status='pending'):
+        return self.client.post(reverse('admin:listings_booking_add'), {
+            'listing': self.listing.pk, 'guest': self.guest.pk, 'status': status,
+            'check_in': self.day + timedelta(days=first), 'check_out': self.day + timedelta(days=last),
+            'guests_count': 2, 'total_price': '160.00',
+        })
+
+    def test_overlapping_stays_are_form_errors(self):
+        response = self.add(2, 4)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'This listing is already booked for some of the selected dates.')
+        self.assertEqual(Booking.objects.count(), 1)
+
+    def test_free_stays_and_inactive_bookings_are_saved(self):
+        self.assertEqual(self.add(3, 5).status_code, 302)
+        self.assertEqual(self.add(1, 2, status='cancelled').status_code, 302)
+        self.assertEqual(Booking.objects.count(), 3)
+        self.assertEqual(BookedNight.objects.count(), 5)
@@ -0,0 +1,69 @@
+"""
+Archival moves old completed and cancelled bookings out of Booking without
+changing the host analytics (see archive.py).
+"""
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from listings.analytics import rebuild_stats
+from listings.archive import archive_bookings
+from listings.models import ArchivedBooking, BookedNight, Booking, Listing, ListingDailyStats
+
+
+@override_settings(BOOKING_ARCHIVE_AFTER_DAYS=365)
+class ArchiveTests(TestCase):
+
+    def setUp(self):
+        host = User.objects.create(username='host')
+        self.guest = User.objects.create(username='guest')
+        self.listing = Listing.objects.create(
+            title='Sunny flat', description='Near the old town', location='Lisbon',
+            price_per_night=Decimal('80.00'), max_guests=4, owner=host,
+        )
+        self.today = timezone.localdate()
+
+    def book(self, days_ago, status):
+        """A two-night stay that checked out ``days_ago`` days ago, moved through confirmed to ``status``."""
+        check_out = self.today - timedelta(days=days_ago)
+        with self.captureOnCommitCallbacks(execute=True):
+            booking = Booking.objects.create(
+                listing=self.listing, guest=self.guest, check_in=check_out - timedelta(days=2),
+                check_out=check_out, total_price=Decimal('160.00'), status='confirmed',
+            )
+            if status != 'confirmed':
+                booking.status = status
+                booking.save()
+        return booking
+
+    def stats(self):
+        return sorted(ListingDailyStats.objects.values_list(
+            'listing_id', 'date', 'booked_nights', 'revenue', 'bookings', 'cancellations',
+        ))
+
+    def test_old_bookings_move_and_stats_stay(self):
+        completed = self.book(500, 'completed')
+        cancelled = self.book(400, 'cancelled')
+        recent = self.book(100, 'completed')
+        unfinished = self.book(600, 'confirmed')
+        stats = self.stats()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            result = archive_bookings(today=self.today, chunk_size=1)
+
+        self.assertEqual(result['rows'], 2)
+        self.assertEqual(
+            set(ArchivedBooking.objects.values_list('pk', 'status', 'check_out')),
+            {(completed.pk, 'completed', completed.check_out), (cancelled.pk, 'cancelled', cancelled.check_out)},
+        )
+        self.assertEqual(set(Booking.objects.values_list('pk', flat=True)), {recent.pk, unfinished.pk})
+        self.assertFalse(BookedNight.objects.filter(booking_id__in=[completed.pk, cancelled.pk]).exists())
+        self.assertEqual(BookedNight.objects.filter(booking=unfinished).count(), 2)
+        self.assertEqual(self.stats(), stats)
+
+        # Archived bookings still count when the stats are rebuilt
+        rebuild_stats()
+        self.assertEqual(self.stats(), stats)
@@ -0,0 +1,85 @@
+"""
+The booked-night index: active bookings hold their nights, and no two
+bookings of a listing hold the same night (see availability.py).
+"""
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.urls import reverse
+from rest_framework.test import APITestCase
+
+from listings.availability import BookingConflict, reserve
+from listings.models import BookedNight, Booking, Listing
+
+
+class BookedNightTests(APITestCase):
+
+    def setUp(self):
+        host = User.objects.create(username='host')
+        self.guest = User.objects.create(username='guest')
+        self.listing = Listing.objects.create(
+            title='Sunny flat', description='Near the old town', location='Lisbon',
+            price_per_night=Decimal('80.00'), max_guests=4, owner=host,
+        )
+        self.day = date.today() + timedelta(days=30)
+        self.client.force_authenticate(self.guest)
+
+    def stay(self, first, last):
+        """Check-in and check-out ``first`` and ``last`` days after self.day."""
+        return {'check_in': str(self.day + timedelta(days=first)), 'check_out': str(self.day + timedelta(days=last))}
+
+    def book(self, first, last):
+        return self.client.post(reverse('booking-list'), {
+            'listing': str(self.listing.pk), 'guests_count': 2, **self.stay(first, last),
+        }, format='json')
+
+    def update(self, booking_id, first, last, **changes):
+        return self.client.patch(reverse('booking-detail', args=[booking_id]), {
+            'listing': str(self.listing.pk), 'guests_count': 2, **self.stay(first, last), **changes,
+        }, format='json')
+
+    def held_nights(self, booking_id):
+        return sorted(
+            (night - self.day).days
+            for night in BookedNight.objects.filter(booking_id=booking_id).values_list('night', flat=True)
+        )
+
+    def test_overlapping_bookings_are_rejected(self):
+        first = self.book(0, 3)
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual(self.held_nights(first.data['id']), [0, 1, 2])
+
+        self.assertEqual(self.book(2, 5).status_code, 400)
+        self.assertEqual(self.book(-2, 1).status_code, 400)
+        # Checking in on the day the other stay checks out is fine
+        self.assertEqual(self.book(3, 5).status_code, 201)
+        self.assertEqual(Booking.objects.count(), 2)
+
+        with self.assertRaises(BookingConflict):
+            reserve(self.listing.pk, self.day + timedelta(days=1), self.day + timedelta(days=2), lambda: None)
+
+    def test_changed_dates_are_checked_and_move_the_nights(self):
+        booking = self.book(0, 3).data['id']
+        other = self.book(5, 7).data['id']
+
+        self.assertEqual(self.update(booking, 4, 6).status_code, 400)
+        self.assertEqual(self.held_nights(booking), [0, 1, 2])
+
+        self.assertEqual(self.update(booking, 1, 5).status_code, 200)
+        self.assertEqual(self.held_nights(booking), [1, 2, 3, 4])
+        self.assertEqual(self.held_nights(other), [5, 6])
+        self.assertEqual(self.book(0, 1).status_code, 201)
+
+    def test_cancelling_frees_the_nights(self):
+        booking = self.book(0, 3).data['id']
+        response = self.client.post(reverse('booking-cancel', args=[booking]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.held_nights(booking), [])
+
+        replacement = self.book(0, 3)
+        self.assertEqual(replacement.status_code, 201)
+        # The cancelled booking cannot take its nights back
+        self.assertEqual(self.update(booking, 0, 3, status='pending').status_code, 400)
+        self.assertEqual(self.held_nights(booking), [])
+        self.assertEqual(self.held_nights(replacement.data['id']), [0, 1, 2])
@@ -0,0 +1,108 @@
+"""
+Cached listing responses are invalidated by the writes they depend on,
+and users pinned to the primary bypass them (see cache.py).
+"""
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.test import TransactionTestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient, APITestCase
+
+from listings.cache import get_response_cache
+from listings.models import Booking, Listing, Review
+from listings.replicas import pin_to_primary
+
+
+@override_settings(LISTINGS_RESPONSE_CACHE={'ENABLED': True})
+class ResponseCacheTests(APITestCase):
+
+    def setUp(self):
+        get_response_cache().backend.clear()
+        self.host = User.objects.create(username='host')
+        self.guest = User.objects.create(username='guest')
+        self.listing = Listing.objects.create(
+            title='Sunny flat', description='Near the old town', location='Lisbon',
+            price_per_night=Decimal('80.00'), max_guests=4, owner=self.host,
+        )
+
+    def get(self, url, expected_cache):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-Cache'], expected_cache)
+        return response.data
+
+    def write(self, change):
+        """Run ``change()`` and the invalidations it queues on commit."""
+        with self.captureOnCommitCallbacks(execute=True):
+            change()
+
+    def test_listing_writes_invalidate_list_and_detail(self):
+        detail = reverse('listing-detail', args=[self.listing.pk])
+        list_url = reverse('listing-list')
+        for url in (detail, list_url):
+            self.get(url, 'MISS')
+            self.get(url, 'HIT')
+
+        self.listing.title = 'Sunnier flat'
+        self.write(self.listing.save)
+
+        self.assertEqual(self.get(detail, 'MISS')['title'], 'Sunnier flat')
+        self.assertEqual(self.get(list_url, 'MISS')['results'][0]['title'], 'Sunnier flat')
+
+    def test_review_writes_invalidate_the_listing(self):
+        reviews = reverse('listing-reviews', args=[self.listing.pk])
+        self.assertEqual(self.get(reviews, 'MISS')['review_count'], 0)
+        self.get(reviews, 'HIT')
+
+        self.write(lambda: Review.objects.create(listing=self.listing, reviewer=self.guest, rating=4, comment='Lovely'))
+
+        data = self.get(reviews, 'MISS')
+        self.assertEqual((data['review_count'], len(data['results'])), (1, 1))
+
+    def test_booking_writes_invalidate_stay_filtered_pages_only(self):
+        check_in = date.today() + timedelta(days=30)
+        check_out = check_in + timedelta(days=3)
+        available = f"{reverse('listing-list')}?check_in={check_in}&check_out={check_out}"
+        list_url = reverse('listing-list')
+        self.assertEqual(len(self.get(available, 'MISS')['results']), 1)
+        self.get(list_url, 'MISS')
+
+        self.write(lambda: Booking.objects.create(
+            listing=self.listing, guest=self.guest, check_in=check_in, check_out=check_out,
+            total_price=Decimal('240.00'), status='confirmed',
+        ))
+
+        self.assertEqual(self.get(available, 'MISS')['results'], [])
+        self.get(list_url, 'HIT')
+
+
+
+@override_settings(LISTINGS_RESPONSE_CACHE={'ENABLED': True}, LISTINGS_READ_REPLICAS={'ALIASES': ['replica']})
+class PinnedUserCacheTests(TransactionTestCase):
+    # Anonymous requests validate on the replica, which only sees committed rows
+    databases = {'default', 'replica'}
+
+    def test_pinned_users_bypass_the_cache(self):
+        get_response_cache().backend.clear()
+        host = User.objects.create(username='host')
+        listing = Listing.objects.create(
+            title='Sunny flat', description='Near the old town', location='Lisbon',
+            price_per_night=Decimal('80.00'), max_guests=4, owner=host,
+        )
+        detail = reverse('listing-detail', args=[listing.pk])
+        client = APIClient()
+        self.assertEqual(client.get(detail)['X-Cache'], 'MISS')
+        # A change the signals do not see, so the cached copy stays
+        Listing.objects.filter(pk=listing.pk).update(title='Sunnier flat')
+
+        pin_to_primary(host)
+        client.force_authenticate(host)
+        response = client.get(detail)
+        self.assertEqual((response['X-Cache'], response.data['title']), ('MISS', 'Sunnier flat'))
+
+        # The pinned user's copy was not stored for others
+        client.force_authenticate(None)
+        response = client.get(detail)
+        self.assertEqual((response['X-Cache'], response.data['title']), ('HIT', 'Sunny flat'))
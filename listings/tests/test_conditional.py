@@ -0,0 +1,79 @@
+"""
+Conditional GET: unchanged responses come back as 304, changed ones in
+full with new validators (see conditional.py).
+"""
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+from listings.models import Booking, Listing, Review
+
+
+class ConditionalGetTests(APITestCase):
+
+    def setUp(self):
+        self.host = User.objects.create(username='host')
+        self.guest = User.objects.create(username='guest')
+        self.listing = Listing.objects.create(
+            title='Sunny flat', description='Near the old town', location='Lisbon',
+            price_per_night=Decimal('80.00'), max_guests=4, owner=self.host,
+        )
+
+    def assertRevalidates(self, url, change):
+        """``url`` answers its own ETag with 304 until ``change()``, then with 200."""
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+
+        unchanged = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(unchanged.status_code, 304)
+        self.assertEqual(unchanged.content, b'')
+
+        change()
+        changed = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotEqual(changed['ETag'], etag)
+
+    def save_listing(self):
+        self.listing.title = 'Sunnier flat'
+        self.listing.save()
+
+    def test_listing_list(self):
+        self.assertRevalidates(reverse('listing-list'), self.save_listing)
+
+    def test_listing_detail(self):
+        self.assertRevalidates(reverse('listing-detail', args=[self.listing.pk]), self.save_listing)
+
+    def test_listing_detail_if_modified_since(self):
+        url = reverse('listing-detail', args=[self.listing.pk])
+        last_modified = self.client.get(url)['Last-Modified']
+        self.assertEqual(self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified).status_code, 304)
+
+        # A save a minute later, as Last-Modified counts whole seconds
+        Listing.objects.filter(pk=self.listing.pk).update(updated_at=timezone.now() + timedelta(minutes=1))
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['Last-Modified'], last_modified)
+
+    def test_listing_reviews(self):
+        self.assertRevalidates(
+            reverse('listing-reviews', args=[self.listing.pk]),
+            lambda: Review.objects.create(listing=self.listing, reviewer=self.guest, rating=5, comment='Lovely'),
+        )
+
+    def test_booking_list(self):
+        check_in = date.today() + timedelta(days=10)
+        booking = Booking.objects.create(
+            listing=self.listing, guest=self.guest, check_in=check_in, check_out=check_in + timedelta(days=2),
+            total_price=Decimal('160.00'),
+        )
+
+        def confirm():
+            booking.status = 'confirmed'
+            booking.save()
+        self.client.force_authenticate(self.guest)
+        self.assertRevalidates(reverse('booking-list'), confirm)
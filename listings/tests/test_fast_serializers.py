@@ -0,0 +1,55 @@
+"""
+Compiled serializers give what DRF gives when a field's source cannot be
+read: optional fields are left out or defaulted, required ones raise.
+"""
+from types import SimpleNamespace
+
+from django.core.exceptions import ObjectDoesNotExist
+from django.test import SimpleTestCase
+from rest_framework import serializers
+
+from listings.fast_serializers import compile_serializer, serialize_rows
+
+
+class Host(SimpleNamespace):
+
+    @property
+    def profile(self):
+        raise ObjectDoesNotExist('no profile')
+
+
+class RoomSerializer(serializers.Serializer):
+    title = serializers.CharField()
+    rating = serializers.IntegerField(read_only=True)
+    badge = serializers.CharField(default='new')
+    note = serializers.CharField(allow_null=True)
+    bio = serializers.CharField(source='host.profile.bio')
+
+
+class StrictRoomSerializer(serializers.Serializer):
+    title = serializers.CharField()
+
+
+class CompiledSerializerTests(SimpleTestCase):
+
+    def both(self, serializer_class, room):
+        """The compiled and the DRF representation of one object."""
+        compiled = serialize_rows(compile_serializer(serializer_class), [room])[0]
+        return compiled, dict(serializer_class(room).data)
+
+    def test_missing_optional_attributes_match_drf(self):
+        room = SimpleNamespace(title='Sunny flat', host=Host())
+        compiled, expected = self.both(RoomSerializer, room)
+        self.assertEqual(compiled, expected)
+        self.assertEqual(compiled, {'title': 'Sunny flat', 'badge': 'new', 'note': None, 'bio': None})
+
+    def test_present_attributes_are_read(self):
+        room = SimpleNamespace(title='Sunny flat', rating=4, badge='top', note='Quiet', host=Host())
+        compiled, expected = self.both(RoomSerializer, room)
+        self.assertEqual(compiled, expected)
+        self.assertEqual(compiled['rating'], 4)
+
+    def test_missing_required_attribute_raises(self):
+        serialize = compile_serializer(StrictRoomSerializer)
+        with self.assertRaisesMessage(AttributeError, 'field `title` on serializer `StrictRoomSerializer`'):
+            serialize_rows(serialize, [SimpleNamespace()])
@@ -0,0 +1,104 @@
+"""
+The lifecycle jobs move bookings with one UPDATE per chunk, so they keep
+booked nights, daily stats, the outbox and cached pages in sync themselves.
+"""
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from listings.analytics import rebuild_stats
+from listings.cache import AVAILABILITY_TAG, get_response_cache
+from listings.lifecycle import complete_past_bookings, expire_stale_pending
+from listings.models import BookedNight, Booking, Listing, ListingDailyStats
+
+
+@override_settings(LISTINGS_RESPONSE_CACHE={'ENABLED': True}, BOOKING_PENDING_TTL_HOURS=24)
+class LifecycleJobTests(TestCase):
+
+    def setUp(self):
+        get_response_cache().backend.clear()
+        host = User.objects.create(username='host')
+        self.guest = User.objects.create(username='guest')
+        self.listing = Listing.objects.create(
+            title='Sunny flat', description='Near the old town', location='Lisbon',
+            price_per_night=Decimal('80.00'), max_guests=4, owner=host,
+        )
+        self.today = timezone.localdate()
+        sender = mock.patch('listings.outbox.send_booking_notifications')
+        self.send = sender.start()
+        self.addCleanup(sender.stop)
+
+    def book(self, check_in, nights, status, total_price):
+        with self.captureOnCommitCallbacks(execute=True):
+            booking = Booking.objects.create(
+                listing=self.listing, guest=self.guest, check_in=check_in,
+                check_out=check_in + timedelta(days=nights), total_price=total_price,
+            )
+            if status != 'pending':
+                booking.status = status
+                booking.save()
+        return booking
+
+    def stats(self):
+        """The stored daily stats, comparable with what rebuild_stats() writes."""
+        return sorted(ListingDailyStats.objects.values_list(
+            'listing_id', 'date', 'booked_nights', 'revenue', 'bookings', 'cancellations',
+        ))
+
+    def run_job(self, job, **kwargs):
+        """Run a job, its outbox drain and cache invalidation; returns the messages sent."""
+        self.send.reset_mock()
+        version = get_response_cache().backend.get_versions([AVAILABILITY_TAG])[0]
+        with self.captureOnCommitCallbacks(execute=True):
+            result = job(**kwargs)
+        self.assertEqual(get_response_cache().backend.get_versions([AVAILABILITY_TAG]), [version + 1])
+        return result, [message for call in self.send.call_args_list for message in call.args[0]]
+
+    def assert_stats_match_rebuild(self):
+        stats = self.stats()
+        rebuild_stats()
+        self.assertEqual(stats, self.stats())
+
+    def test_past_stays_are_completed(self):
+        past = self.book(self.today - timedelta(days=3), 3, 'confirmed', Decimal('250.00'))
+        upcoming = self.book(self.today + timedelta(days=5), 2, 'confirmed', Decimal('160.00'))
+        self.assertEqual(BookedNight.objects.filter(booking=past).count(), 3)
+
+        result, messages = self.run_job(complete_past_bookings, today=self.today)
+
+        self.assertEqual(result['rows'], 1)
+        past.refresh_from_db()
+        upcoming.refresh_from_db()
+        self.assertEqual((past.status, upcoming.status), ('completed', 'confirmed'))
+        self.assertFalse(BookedNight.objects.filter(booking=past).exists())
+        self.assertEqual(BookedNight.objects.filter(booking=upcoming).count(), 2)
+        self.assertEqual(
+            [(message['booking_id'], message['event'], message['status']) for message in messages],
+            [(past.pk, 'updated', 'completed')],
+        )
+        self.assert_stats_match_rebuild()
+
+    def test_stale_pending_bookings_are_cancelled(self):
+        now = timezone.now()
+        stale = self.book(self.today + timedelta(days=10), 2, 'pending', Decimal('160.00'))
+        Booking.objects.filter(pk=stale.pk).update(created_at=now - timedelta(hours=25))
+        started = self.book(self.today - timedelta(days=1), 3, 'pending', Decimal('240.00'))
+        fresh = self.book(self.today + timedelta(days=20), 2, 'pending', Decimal('160.00'))
+
+        result, messages = self.run_job(expire_stale_pending, now=now)
+
+        self.assertEqual(result['rows'], 2)
+        statuses = dict(Booking.objects.values_list('pk', 'status'))
+        self.assertEqual(statuses, {stale.pk: 'cancelled', started.pk: 'cancelled', fresh.pk: 'pending'})
+        self.assertEqual(set(BookedNight.objects.values_list('booking_id', flat=True)), {fresh.pk})
+        self.assertEqual(
+            sorted((message['booking_id'], message['event'], message['status']) for message in messages),
+            sorted([(stale.pk, 'updated', 'cancelled'), (started.pk, 'updated', 'cancelled')]),
+        )
+        self.assert_stats_match_rebuild()
+        cancellations = ListingDailyStats.objects.filter(cancellations__gt=0)
+        self.assertEqual(sorted(cancellations.values_list('date', flat=True)), sorted([stale.check_in, started.check_in]))
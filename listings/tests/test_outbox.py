@@ -0,0 +1,95 @@
+"""
+The notification outbox, drained in process with CELERY_TASK_ALWAYS_EAGER:
+coalescing, claiming and sending, retry backoff and purging.
+"""
+from datetime import date, timedelta
+from decimal import Decimal
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from listings import outbox
+from listings.models import Booking, Listing, NotificationOutbox
+
+
+@override_settings(OUTBOX_RETRY_BACKOFF=30, OUTBOX_RETRY_BACKOFF_MAX=3600)
+class OutboxTests(TestCase):
+
+    def setUp(self):
+        host = User.objects.create(username='host')
+        self.guest = User.objects.create(username='guest')
+        self.listing = Listing.objects.create(
+            title='Sunny flat', description='Near the old town', location='Lisbon',
+            price_per_night=Decimal('80.00'), max_guests=4, owner=host,
+        )
+        self.check_in = date.today() + timedelta(days=10)
+        sender = mock.patch('listings.outbox.send_booking_notifications')
+        self.send = sender.start()
+        self.addCleanup(sender.stop)
+
+    def book(self):
+        """Create a booking and confirm it in one transaction, draining on commit."""
+        with self.captureOnCommitCallbacks(execute=True):
+            booking = Booking.objects.create(
+                listing=self.listing, guest=self.guest, check_in=self.check_in,
+                check_out=self.check_in + timedelta(days=2), total_price=Decimal('160.00'),
+            )
+            booking.status = 'confirmed'
+            booking.save()
+        self.check_in = booking.check_out
+        return booking
+
+    def test_changes_of_a_booking_are_sent_as_one_message(self):
+        booking = self.book()
+
+        self.send.assert_called_once()
+        [message] = self.send.call_args.args[0]
+        self.assertEqual(message['booking_id'], booking.pk)
+        self.assertEqual((message['event'], message['status']), ('created', 'confirmed'))
+        self.assertEqual(message['listing_title'], 'Sunny flat')
+        self.assertFalse(NotificationOutbox.objects.filter(sent_at__isnull=True).exists())
+
+    def test_failed_batches_are_retried_with_backoff(self):
+        self.send.side_effect = RuntimeError('provider down')
+        before = timezone.now()
+        self.book()
+
+        entries = list(NotificationOutbox.objects.all())
+        self.assertEqual(len(entries), 2)
+        for entry in entries:
+            self.assertIsNone(entry.sent_at)
+            self.assertEqual(entry.attempts, 1)
+            self.assertIn('provider down', entry.last_error)
+            self.assertGreaterEqual(entry.available_at, before + timedelta(seconds=30))
+        self.assertEqual([outbox.retry_delay(attempts) for attempts in (1, 2, 3, 20)], [30, 60, 120, 3600])
+
+        # Not due again before the backoff has passed
+        self.assertEqual(outbox.claim_batch(10), [])
+
+        self.send.side_effect = None
+        NotificationOutbox.objects.update(available_at=timezone.now())
+        self.assertEqual(outbox.drain(), (2, 1, False))
+        self.assertFalse(NotificationOutbox.objects.filter(sent_at__isnull=True).exists())
+        self.assertEqual(set(NotificationOutbox.objects.values_list('attempts', flat=True)), {2})
+
+    def test_claimed_entries_are_leased(self):
+        self.send.side_effect = RuntimeError('provider down')
+        self.book()
+        NotificationOutbox.objects.update(available_at=timezone.now())
+
+        self.assertEqual(len(outbox.claim_batch(10)), 2)
+        self.assertEqual(outbox.claim_batch(10), [])
+
+    @override_settings(OUTBOX_RETENTION_HOURS=24)
+    def test_sent_entries_are_purged_after_the_retention_period(self):
+        self.book()
+        self.send.side_effect = RuntimeError('provider down')
+        self.book()
+        now = timezone.now()
+        NotificationOutbox.objects.filter(sent_at__isnull=False).update(sent_at=now - timedelta(hours=25))
+
+        self.assertEqual(outbox.purge_sent(), 2)
+        self.assertEqual(NotificationOutbox.objects.count(), 2)
+        self.assertFalse(NotificationOutbox.objects.filter(sent_at__isnull=False).exists())
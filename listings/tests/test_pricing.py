@@ -0,0 +1,68 @@
+"""
+Stay quotes against a rate table, to the cent (see pricing.py).
+"""
+from datetime import date
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+
+from listings.models import Listing, ListingRate
+from listings.pricing import quote_listings, quote_stay, quote_stays
+
+
+@override_settings(LISTINGS_WEEKEND_NIGHTS=(4, 5))
+class QuoteTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        host = User.objects.create(username='host')
+        cls.listing = Listing.objects.create(
+            title='Sunny flat', description='Near the old town', location='Lisbon',
+            price_per_night=Decimal('99.99'), max_guests=4, owner=host,
+        )
+        cls.plain = Listing.objects.create(
+            title='Quiet room', description='By the park', location='Lisbon',
+            price_per_night=Decimal('80.00'), max_guests=2, owner=host,
+        )
+        ListingRate.objects.bulk_create([
+            # Friday 14 June to Sunday 16 June 2030, with the Saturday overridden
+            ListingRate(listing=cls.listing, kind='season', start_date=date(2030, 6, 14),
+                        end_date=date(2030, 6, 17), price_per_night=Decimal('120.00')),
+            ListingRate(listing=cls.listing, kind='season', start_date=date(2030, 6, 15),
+                        end_date=date(2030, 6, 16), price_per_night=Decimal('150.00')),
+            ListingRate(listing=cls.listing, kind='weekend', adjustment_percent=Decimal('12.35')),
+            ListingRate(listing=cls.listing, kind='length_of_stay', min_nights=3,
+                        adjustment_percent=Decimal('-7.50')),
+            ListingRate(listing=cls.listing, kind='length_of_stay', min_nights=7,
+                        adjustment_percent=Decimal('-15.00')),
+        ])
+
+    def assertCents(self, quotes, expected):
+        self.assertEqual(quotes, [Decimal(amount) for amount in expected])
+        for quote in quotes:
+            self.assertEqual(quote.as_tuple().exponent, -2)
+
+    def test_rates_are_applied_night_by_night(self):
+        # Thu 99.99, Fri 120.00 + 12.35% = 134.82, Sat 150.00 + 12.35% = 168.525
+        # rounded half up to 168.53, Sun 120.00: 523.34, less 7.5% = 484.0895
+        self.assertCents([quote_stay(self.listing, date(2030, 6, 13), date(2030, 6, 17))], ['484.09'])
+
+    def test_longest_length_of_stay_rate_reached_applies(self):
+        # Mon to Thu 4 x 99.99 plus the weekend above: 823.31, less 15%
+        self.assertCents([quote_stay(self.listing, date(2030, 6, 10), date(2030, 6, 17))], ['699.81'])
+        # Two nights reach no length-of-stay rate: Sun 120.00 + Mon 99.99
+        self.assertCents([quote_stay(self.listing, date(2030, 6, 16), date(2030, 6, 18))], ['219.99'])
+
+    def test_rates_of_one_listing_leave_others_alone(self):
+        quotes = quote_listings([self.listing, self.plain], date(2030, 6, 13), date(2030, 6, 17))
+        self.assertCents(quotes, ['484.09', '320.00'])
+
+    def test_stays_of_a_batch_match_single_quotes(self):
+        stays = [
+            (self.listing, date(2030, 6, 13), date(2030, 6, 17)),
+            (self.plain, date(2030, 6, 14), date(2030, 6, 15)),
+            (self.listing, date(2030, 6, 10), date(2030, 6, 17)),
+            (self.listing, date(2030, 6, 16), date(2030, 6, 18)),
+        ]
+        self.assertCents(quote_stays(stays), ['484.09', '80.00', '699.81', '219.99'])
@@ -0,0 +1,156 @@
+"""
+Every list endpoint and list action runs a fixed number of queries,
+however many rows the page holds.
+
+Each request is made once with one row per list and again with
+PAGE_ROWS rows, and must run the same, stated number of queries both
+times: a serializer relation that is not eager-loaded shows up as extra
+queries at PAGE_ROWS.
+"""
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.urls import reverse
+from rest_framework.test import APITestCase
+
+from listings.models import Booking, Listing, Review
+
+# Rows on the larger pages, within one page of KeysetPagination
+PAGE_ROWS = 12
+
+
+class QueryCountTests(APITestCase):
+    """Queries per request at 1 and PAGE_ROWS rows."""
+
+    def seed(self, rows):
+        """A host with ``rows`` listings, reviews of the first one and a guest's bookings of it."""
+        host = User.objects.create(username=f'host-{rows}')
+        guest = User.objects.create(username=f'guest-{rows}')
+        listings = [
+            Listing.objects.create(
+                title=f'Sunny flat {rows}-{index}', description='Near the old town', location='Lisbon',
+                latitude=Decimal('38.722300'), longitude=Decimal('-9.139300'),
+                price_per_night=Decimal('80.00'), max_guests=4, amenities=['wifi', 'kitchen'], owner=host,
+            )
+            for index in range(rows)
+        ]
+        listing = listings[0]
+        for index in range(rows):
+            reviewer = guest if index == 0 else User.objects.create(username=f'reviewer-{rows}-{index}')
+            Review.objects.create(listing=listing, reviewer=reviewer, rating=index % 5 + 1, comment='Lovely')
+        first = date.today() + timedelta(days=10)
+        for index in range(rows):
+            check_in = first + timedelta(days=3 * index)
+            Booking.objects.create(
+                listing=listing, guest=guest, check_in=check_in, check_out=check_in + timedelta(days=2),
+                total_price=Decimal('160.00'), status='confirmed',
+            )
+        return {'host': host, 'guest': guest, 'listing': listing, 'listings': listings}
+
+    def seed_neighbours(self, rows):
+        """seed() plus one more listing of the host, which has ``rows`` similar listings."""
+        data = self.seed(rows)
+        data['listing'] = Listing.objects.create(
+            title='Sunny loft', description='Near the old town', location='Lisbon',
+            price_per_night=Decimal('90.00'), max_guests=2, owner=data['host'],
+        )
+        return data
+
+    def assertQueriesPerPage(self, expected, request, seed=None):
+        """``request(data)`` runs ``expected`` queries at 1 and at PAGE_ROWS rows."""
+        for rows in (1, PAGE_ROWS):
+            with self.subTest(rows=rows):
+                data = (seed or self.seed)(rows)
+                self.client.force_authenticate(None)
+                # Start from cold caches, such as the search document count
+                cache.clear()
+                with self.assertNumQueries(expected):
+                    response = request(data)
+                self.assertEqual(response.status_code, 200, response.content[:500])
+
+    def get_as(self, user, url):
+        self.client.force_authenticate(user)
+        return self.client.get(url)
+
+    def test_listing_list(self):
+        self.assertQueriesPerPage(2, lambda data: self.client.get(reverse('listing-list')))
+
+    def test_listing_list_available_for_stay(self):
+        check_in = date.today() + timedelta(days=60)
+        url = f"{reverse('listing-list')}?check_in={check_in}&check_out={check_in + timedelta(days=3)}"
+        self.assertQueriesPerPage(3, lambda data: self.client.get(url))
+
+    def test_listing_list_search(self):
+        url = f"{reverse('listing-list')}?search=sunny"
+        self.assertQueriesPerPage(4, lambda data: self.client.get(url))
+
+    def test_listing_list_near(self):
+        url = f"{reverse('listing-list')}?lat=38.72&lng=-9.14&radius_km=5"
+
+        def seed(rows):
+            data = self.seed(rows)
+            # Out of the radius, in Porto
+            Listing.objects.create(
+                title='Far flat', description='By the river', location='Porto',
+                latitude=Decimal('41.157900'), longitude=Decimal('-8.629100'),
+                price_per_night=Decimal('70.00'), max_guests=2, owner=data['host'],
+            )
+            return data
+
+        def request(data):
+            response = self.client.get(url)
+            found = {row['id']: row['location'] for row in response.data['results']}
+            self.assertTrue({str(listing.pk) for listing in data['listings']} <= set(found))
+            self.assertEqual(set(found.values()), {'Lisbon'})
+            return response
+        self.assertQueriesPerPage(2, request, seed=seed)
+
+    def test_listing_list_facets(self):
+        url = f"{reverse('listing-list')}?facets=true"
+        self.assertQueriesPerPage(2, lambda data: self.client.get(url))
+
+    def test_my_listings(self):
+        self.assertQueriesPerPage(1, lambda data: self.get_as(data['host'], reverse('listing-my-listings')))
+
+    def test_listing_reviews(self):
+        self.assertQueriesPerPage(
+            4, lambda data: self.client.get(reverse('listing-reviews', args=[data['listing'].pk]))
+        )
+
+    def test_similar_listings(self):
+        self.assertQueriesPerPage(
+            3, lambda data: self.client.get(reverse('listing-similar', args=[data['listing'].pk])),
+            seed=self.seed_neighbours,
+        )
+
+    def test_autocomplete(self):
+        url = f"{reverse('listing-autocomplete')}?q=sun"
+        self.assertQueriesPerPage(3, lambda data: self.client.get(url))
+
+    def test_quote(self):
+        check_in = date.today() + timedelta(days=60)
+
+        def request(data):
+            ids = ','.join(str(listing.pk) for listing in data['listings'])
+            return self.client.get(
+                f"{reverse('listing-quote')}?check_in={check_in}&check_out={check_in + timedelta(days=3)}&ids={ids}"
+            )
+        self.assertQueriesPerPage(2, request)
+
+    def test_analytics(self):
+        self.assertQueriesPerPage(1, lambda data: self.get_as(data['host'], reverse('listing-analytics')))
+
+    def test_review_list(self):
+        self.assertQueriesPerPage(2, lambda data: self.client.get(reverse('review-list')))
+
+    def test_my_reviews(self):
+        self.assertQueriesPerPage(1, lambda data: self.get_as(data['guest'], reverse('review-my-reviews')))
+
+    def test_booking_list(self):
+        self.assertQueriesPerPage(2, lambda data: self.get_as(data['guest'], reverse('booking-list')))
+
+    def test_booking_list_with_archive(self):
+        url = f"{reverse('booking-list')}?include_archived=1"
+        self.assertQueriesPerPage(2, lambda data: self.get_as(data['guest'], url))
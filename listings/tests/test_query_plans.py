@@ -0,0 +1,24 @@
+"""
+Every list query the API runs is served by an index (see query_plans.py).
+"""
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+
+from listings.models import Listing
+from listings.query_plans import explain, plan_problems
+
+
+class QueryPlanTests(TestCase):
+
+    def test_list_queries_are_served_by_an_index(self):
+        # Raises CommandError, listing the plans, on a full scan or a sort
+        call_command('check_query_plans', stdout=StringIO())
+
+    def test_scans_and_sorts_are_reported(self):
+        plan = explain(Listing.objects.filter(description='x').order_by('max_guests'))
+        problems = plan_problems(plan, connection.vendor)
+        self.assertIn('full scan of listings_listing', problems)
+        self.assertIn('sort', problems)
@@ -0,0 +1,69 @@
+"""
+Reads of the viewsets go to the replica, writes and the reads of users
+who just wrote to the primary.
+"""
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.db import connections
+from django.test import TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from listings.models import Listing
+
+
+@override_settings(LISTINGS_READ_REPLICAS={'ALIASES': ['replica'], 'PIN_SECONDS': 60})
+class ReplicaRouterTests(TransactionTestCase):
+    # A transaction test case, since the replica connection only sees committed rows
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+        self.host = User.objects.create(username='host')
+        self.listing = Listing.objects.create(
+            title='Sunny flat', description='Near the old town', location='Lisbon',
+            price_per_night=Decimal('80.00'), max_guests=4, owner=self.host,
+        )
+        self.client = APIClient()
+
+    def queries(self, request):
+        """The SQL ``request()`` ran on the primary and on the replica."""
+        with CaptureQueriesContext(connections['default']) as primary:
+            with CaptureQueriesContext(connections['replica']) as replica:
+                response = request()
+        self.assertLess(response.status_code, 400, response.content[:500])
+        return [query['sql'] for query in primary], [query['sql'] for query in replica]
+
+    def assertReadsFromReplica(self, request):
+        primary, replica = self.queries(request)
+        self.assertTrue(any('"listings_listing"' in sql for sql in replica), replica)
+        self.assertFalse(any('"listings_listing"' in sql for sql in primary), primary)
+
+    def test_list_and_retrieve_read_from_the_replica(self):
+        self.assertReadsFromReplica(lambda: self.client.get(reverse('listing-list')))
+        self.assertReadsFromReplica(lambda: self.client.get(reverse('listing-detail', args=[self.listing.pk])))
+
+    def test_writes_go_to_the_primary(self):
+        self.client.force_login(self.host)
+        primary, replica = self.queries(lambda: self.client.post(reverse('listing-list'), {
+            'title': 'Quiet loft', 'description': 'By the river', 'location': 'Porto',
+            'price_per_night': '70.00', 'max_guests': 2,
+        }, format='json'))
+        self.assertTrue(any(sql.startswith('INSERT INTO "listings_listing"') for sql in primary), primary)
+        self.assertFalse(any(not sql.startswith('SELECT') for sql in replica), replica)
+
+    def test_writers_are_pinned_to_the_primary(self):
+        guest = User.objects.create(username='guest')
+        self.client.force_login(self.host)
+        response = self.client.patch(
+            reverse('listing-detail', args=[self.listing.pk]), {'title': 'Sunnier flat'}, format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+
+        primary, replica = self.queries(lambda: self.client.get(reverse('listing-list')))
+        self.assertTrue(any('"listings_listing"' in sql for sql in primary), primary)
+        self.assertEqual(replica, [])
+
+        self.client.force_login(guest)
+        self.assertReadsFromReplica(lambda: self.client.get(reverse('listing-list')))
@@ -0,0 +1,51 @@
+"""
+The static OpenAPI schema matches the schema the Swagger UI and ReDoc
+views generate at runtime, overrides included.
+"""
+import json
+import os
+import tempfile
+
+from django.core.management import CommandError, call_command
+from django.test import SimpleTestCase
+
+
+class SchemaTests(SimpleTestCase):
+    databases = {'default'}
+
+    def setUp(self):
+        handle, self.path = tempfile.mkstemp(suffix='.json')
+        os.close(handle)
+        self.addCleanup(os.remove, self.path)
+
+    def runtime_schema(self, url):
+        response = self.client.get(url, {'format': 'openapi'})
+        self.assertEqual(response.status_code, 200)
+        return json.loads(response.content)
+
+    def test_static_schema_matches_runtime_schema(self):
+        call_command('build_openapi_schema', output=self.path, stdout=open(os.devnull, 'w'))
+        call_command('build_openapi_schema', output=self.path, check=True, stdout=open(os.devnull, 'w'))
+        with open(self.path) as schema_file:
+            static = json.load(schema_file)
+
+        for url in ('/swagger/', '/redoc/'):
+            with self.subTest(url=url):
+                runtime = self.runtime_schema(url)
+                self.assertEqual(runtime['paths'], static['paths'])
+                self.assertEqual(runtime['definitions'], static['definitions'])
+
+        similar = static['paths']['/listings/{id}/similar/']['get']
+        self.assertIn('limit', [parameter['name'] for parameter in similar['parameters']])
+
+        reviews = static['paths']['/listings/{id}/reviews/']['get']['responses']['200']['schema']
+        self.assertEqual(
+            list(reviews['properties']),
+            ['next', 'previous', 'results', 'review_count', 'average_rating', 'rating_histogram'],
+        )
+
+    def test_check_fails_on_a_stale_schema(self):
+        with open(self.path, 'w') as schema_file:
+            schema_file.write('{}')
+        with self.assertRaises(CommandError):
+            call_command('build_openapi_schema', output=self.path, check=True)
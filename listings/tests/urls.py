@@ -0,0 +1,11 @@
+from django.contrib import admin
+from django.urls import include, path
+
+from listings.schema import SchemaUIView
+
+urlpatterns = [
+    path('admin/', admin.site.urls),
+    path('api/v1/', include('listings.urls')),
+    path('swagger/', SchemaUIView.as_view(renderer='swagger'), name='schema-swagger-ui'),
+    path('redoc/', SchemaUIView.as_view(renderer='redoc'), name='schema-redoc'),
+]
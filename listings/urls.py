@@ -1,6 +1,7 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from . import views
+from . import async_views, views
+from .schema import SchemaView
 
 # Create a router and register our viewsets with it
 router = DefaultRouter()
@@ -11,4 +12,12 @@ router.register(r'bookings', views.BookingViewSet, basename='booking')
 # The API URLs are now determined automatically by the router
 urlpatterns = [
     path('', include(router.urls)),
+    path('metrics/', views.MetricsView.as_view(), name='metrics'),
+    # Built by `manage.py build_openapi_schema`, see schema.py
+    path('schema/', SchemaView.as_view(), name='openapi-schema'),
+    # Native async read endpoints, for deployments served over ASGI
+    path('async/listings/', async_views.listing_list, name='async-listing-list'),
+    path('async/listings/<uuid:pk>/', async_views.listing_detail, name='async-listing-detail'),
+    path('async/reviews/', async_views.review_list, name='async-review-list'),
+    path('async/reviews/<uuid:pk>/', async_views.review_detail, name='async-review-detail'),
 ]
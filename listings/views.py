@@ -1,28 +1,155 @@
-from rest_framework import viewsets, permissions, status
+from rest_framework import viewsets, permissions, serializers, status
 from rest_framework.decorators import action
+from rest_framework.generics import get_object_or_404
 from rest_framework.response import Response
+from rest_framework.views import APIView
 from django_filters.rest_framework import DjangoFilterBackend
-from rest_framework.filters import SearchFilter, OrderingFilter
-from drf_yasg.utils import swagger_auto_schema
-from drf_yasg import openapi
-from .models import Listing, Review, Booking
-from .serializers import ListingSerializer, ReviewSerializer, BookingSerializer
+from rest_framework.filters import OrderingFilter
+from django.http import Http404
+from django.utils.dateparse import parse_date
+from .analytics import host_stats
+from .archive import include_archived
+from .availability import BookingConflict, reserve
+from .bulk import import_bookings, import_listings, request_rows
+from .cache import AVAILABILITY_TAG, LIST_TAG, cached_response, get_response_cache, listing_tag
+from .conditional import conditional, page_validators, row_validators
+from .eager import eager_load
+from .facets import listing_facets
+from .filters import ListingFilter, ListingSearchFilter, RankedOrderingFilter
+from .instrumentation import registry
+from .lifecycle import job_stats
+from .mixins import EagerLoadingMixin, FilteredListMixin, ReplicaReadMixin, SparseFieldsetMixin
+from .models import ArchivedBooking, Listing, Review, Booking
+from .pagination import KeysetPagination
+from .pricing import quote_listings, set_stay_prices
+from .schema import ListResponse, openapi, swagger_auto_schema
+from .search import search
+from .serializers import (
+    ListingSerializer, ReviewSerializer, BookingSerializer, HostAnalyticsSerializer, StayQuoteSerializer,
+)
+from .similar import similar_listings
 
 
-class ListingViewSet(viewsets.ModelViewSet):
+def bulk_response(result):
+    """Response for a bulk import, with per-row errors."""
+    if not result.errors:
+        response_status = status.HTTP_201_CREATED
+    elif result.created:
+        response_status = status.HTTP_207_MULTI_STATUS
+    else:
+        response_status = status.HTTP_400_BAD_REQUEST
+    return Response(result.as_dict(), status=response_status)
+
+
+class MetricsView(APIView):
+    """
+    Request histograms per view and action, recorded by RequestMetricsMiddleware.
+    
+    Covers duration, database time and queries, serializer time, signal
+    handler time and response size, plus the response cache counters and
+    the rows per second of the booking lifecycle jobs. Histograms are kept
+    per worker process.
+    """
+    permission_classes = [permissions.IsAdminUser]
+    
+    @swagger_auto_schema(responses={200: openapi.Response('Request histograms, cache counters and job runs')})
+    def get(self, request):
+        return Response({
+            'views': registry.snapshot(),
+            'response_cache': get_response_cache().stats(),
+            'lifecycle_jobs': job_stats(),
+        })
+
+
+def requested_stay(request):
+    """(check_in, check_out) of a listing stay filter, already validated by ListingFilter, or None."""
+    check_in = parse_date(request.query_params.get('check_in') or '')
+    check_out = parse_date(request.query_params.get('check_out') or '')
+    return (check_in, check_out) if check_in and check_out else None
+
+
+def listing_list_tags(view, kwargs):
+    """Stay filtered list pages also change with the bookings."""
+    if requested_stay(view.request):
+        return [LIST_TAG, AVAILABILITY_TAG]
+    return [LIST_TAG]
+
+
+def listing_list_validators(view, request, kwargs):
+    # Facets count every matching listing, not just the page
+    if request.query_params.get('facets', '').lower() in ('true', '1'):
+        return None
+    return page_validators(view, view.get_list_queryset(), request)
+
+
+def listing_reviews_validators(view, request, kwargs):
+    listing = row_validators(view.get_queryset(), kwargs['pk'])
+    if listing is None:
+        return None
+    page, _ = page_validators(view, Review.objects.filter(listing_id=kwargs['pk']), request)
+    return [listing[0], page], None
+
+
+def related_page_validators(view, request, kwargs):
+    # Pages showing ``listing_title`` change with their listings too
+    return page_validators(view, view.get_list_queryset(), request, ('pk', 'updated_at', 'listing__updated_at'))
+
+
+def booking_list_validators(view, request, kwargs):
+    # Archived bookings do not change, but the merged page is not worth a second version query
+    if include_archived(request):
+        return None
+    return related_page_validators(view, request, kwargs)
+
+
+class ListingViewSet(ReplicaReadMixin, FilteredListMixin, SparseFieldsetMixin, EagerLoadingMixin, viewsets.ModelViewSet):
     """
     ViewSet for managing travel listings.
     
     Provides CRUD operations for listings with filtering, searching, and ordering capabilities.
+    Passing ``check_in``, ``check_out`` and ``guests`` returns only listings free for that stay.
+    Passing ``lat``, ``lng`` and ``radius_km`` returns nearby listings ordered by distance.
+    Passing ``search`` returns listings matching every term, ordered by relevance.
+    With ``check_in`` and ``check_out``, each listing carries ``stay_total_price``,
+    the price of the stay from its rates.
+    Passing ``fields`` (e.g. ``id,title,price_per_night,average_rating``) returns only
+    those fields, with ``expand=owner`` to include the owner instead of its id.
+    Passing ``facets=1`` adds the counts per listing type, price bucket and amenity
+    of all matching listings. ``/listings/{id}/similar/`` returns the listings
+    most like one listing (see similar.py).
     """
     queryset = Listing.objects.all()
     serializer_class = ListingSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
-    filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
-    filterset_fields = ['listing_type', 'is_available', 'location']
-    search_fields = ['title', 'description', 'location']
+    filter_backends = [DjangoFilterBackend, ListingSearchFilter, RankedOrderingFilter]
+    filterset_class = ListingFilter
     ordering_fields = ['created_at', 'price_per_night', 'title']
     ordering = ['-created_at']
+    pagination_class = KeysetPagination
+    replica_actions = ('list', 'retrieve', 'my_listings', 'analytics', 'reviews', 'autocomplete', 'quote', 'similar')
+    
+    @swagger_auto_schema(manual_parameters=[
+        openapi.Parameter('facets', openapi.IN_QUERY, type=openapi.TYPE_BOOLEAN,
+                          description="Include counts per listing type, price bucket and amenity"),
+    ])
+    @conditional(listing_list_validators)
+    @cached_response('listing-list', listing_list_tags)
+    def list(self, request, *args, **kwargs):
+        queryset = self.get_list_queryset()
+        page = self.paginate_queryset(queryset)
+        stay = requested_stay(request)
+        if stay:
+            page = set_stay_prices(page, *stay)
+        serializer = self.get_serializer(page, many=True)
+        response = self.get_paginated_response(serializer.data)
+        if request.query_params.get('facets', '').lower() in ('true', '1'):
+            response.data['facets'] = listing_facets(queryset)
+        return response
+    
+    @conditional(lambda view, request, kwargs: row_validators(view.get_queryset(), kwargs['pk']))
+    @cached_response('listing-detail', lambda view, kwargs: [listing_tag(kwargs['pk'])])
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
     
     def perform_create(self, serializer):
         """Set the owner to the current user when creating a listing."""
@@ -30,31 +157,162 @@ class ListingViewSet(viewsets.ModelViewSet):
     
     @swagger_auto_schema(
         method='get',
-        responses={200: ListingSerializer(many=True)},
+        responses={200: ListResponse(ListingSerializer)},
         operation_description="Get listings owned by the current user"
     )
     @action(detail=False, methods=['get'], permission_classes=[permissions.IsAuthenticated])
     def my_listings(self, request):
         """Get listings owned by the current user."""
-        listings = self.queryset.filter(owner=request.user)
-        serializer = self.get_serializer(listings, many=True)
-        return Response(serializer.data)
+        listings = self.sparse_queryset(self.get_queryset().filter(owner=request.user))
+        page = self.paginate_queryset(listings)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+    
+    @swagger_auto_schema(
+        method='get',
+        query_serializer=HostAnalyticsSerializer,
+        responses={200: openapi.Response('Occupancy, revenue, average daily rate and cancellation rate per listing and period')},
+        operation_description="Get booking analytics of the current user's listings by day, week or month"
+    )
+    @action(detail=False, methods=['get'], permission_classes=[permissions.IsAuthenticated])
+    def analytics(self, request):
+        """Get occupancy and revenue of the current user's listings, from the daily rollups."""
+        query = HostAnalyticsSerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        params = query.validated_data
+        results = host_stats(
+            request.user, params['start'], params['end'], params['period'], params.get('listing'),
+        )
+        return Response({
+            'period': params['period'],
+            'start': params['start'],
+            'end': params['end'],
+            'results': results,
+        })
+    
+    @swagger_auto_schema(
+        method='post',
+        responses={
+            201: openapi.Response('All rows created'),
+            207: openapi.Response('Some rows failed; see errors'),
+            400: openapi.Response('No row could be created'),
+        },
+        operation_description="Create many listings from a JSON array, NDJSON (application/x-ndjson) or CSV (text/csv) body"
+    )
+    @action(detail=False, methods=['post'], permission_classes=[permissions.IsAuthenticated])
+    def bulk(self, request):
+        """Create many listings owned by the current user."""
+        result = import_listings(request_rows(request), request.user)
+        return bulk_response(result)
     
     @swagger_auto_schema(
         method='get',
-        responses={200: ReviewSerializer(many=True)},
-        operation_description="Get all reviews for a specific listing"
+        manual_parameters=[
+            openapi.Parameter('q', openapi.IN_QUERY, description="Text typed so far", type=openapi.TYPE_STRING)
+        ],
+        responses={200: openapi.Response('Best matching listing titles')},
+        operation_description="Suggest listings for a partially typed search query"
+    )
+    @action(detail=False, methods=['get'])
+    def autocomplete(self, request):
+        """Suggest the best matching listings for a partially typed query."""
+        query = request.query_params.get('q', '')
+        if not query.strip():
+            return Response([])
+        suggestions = (
+            search(Listing.objects.all(), query)
+            .order_by('-search_rank')
+            .values('id', 'title')[:10]
+        )
+        return Response(list(suggestions))
+    
+    @swagger_auto_schema(
+        method='get',
+        query_serializer=StayQuoteSerializer,
+        responses={200: openapi.Response('Total stay price per listing id')},
+        operation_description="Quote one stay at many listings, from their seasonal, weekend and length-of-stay rates"
+    )
+    @action(detail=False, methods=['get'])
+    def quote(self, request):
+        """Quote a stay at each of the given listings."""
+        query = StayQuoteSerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        check_in, check_out = query.validated_data['check_in'], query.validated_data['check_out']
+        listings = Listing.objects.filter(pk__in=query.validated_data['ids']).only('pk', 'price_per_night')
+        listings = list(listings)
+        totals = quote_listings(listings, check_in, check_out)
+        return Response({
+            'check_in': check_in,
+            'check_out': check_out,
+            'quotes': {str(listing.pk): str(total) for listing, total in zip(listings, totals)},
+        })
+    
+    @swagger_auto_schema(
+        method='get',
+        responses={200: ListResponse(
+            ReviewSerializer,
+            review_count=openapi.Schema(type=openapi.TYPE_INTEGER),
+            average_rating=openapi.Schema(type=openapi.TYPE_NUMBER, x_nullable=True),
+            rating_histogram=openapi.Schema(
+                type=openapi.TYPE_OBJECT, additional_properties=openapi.Schema(type=openapi.TYPE_INTEGER),
+                description="Number of reviews per star rating, 1 to 5",
+            ),
+        )},
+        operation_description="Get all reviews for a specific listing along with its rating summary"
     )
     @action(detail=True, methods=['get'])
+    @conditional(listing_reviews_validators)
+    @cached_response('listing-reviews', lambda view, kwargs: [listing_tag(kwargs['pk'])])
     def reviews(self, request, pk=None):
         """Get all reviews for a specific listing."""
         listing = self.get_object()
-        reviews = listing.reviews.all()
-        serializer = ReviewSerializer(reviews, many=True)
-        return Response(serializer.data)
+        reviews = self.sparse_queryset(eager_load(listing.reviews.all(), ReviewSerializer), ReviewSerializer)
+        page = self.paginate_queryset(reviews)
+        serializer = self.get_serializer(page, many=True, serializer_class=ReviewSerializer)
+        response = self.get_paginated_response(serializer.data)
+        response.data.update(
+            review_count=listing.review_count,
+            average_rating=listing.average_rating,
+            rating_histogram=listing.rating_histogram,
+        )
+        return response
+    
+    @swagger_auto_schema(
+        method='get',
+        manual_parameters=[
+            openapi.Parameter('limit', openapi.IN_QUERY, type=openapi.TYPE_INTEGER,
+                              description="Number of listings, at most 50 (default 10)")
+        ],
+        responses={200: ListResponse(ListingSerializer, paginated=False)},
+        operation_description="Get the available listings most similar to a listing, most similar first"
+    )
+    @action(detail=True, methods=['get'])
+    @cached_response('listing-similar', lambda view, kwargs: [LIST_TAG])
+    def similar(self, request, pk=None):
+        """Get the listings most similar to a listing."""
+        listing = self.get_object()
+        try:
+            limit = min(max(int(request.query_params.get('limit', 10)), 1), 50)
+        except ValueError:
+            raise serializers.ValidationError({'limit': 'Expected a number.'})
+        listings = similar_listings(
+            listing, limit, self.sparse_queryset(self.get_queryset().filter(is_available=True))
+        )
+        serializer = self.get_serializer(listings, many=True)
+        return Response({'results': serializer.data})
+    
+    @swagger_auto_schema(
+        method='get',
+        responses={200: openapi.Response('Response cache counters')},
+        operation_description="Hit, miss and eviction counters of the listing response cache"
+    )
+    @action(detail=False, methods=['get'], permission_classes=[permissions.IsAdminUser])
+    def cache_stats(self, request):
+        """Get the listing response cache counters."""
+        return Response(get_response_cache().stats())
 
 
-class ReviewViewSet(viewsets.ModelViewSet):
+class ReviewViewSet(ReplicaReadMixin, FilteredListMixin, SparseFieldsetMixin, EagerLoadingMixin, viewsets.ModelViewSet):
     """
     ViewSet for managing reviews.
     
@@ -67,6 +325,12 @@ class ReviewViewSet(viewsets.ModelViewSet):
     filterset_fields = ['rating', 'listing']
     ordering_fields = ['created_at', 'rating']
     ordering = ['-created_at']
+    pagination_class = KeysetPagination
+    replica_actions = ('list', 'retrieve', 'my_reviews')
+    
+    @conditional(related_page_validators)
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
     
     def perform_create(self, serializer):
         """Set the reviewer to the current user when creating a review."""
@@ -74,22 +338,25 @@ class ReviewViewSet(viewsets.ModelViewSet):
     
     @swagger_auto_schema(
         method='get',
-        responses={200: ReviewSerializer(many=True)},
+        responses={200: ListResponse(ReviewSerializer)},
         operation_description="Get reviews created by the current user"
     )
     @action(detail=False, methods=['get'], permission_classes=[permissions.IsAuthenticated])
     def my_reviews(self, request):
         """Get reviews created by the current user."""
-        reviews = self.queryset.filter(reviewer=request.user)
-        serializer = self.get_serializer(reviews, many=True)
-        return Response(serializer.data)
+        reviews = self.sparse_queryset(self.get_queryset().filter(reviewer=request.user))
+        page = self.paginate_queryset(reviews)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
 
 
-class BookingViewSet(viewsets.ModelViewSet):
+class BookingViewSet(ReplicaReadMixin, FilteredListMixin, SparseFieldsetMixin, EagerLoadingMixin, viewsets.ModelViewSet):
     """
     ViewSet for managing bookings.
     
     Handles booking creation, retrieval, updates, and cancellation.
+    Old completed and cancelled bookings are moved to the archive (see
+    archive.py); list and retrieve include them with ``include_archived=1``.
     """
     queryset = Booking.objects.all()
     serializer_class = BookingSerializer
@@ -98,14 +365,92 @@ class BookingViewSet(viewsets.ModelViewSet):
     filterset_fields = ['status', 'listing']
     ordering_fields = ['created_at', 'check_in', 'check_out']
     ordering = ['-created_at']
+    pagination_class = KeysetPagination
     
     def get_queryset(self):
         """Filter bookings to only show those belonging to the current user."""
-        return self.queryset.filter(guest=self.request.user)
+        if getattr(self, 'swagger_fake_view', False):
+            # The schema is built without a request (see schema.py)
+            return Booking.objects.none()
+        return super().get_queryset().filter(guest=self.request.user)
+    
+    def get_archive_queryset(self):
+        """The current user's archived bookings, loaded like get_queryset()."""
+        queryset = ArchivedBooking.objects.filter(guest=self.request.user)
+        return eager_load(queryset, self.get_serializer_class())
+    
+    def get_object(self):
+        """With ``include_archived``, retrieve finds archived bookings too."""
+        try:
+            return super().get_object()
+        except Http404:
+            if self.action != 'retrieve' or not include_archived(self.request):
+                raise
+        booking = get_object_or_404(self.filter_queryset(self.get_archive_queryset()), pk=self.kwargs['pk'])
+        self.check_object_permissions(self.request, booking)
+        return booking
+    
+    @swagger_auto_schema(manual_parameters=[
+        openapi.Parameter('include_archived', openapi.IN_QUERY, type=openapi.TYPE_BOOLEAN,
+                          description="Include completed and cancelled bookings moved to the archive"),
+    ])
+    @conditional(booking_list_validators)
+    def list(self, request, *args, **kwargs):
+        if not include_archived(request):
+            return super().list(request, *args, **kwargs)
+        querysets = [
+            self.get_list_queryset(),
+            self.filter_queryset(self.get_archive_queryset()),
+        ]
+        page = self.paginator.paginate_querysets(querysets, request, view=self)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+    
+    @conditional(lambda view, request, kwargs: row_validators(
+        view.get_queryset(), kwargs['pk'], ('updated_at', 'listing__updated_at')))
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
     
     def perform_create(self, serializer):
         """Set the guest to the current user when creating a booking."""
-        serializer.save(guest=self.request.user)
+        def save():
+            # A retried attempt must insert again, not update the rolled back row
+            serializer.instance = None
+            return serializer.save(guest=self.request.user)
+        
+        self._reserve(serializer, save)
+    
+    def perform_update(self, serializer):
+        """Re-check availability under the listing lock when a booking changes."""
+        self._reserve(serializer, serializer.save, exclude_booking=serializer.instance.pk)
+    
+    def _reserve(self, serializer, save, exclude_booking=None):
+        """Save a booking while holding its listing's lock."""
+        data = serializer.validated_data
+        listing = data.get('listing', getattr(serializer.instance, 'listing', None))
+        check_in = data.get('check_in', getattr(serializer.instance, 'check_in', None))
+        check_out = data.get('check_out', getattr(serializer.instance, 'check_out', None))
+        try:
+            reserve(listing.pk, check_in, check_out, save, exclude_booking=exclude_booking)
+        except BookingConflict:
+            raise serializers.ValidationError(
+                {'detail': 'This listing is already booked for some of the selected dates.'}
+            )
+    
+    @swagger_auto_schema(
+        method='post',
+        responses={
+            201: openapi.Response('All rows created'),
+            207: openapi.Response('Some rows failed; see errors'),
+            400: openapi.Response('No row could be created'),
+        },
+        operation_description="Create many bookings from a JSON array, NDJSON (application/x-ndjson) or CSV (text/csv) body"
+    )
+    @action(detail=False, methods=['post'])
+    def bulk(self, request):
+        """Create many bookings for the current user."""
+        result = import_bookings(request_rows(request), request.user)
+        return bulk_response(result)
     
     @swagger_auto_schema(
         method='post',